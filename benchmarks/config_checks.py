@@ -0,0 +1,103 @@
+"""
+Benchmark configuration's bot_check_once and bot_check lookups.
+
+Compares the old lists (`self.ignored[guild]`, `self.command_config[entity]`)
+with the compiled per-guild GuildConfig snapshot, for authors with 10, 250
+and 1000 roles in guilds with as many plonks and disabled commands.
+Only the lookups are timed, the dev/manage_guild bypasses are the same for both.
+
+Usage:
+    python -m benchmarks.config_checks [--checks 20000]
+"""
+
+import argparse
+import random
+import time
+from collections import defaultdict
+
+from utils.config_utils import GuildConfig
+
+SIZES = (10, 250, 1_000)
+COMMANDS = [f'command{n}' for n in range(200)]
+
+
+def random_id(rng: random.Random) -> int:
+    return rng.randrange(10**17, 10**18)
+
+
+def old_check_once(ignored, guild_id, channel_id, author_id, roles) -> bool:
+    if channel_id in ignored[guild_id]:
+        return False
+    if author_id in ignored[guild_id]:
+        return False
+    if any((role_id in ignored[guild_id] for role_id in [r for r in roles])):
+        return False
+    return True
+
+
+def old_check(command_config, command, guild_id, channel_id, author_id, roles) -> bool:
+    if str(command) in command_config[guild_id]:
+        return False
+    if str(command) in command_config[channel_id]:
+        return False
+    if str(command) in command_config[author_id]:
+        return False
+    if any((str(command) in command_config[role_id] for role_id in roles)):
+        return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--checks', type=int, default=20_000, help='Invocations to check per case.')
+    args = parser.parse_args()
+
+    print(f"{'roles/entries':>13} {'old us/cmd':>11} {'snapshot us/cmd':>16} {'speedup':>8}")
+    for size in SIZES:
+        rng = random.Random(size)
+        guild_id = random_id(rng)
+        roles = [random_id(rng) for _ in range(size)]
+        channels = [random_id(rng) for _ in range(50)]
+        members = [random_id(rng) for _ in range(size)]
+
+        # Mostly entities the authors don't have, so most checks run to the end
+        ignored = defaultdict(list)
+        command_config = defaultdict(list)
+        plonks = [random_id(rng) for _ in range(size)]
+        ignored[guild_id].extend(plonks)
+        disabled = {}
+        for _ in range(size):
+            entity_id, command = random_id(rng), rng.choice(COMMANDS)
+            command_config[entity_id].append(command)
+            disabled.setdefault(command, set()).add(entity_id)
+        config = GuildConfig(plonks, disabled)
+
+        invocations = []
+        for _ in range(args.checks):
+            author_roles = rng.sample(roles, size // 2)
+            if rng.random() < 0.05:
+                author_roles.append(rng.choice(plonks))
+            invocations.append((rng.choice(COMMANDS), rng.choice(channels), rng.choice(members), author_roles))
+
+        start = time.perf_counter()
+        old = [
+            old_check_once(ignored, guild_id, channel_id, author_id, author_roles)
+            and old_check(command_config, command, guild_id, channel_id, author_id, author_roles)
+            for command, channel_id, author_id, author_roles in invocations
+        ]
+        old_time = (time.perf_counter() - start) / args.checks
+
+        start = time.perf_counter()
+        new = [
+            not config.is_ignored(guild_id, channel_id, author_id, author_roles)
+            and not config.is_disabled(command, guild_id, channel_id, author_id, author_roles)
+            for command, channel_id, author_id, author_roles in invocations
+        ]
+        new_time = (time.perf_counter() - start) / args.checks
+
+        assert old == new
+        print(f"{size:>13,} {old_time * 1e6:>11.1f} {new_time * 1e6:>16.1f} {old_time / new_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
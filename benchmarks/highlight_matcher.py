@@ -0,0 +1,65 @@
+"""
+Benchmark highlight matching for one guild.
+
+Compares the old approach (a substring check per highlight word)
+with the per-guild Aho–Corasick matcher at 10, 100, 1k and 50k words.
+
+Usage:
+    python -m benchmarks.highlight_matcher [--messages 2000]
+"""
+
+import argparse
+import random
+import string
+import time
+
+from utils.highlight_utils import AhoCorasick
+
+WORD_COUNTS = (10, 100, 1_000, 50_000)
+
+
+def random_word(rng: random.Random) -> str:
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 10)))
+
+
+def random_message(rng: random.Random, words: list) -> str:
+    parts = [random_word(rng) for _ in range(rng.randint(5, 40))]
+    if rng.random() < 0.1: # Some messages actually hit a highlight
+        parts.insert(rng.randrange(len(parts)), rng.choice(words))
+    return ' '.join(parts)
+
+
+def substring_scan(words, text: str) -> set:
+    return {word for word in words if word in text}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=2000, help='Messages to match per case.')
+    args = parser.parse_args()
+
+    print(f"{'words':>7} {'build ms':>9} {'states':>9} {'scan us/msg':>12} {'automaton us/msg':>17} {'speedup':>8}")
+    for count in WORD_COUNTS:
+        rng = random.Random(count)
+        words = list({random_word(rng) for _ in range(count)})
+        messages = [random_message(rng, words) for _ in range(args.messages)]
+
+        start = time.perf_counter()
+        matcher = AhoCorasick(words)
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        expected = [substring_scan(words, text) for text in messages]
+        scan = (time.perf_counter() - start) / len(messages)
+
+        start = time.perf_counter()
+        found = [matcher.find(text) for text in messages]
+        automaton = (time.perf_counter() - start) / len(messages)
+
+        assert found == expected
+        print(f"{len(words):>7,} {build * 1000:>9.1f} {len(matcher):>9,} {scan * 1e6:>12.1f} "
+              f"{automaton * 1e6:>17.1f} {scan / automaton:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
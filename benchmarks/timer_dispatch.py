@@ -0,0 +1,264 @@
+"""
+Benchmark the timer engine behind utility.create_timer.
+
+Runs utils.timer_utils.TimerScheduler against a fake clock and an
+in-memory stand-in for the reminders table, so weeks of timers play
+out in seconds and every run is the same. Covers the short timer
+shortcut, timers past the 40 day sleep cap, new timers waking the loop
+early, rows deleted behind the scheduler's back and a restart that
+reloads everything from the table.
+
+Reports dispatch lag (virtual time), queries and wakeups per timer and
+CPU per dispatched timer. CPU includes the fake clock and table, so only
+compare numbers between runs of this script.
+
+Usage:
+    python -m benchmarks.timer_dispatch [--timers 100000] [--seed 0]
+"""
+
+import argparse
+import asyncio
+import datetime
+import heapq
+import itertools
+import random
+import time
+
+from utils.timer_utils import TimerScheduler
+
+START = datetime.datetime(2021, 1, 1)
+DAY = 86400
+
+# (share of timers, shortest delay, longest delay) in seconds
+DELAYS = (
+    (0.05, 1, TimerScheduler.SHORT_TIMER), # shortcut, never stored
+    (0.60, 60, DAY),
+    (0.25, DAY, 30 * DAY),
+    (0.10, 40 * DAY, 60 * DAY), # past MAX_SLEEP
+)
+CREATE_WINDOW = 600 # every timer is created in the first 10 minutes
+DELETED = 0.02 # share of stored timers deleted straight from the table
+# Loop iterations to let the scheduler react after the clock moves
+SETTLE = 10
+
+
+class FakeClock:
+    """Virtual time that only moves when the harness advances it."""
+
+    def __init__(self, start: datetime.datetime):
+        self._now = start
+        self._sleepers = [] # (deadline, seq, future)
+        self._seq = itertools.count()
+        self.waits = 0
+
+    def now(self) -> datetime.datetime:
+        return self._now
+
+    async def sleep(self, seconds: float):
+        future = asyncio.get_running_loop().create_future()
+        deadline = self._now + datetime.timedelta(seconds=max(seconds, 0))
+        heapq.heappush(self._sleepers, (deadline, next(self._seq), future))
+        await future
+
+    async def wait(self, event: asyncio.Event, timeout: float) -> bool:
+        self.waits += 1
+        if event.is_set():
+            return True
+
+        waiter = asyncio.ensure_future(event.wait())
+        sleeper = asyncio.ensure_future(self.sleep(timeout))
+        try:
+            done, _ = await asyncio.wait((waiter, sleeper), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waiter.cancel()
+            sleeper.cancel()
+        return waiter in done
+
+    def next_deadline(self):
+        while self._sleepers and self._sleepers[0][2].done():
+            heapq.heappop(self._sleepers) # Cancelled
+        return self._sleepers[0][0] if self._sleepers else None
+
+    async def advance(self, until: datetime.datetime):
+        """Move to `until`, waking every sleeper on the way at its own deadline."""
+
+        await settle() # Anything just scheduled sleeps from the current time
+        deadline = self.next_deadline()
+        while deadline is not None and deadline <= until:
+            self._now = deadline
+            while self._sleepers and self._sleepers[0][0] <= deadline:
+                future = heapq.heappop(self._sleepers)[2]
+                if not future.done():
+                    future.set_result(None)
+            await settle()
+            deadline = self.next_deadline()
+        self._now = max(self._now, until)
+
+
+async def stop(task: asyncio.Task):
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+
+
+async def settle():
+    for _ in range(SETTLE):
+        await asyncio.sleep(0)
+
+
+class FakeDB:
+    """Just enough of the pool for the queries TimerScheduler makes."""
+
+    def __init__(self):
+        self.rows = {}
+        self.queries = {'insert': 0, 'delete': 0, 'select': 0}
+        self._ids = itertools.count(1)
+
+    async def fetchrow(self, query, event, extra, expires, created, guild_id, author_id, target_id):
+        assert query.lstrip().startswith('INSERT INTO reminders')
+        self.queries['insert'] += 1
+        row_id = next(self._ids)
+        self.rows[row_id] = {
+            'id': row_id, 'event': event, 'extra': extra, 'expires': expires, 'created': created,
+            'guild_id': guild_id, 'author_id': author_id, 'target_id': target_id,
+        }
+        return (row_id,)
+
+    async def fetch(self, query, *args):
+        if query.startswith('SELECT'):
+            self.queries['select'] += 1
+            return list(self.rows.values())
+
+        assert query.startswith('DELETE FROM reminders')
+        self.queries['delete'] += 1
+        return [{'id': row_id} for row_id in args[0] if self.rows.pop(row_id, None) is not None]
+
+
+def random_timer(rng: random.Random):
+    guild_id, author_id, target_id = (rng.randrange(10**17, 10**18) for _ in range(3))
+    event = rng.choice(('reminder', 'mute', 'tempban', 'giveaway', 'lockdown', 'temprole'))
+    if event == 'reminder':
+        return event, (author_id, target_id, 'do the dishes'), {}
+    if event == 'mute':
+        return event, (guild_id, author_id), {'user_id': target_id, 'role_id': 1}
+    if event == 'lockdown':
+        return event, (guild_id, author_id), {'channel_id': target_id}
+    return event, (guild_id, author_id, 0, target_id), {}
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def run(count: int, seed: int):
+    rng = random.Random(seed)
+    clock = FakeClock(START)
+    db = FakeDB()
+    dispatched = [] # (timer, when)
+
+    def dispatch(timer):
+        dispatched.append((timer, clock.now()))
+
+    # Creation plan, sorted so the clock only moves forward
+    plan = []
+    for _ in range(count):
+        share, low, high = rng.choices(DELAYS, weights=[d[0] for d in DELAYS])[0]
+        created = START + datetime.timedelta(seconds=rng.uniform(0, CREATE_WINDOW))
+        when = created + datetime.timedelta(seconds=int(rng.uniform(low, high)))
+        plan.append((created, when, random_timer(rng)))
+    plan.sort(key=lambda item: item[0])
+
+    wall = time.perf_counter()
+    cpu = time.process_time()
+
+    scheduler = TimerScheduler(db, dispatch, clock=clock)
+    await scheduler.load()
+    task = asyncio.ensure_future(scheduler.run())
+
+    created = []
+    for when_created, when, (event, args, kwargs) in plan:
+        await clock.advance(when_created)
+        created.append(await scheduler.create(when, event, *args, created=when_created, **kwargs))
+
+    # Rows other commands delete themselves, half of them tell the scheduler
+    stored = [timer for timer in created if timer.id is not None]
+    pending = sorted(db.rows)
+    cancelled = set(rng.sample(pending, int(len(pending) * DELETED)))
+    for timer_id in cancelled:
+        del db.rows[timer_id]
+        if timer_id % 2:
+            scheduler.remove(timer_id)
+
+    # Restart, the new scheduler only knows what is in the table
+    await stop(task)
+    scheduler = TimerScheduler(db, dispatch, clock=clock)
+    await scheduler.load()
+    task = asyncio.ensure_future(scheduler.run())
+    await settle()
+
+    deadline = clock.next_deadline()
+    while deadline is not None:
+        await clock.advance(deadline)
+        deadline = clock.next_deadline()
+
+    await stop(task)
+    cpu = time.process_time() - cpu
+    wall = time.perf_counter() - wall
+
+    # Every timer fires exactly once, never early, deleted ones never
+    seen = {}
+    for timer, when in dispatched:
+        key = timer.id if timer.id is not None else ('short', id(timer))
+        assert key not in seen, f'{timer!r} fired twice'
+        assert when >= timer.expires, f'{timer!r} fired early at {when}'
+        seen[key] = timer
+    expected = {timer.id if timer.id is not None else ('short', id(timer)) for timer in created} - cancelled
+    assert set(seen) == expected, f'{len(expected - set(seen))} timers never fired'
+    assert not db.rows and not len(scheduler)
+
+    lags = [(when - timer.expires).total_seconds() for timer, when in dispatched]
+    stored_count = len(stored)
+    return {
+        'timers': count,
+        'short': count - stored_count,
+        'stored': stored_count,
+        'cancelled': len(cancelled),
+        'dispatched': len(dispatched),
+        'lag': (percentile(lags, 50), percentile(lags, 99), max(lags, default=0.0)),
+        'queries': dict(db.queries),
+        'waits': clock.waits,
+        'cpu': cpu,
+        'wall': wall,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--timers', type=int, default=100_000, help='Synthetic timers to schedule.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    stats = asyncio.run(run(args.timers, args.seed))
+    queries = stats['queries']
+    total_queries = sum(queries.values())
+    span = max(d[2] for d in DELAYS) / DAY
+
+    print(f"{stats['timers']:,} timers over {span:.0f} days: {stats['short']:,} short, {stats['stored']:,} stored, "
+          f"{stats['cancelled']:,} deleted behind the scheduler")
+    print(f"dispatched     {stats['dispatched']:,}")
+    print("lag s          p50 {:.3f}  p99 {:.3f}  max {:.3f}".format(*stats['lag']))
+    print(f"queries        {total_queries:,} ({', '.join(f'{k} {v:,}' for k, v in queries.items())}), "
+          f"{total_queries / stats['timers']:.3f} per timer")
+    print(f"deletes        {queries['delete'] / max(stats['stored'], 1):.3f} per stored timer")
+    print(f"clock waits    {stats['waits']:,}, {stats['waits'] / stats['timers']:.3f} per timer")
+    print(f"cpu            {stats['cpu'] * 1e6 / max(stats['dispatched'], 1):.1f} us per dispatched timer "
+          f"({stats['cpu']:.2f} s cpu, {stats['wall']:.2f} s wall)")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,7 @@
 import collections
 from inspect import trace
 import re
-from typing import List, Optional, Tuple, Union
+from typing import Optional, Tuple, Union
 import typing
 import discord
 from discord.ext import commands
@@ -16,10 +16,14 @@ from discord.ext.commands.converter import Option
 import mystbin
 import aiohttp
 import logging
-from utils.checks import check_dev
+from utils.checks import SUPPORT_GUILD, TESTER_ROLE, check_dev
 from utils.constants import EMOTES
 
 from utils.useful import Cooldown
+from utils.cache_utils import InvalidationBus
+from utils.reaction_utils import ReactionRouter
+from utils.role_utils import MemberEditLimiter
+from utils.job_utils import JobManager
 from utils.json_loader import read_json
 from utils.errors import UserBlacklisted
 from utils.custom_context import MyContext
@@ -151,8 +155,32 @@ class MetroBot(commands.AutoShardedBot):
         self.uptime = discord.utils.utcnow()
 
         #Cache
-        self.prefixes = {}
+        self.prefixes : typing.Dict[int, Tuple[str, ...]] = {} # Only guilds with custom prefixes
+        self.prefix_matchers : typing.Dict[Optional[int], Tuple[str, ...]] = {} # None is the default prefixes
         self.blacklist = {}
+        self.testers : typing.Set[int] = set() # Members with the tester role in the support guild
+
+        # Cogs register the reactions they care about instead of listening to all of them
+        self.reactions = ReactionRouter()
+        # Shared so everything editing members stays inside each guild's rate limit
+        self.member_edits = MemberEditLimiter()
+
+        try:
+            self.loop.run_until_complete(self.load_prefixes())
+        except Exception as e:
+            # Default prefixes only until this works, don't keep the bot from starting
+            print(''.join(traceback.format_exception(type(e), e, e.__traceback__)))
+            self.loop.create_task(self.retry_load_prefixes())
+
+        # Keep caches in sync with other processes
+        self.cache_bus = InvalidationBus(self.db)
+        self.cache_bus.register('prefixes', self.refresh_prefixes)
+        self.cache_bus.register('blacklist', self.refresh_blacklist)
+        self.loop.create_task(self.cache_bus.run())
+
+        # Bulk jobs that survive restarts, cogs register the kinds they start
+        self.jobs = JobManager(self.db)
+        self.loop.create_task(self.resume_jobs())
 
         #Tracking
         self.message_stats = collections.Counter()
@@ -174,6 +202,7 @@ class MetroBot(commands.AutoShardedBot):
         except asyncpg.exceptions.UniqueViolationError:
             raise commands.BadArgument(f"This user is already blacklisted.")
         self.blacklist[member.id] = True
+        await self.cache_bus.publish('blacklist', member.id)
 
         if silent is False:
             await ctx.send(f"{self.check} Added **{member}** to the bot blacklist.")
@@ -184,6 +213,7 @@ class MetroBot(commands.AutoShardedBot):
                 """
         await self.db.execute(query, member.id)
         self.blacklist[member.id] = False
+        await self.cache_bus.publish('blacklist', member.id)
         await ctx.send(f"{self.check} Removed **{member}** from the bot blacklist.")
 
 
@@ -211,6 +241,10 @@ class MetroBot(commands.AutoShardedBot):
             else:
                 continue
 
+        support_guild = self.get_guild(SUPPORT_GUILD)
+        if support_guild:
+            self.load_testers(support_guild)
+
         print(
             f"-----\nLogged in as: {self.user.name} : {self.user.id}\n-----\nMy default prefix{'es are' if len(self.PRE) >= 2 else ' is'}: {', '.join(self.PRE) if len(self.PRE) >= 2 else self.PRE[0]}\n-----")
 
@@ -228,6 +262,45 @@ class MetroBot(commands.AutoShardedBot):
         self.owner = user
 
 
+    async def resume_jobs(self):
+        await self.wait_until_ready()
+
+        # Jobs belong to whichever process has the guild
+        resumed = await self.jobs.resume(lambda guild_id: self.get_guild(guild_id) is not None)
+        if resumed:
+            print(f"Resumed {resumed} unfinished job(s)")
+
+    def load_testers(self, guild : discord.Guild):
+        role = guild.get_role(TESTER_ROLE)
+        self.testers = {member.id for member in role.members} if role else set()
+
+    async def on_guild_available(self, guild : discord.Guild):
+        if guild.id == SUPPORT_GUILD:
+            self.load_testers(guild) # Reconnects can miss member updates
+
+    async def on_member_update(self, before : discord.Member, after : discord.Member):
+        if after.guild.id != SUPPORT_GUILD:
+            return
+
+        if after._roles.has(TESTER_ROLE):
+            self.testers.add(after.id)
+        else:
+            self.testers.discard(after.id)
+
+    async def on_member_remove(self, member : discord.Member):
+        if member.guild.id == SUPPORT_GUILD:
+            self.testers.discard(member.id)
+
+    async def on_guild_role_delete(self, role : discord.Role):
+        if role.id == TESTER_ROLE:
+            self.testers.clear()
+
+    async def on_raw_reaction_add(self, payload : discord.RawReactionActionEvent):
+        self.reactions.dispatch('add', payload)
+
+    async def on_raw_reaction_remove(self, payload : discord.RawReactionActionEvent):
+        self.reactions.dispatch('remove', payload)
+
     def add_command(self, command):
         """Override `add_command` to make a default cooldown for every command"""
 
@@ -259,27 +332,77 @@ class MetroBot(commands.AutoShardedBot):
 
         await self.invoke(ctx)
 
-    async def get_pre(self, bot, message : discord.Message, raw_prefix : Optional[bool] = False) -> List[str]:
-        if not message:
-            return commands.when_mentioned_or(*self.PRE)(bot, message) if not raw_prefix else self.PRE
-        if not message.guild:
-            return commands.when_mentioned_or(*self.PRE)(bot, message) if not raw_prefix else self.PRE
+    async def load_prefixes(self):
+        """Load every guild's custom prefixes, so get_pre never has to query."""
+
+        query = """
+                SELECT guild_id, ARRAY_AGG(prefix) AS prefixes
+                FROM prefixes GROUP BY guild_id;
+                """
         try:
-            prefix = self.prefixes[message.guild.id]
-          
-        except KeyError:
-            prefix = [x['prefix'] for x in 
-                    await self.db.fetch("SELECT prefix FROM prefixes WHERE guild_id = $1", message.guild.id)] or self.PRE
-            self.prefixes[message.guild.id] = prefix
-        
-        if check_dev(bot, message.author) and self.noprefix is True:
-            return commands.when_mentioned_or(*prefix, "")(bot, message) if not raw_prefix else prefix
-        return commands.when_mentioned_or(*prefix)(bot, message) if not raw_prefix else prefix
-         
-
-    async def fetch_prefixes(self, message : discord.Message):
-        return tuple([x['prefix'] for x in
-            await self.db.fetch('SELECT prefix from prefixes WHERE guild_id = $1', message.guild.id)]) or self.PRE
+            records = await self.db.fetch(query)
+        except asyncpg.UndefinedTableError:
+            records = [] # First start, the table is created by the startup scripts
+        self.prefixes = {record["guild_id"]: tuple(record["prefixes"]) for record in records}
+        self.prefix_matchers.clear()
+
+    async def retry_load_prefixes(self):
+        await self.wait_until_ready()
+        await self.load_prefixes()
+
+    async def refresh_prefixes(self, guild_id : Optional[str]):
+        """Another process changed a guild's prefixes, or all of them if `guild_id` is None."""
+
+        if guild_id is None:
+            return await self.load_prefixes()
+
+        records = await self.db.fetch("SELECT prefix FROM prefixes WHERE guild_id = $1", int(guild_id))
+        self.set_prefixes(int(guild_id), [record["prefix"] for record in records])
+
+    async def refresh_blacklist(self, member_id : Optional[str]):
+        """Another process changed someone's blacklist entry, or everyone's if `member_id` is None."""
+
+        if member_id is None:
+            records = await self.db.fetch("SELECT member_id FROM blacklist WHERE is_blacklisted = True")
+            self.blacklist = {record["member_id"]: True for record in records}
+            return
+
+        query = "SELECT is_blacklisted FROM blacklist WHERE member_id = $1"
+        self.blacklist[int(member_id)] = bool(await self.db.fetchval(query, int(member_id)))
+
+    def set_prefixes(self, guild_id : int, prefixes : typing.Iterable[str]):
+        """Update the cache after writing to the prefixes table. No prefixes means the defaults."""
+
+        prefixes = tuple(prefixes)
+        if prefixes:
+            self.prefixes[guild_id] = prefixes
+        else:
+            self.prefixes.pop(guild_id, None)
+        self.prefix_matchers.pop(guild_id, None)
+
+    def compile_prefixes(self, prefixes : typing.Iterable[str]) -> Tuple[str, ...]:
+        """Mentions and `prefixes`, longest first so a short prefix never shadows a longer one."""
+
+        mentions = (f'<@{self.user.id}> ', f'<@!{self.user.id}> ')
+        return tuple(sorted(set(mentions).union(prefixes), key=len, reverse=True))
+
+    async def get_pre(self, bot, message : discord.Message, raw_prefix : Optional[bool] = False) -> Tuple[str, ...]:
+        guild_id = message.guild.id if message and message.guild else None
+        key = guild_id if guild_id in self.prefixes else None
+
+        if raw_prefix:
+            return self.prefixes.get(key, self.PRE)
+
+        matcher = self.prefix_matchers.get(key)
+        if matcher is None:
+            matcher = self.prefix_matchers[key] = self.compile_prefixes(self.prefixes.get(key, self.PRE))
+
+        if self.noprefix is True and message and check_dev(bot, message.author):
+            return matcher + ("",)
+        return matcher
+
+    async def fetch_prefixes(self, message : discord.Message) -> Tuple[str, ...]:
+        return self.prefixes.get(message.guild.id, self.PRE)
 
 
     async def get_or_fetch_member(self, guild, member_id) -> Optional[discord.Member]:
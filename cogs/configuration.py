@@ -1,12 +1,8 @@
 import discord
 from discord.ext import commands
 
-import asyncpg
 
-
-from collections import defaultdict
-
-from typing import Optional, Union
+from typing import Dict, Optional, Union
 
 from bot import MetroBot
 
@@ -14,6 +10,7 @@ from bot import MetroBot
 from cogs.moderation import Arguments
 import shlex
 from utils.checks import check_dev
+from utils.config_utils import GuildConfig
 
 from utils.converters import ChannelOrRoleOrMember, DiscordCommand, RoleConverter
 from utils.useful import Embed
@@ -35,72 +32,113 @@ class configuration(commands.Cog, description='Configure the bot/server.'):
     def __init__(self, bot : MetroBot):
         self.bot = bot
 
-        bot.loop.create_task(self.load_command_config())
-        bot.loop.create_task(self.load_plonks())
-        
-        self.ignored = defaultdict(list)
-        self.command_config = defaultdict(list)
+        bot.loop.create_task(self.load_configs())
+
+        self.configs : Dict[int, GuildConfig] = {} # guild_id: snapshot, only guilds with something configured
+        self.empty_config = GuildConfig()
+        self._changed_during_load : Optional[set] = None # Guilds updated while every config is being reloaded
+        bot.cache_bus.register('config', self.refresh_config)
+
+    def cog_unload(self):
+        self.bot.cache_bus.unregister('config', self.refresh_config)
 
     @property
     def emoji(self) -> str:
         return '⚙️'
 
-    async def load_plonks(self):
-        await self.bot.wait_until_ready()
-        query = """
-                SELECT server_id, ARRAY_AGG(entity_id) AS entities
-                FROM plonks GROUP BY server_id;
-                """
-        records = await self.bot.db.fetch(query)
-        if records:
-            [
-                self.ignored[record["server_id"]].extend(record["entities"])
-                for record in records
-            ]   
+    def get_config(self, guild_id : int) -> GuildConfig:
+        return self.configs.get(guild_id, self.empty_config)
+
+    def set_config(self, guild_id : int, config : GuildConfig):
+        if self._changed_during_load is not None:
+            self._changed_during_load.add(guild_id)
+        if config:
+            self.configs[guild_id] = config
+        else:
+            self.configs.pop(guild_id, None)
+
+    async def update_config(self, guild_id : int, config : GuildConfig):
+        """Swap in a guild's new snapshot after a write and tell the other processes."""
+
+        self.set_config(guild_id, config)
+        await self.bot.cache_bus.publish('config', guild_id)
 
-    async def load_command_config(self):
+    async def refresh_config(self, guild_id : Optional[str]):
+        """Another process changed a guild's config, or every guild's if `guild_id` is None."""
+
+        if guild_id is None:
+            await self.load_configs()
+            return
+
+        guild_id = int(guild_id)
+        ignored = await self.bot.db.fetch("SELECT entity_id FROM plonks WHERE server_id = $1", guild_id)
+        records = await self.bot.db.fetch("SELECT entity_id, command FROM command_config WHERE server_id = $1", guild_id)
+        disabled = {}
+        for record in records:
+            disabled.setdefault(record["command"], set()).add(record["entity_id"])
+        self.set_config(guild_id, GuildConfig([record["entity_id"] for record in ignored], disabled))
+
+    async def load_configs(self):
+        """
+        Load every guild's config and swap them all in at once,
+        so checks keep using the old snapshots until the new ones are ready.
+        """
         await self.bot.wait_until_ready()
-        query = """
-                SELECT entity_id, ARRAY_AGG(command) AS commands
-                FROM command_config GROUP BY entity_id;
-                """
-        records = await self.bot.db.fetch(query)
-        if records:
-            [
-                self.command_config[record["entity_id"]].extend(record["commands"])
-                for record in records
-            ]
+
+        self._changed_during_load = changed = set()
+        try:
+            query = """
+                    SELECT server_id, ARRAY_AGG(entity_id) AS entities
+                    FROM plonks GROUP BY server_id;
+                    """
+            plonks = await self.bot.db.fetch(query)
+            query = """
+                    SELECT server_id, command, ARRAY_AGG(entity_id) AS entities
+                    FROM command_config GROUP BY server_id, command;
+                    """
+            command_config = await self.bot.db.fetch(query)
+        finally:
+            self._changed_during_load = None
+
+        ignored = {record["server_id"]: record["entities"] for record in plonks}
+        disabled = {}
+        for record in command_config:
+            disabled.setdefault(record["server_id"], {})[record["command"]] = record["entities"]
+
+        configs = {}
+        for guild_id in ignored.keys() | disabled.keys():
+            config = GuildConfig(ignored.get(guild_id, ()), disabled.get(guild_id))
+            if config:
+                configs[guild_id] = config
+        for guild_id in changed: # Written here meanwhile, that snapshot is at least as new
+            configs.pop(guild_id, None)
+            if guild_id in self.configs:
+                configs[guild_id] = self.configs[guild_id]
+        self.configs = configs
 
     async def ignore_entities(self, ctx : MyContext, entities):
-        failed = []
-        success = []
+        entities = {entity.id: entity for entity in entities}
         query = """
                 INSERT INTO plonks (server_id, entity_id)
-                VALUES ($1, $2)
+                SELECT $1, entity_id FROM UNNEST($2::BIGINT[]) AS entity_id
+                ON CONFLICT DO NOTHING
+                RETURNING entity_id;
                 """
 
-        async with self.bot.db.acquire() as conn:
-            async with conn.transaction():
-                for entity in entities:
-                    try:
-                        await self.bot.db.execute(query, ctx.guild.id, entity.id)
-                    except asyncpg.exceptions.UniqueViolationError:
-                        failed.append((str(entity), "Entity is already being ignored"))
-                    except Exception as e:
-                        failed.append(str(entity), e)
-                        continue
-                    else:
-                        success.append(str(entity))
-                        self.ignored[ctx.guild.id].append(entity.id)
-
+        # One statement for the whole batch, the cache only changes once it's committed
+        records = await self.bot.db.fetch(query, ctx.guild.id, list(entities))
+        ignored = {record["entity_id"] for record in records}
+        await self.update_config(ctx.guild.id, self.get_config(ctx.guild.id).ignore(*ignored))
 
+        success = [str(entity) for entity_id, entity in entities.items() if entity_id in ignored]
+        failed = [str(entity) for entity_id, entity in entities.items() if entity_id not in ignored]
         if success:
             await ctx.send(
                 f"Ignored entit{'y' if len(success) == 1 else 'ies'} `{', '.join(success)}`"
             )
         if failed:
             await ctx.send(
-                f'\n'.join(failed)
+                f"Already being ignored: `{', '.join(failed)}`"
             )
 
     async def bot_check_once(self, ctx):
@@ -109,6 +147,10 @@ class configuration(commands.Cog, description='Configure the bot/server.'):
         if ctx.guild is None:
             return True  # Do not restrict in DMs.
 
+        config = self.configs.get(ctx.guild.id)
+        if config is None or not config.ignored:
+            return True  # Nothing ignored here.
+
         if check_dev(ctx.bot, ctx.author):
             return True
 
@@ -116,27 +158,19 @@ class configuration(commands.Cog, description='Configure the bot/server.'):
             if ctx.author.guild_permissions.manage_guild:
                 return True  # Manage guild is immune.
 
-        # Now check channels, roles, and users.
-        if ctx.channel.id in self.ignored[ctx.guild.id]:
-            return False  # Channel is ignored.
-
-        if ctx.author.id in self.ignored[ctx.guild.id]:
-            return False  # User is ignored.
-
-        if any(
-            (
-                role_id in self.ignored[ctx.guild.id]
-                for role_id in [r.id for r in ctx.author.roles]
-            )
-        ):
-            return False  # Role is ignored.
-
-        return True  # Ok just in case we get here...
+        # Now check the guild, channel, user and roles.
+        return not config.is_ignored(
+            ctx.guild.id, ctx.channel.id, ctx.author.id, getattr(ctx.author, '_roles', ())
+        )
 
     async def bot_check(self, ctx):
         if ctx.guild is None:
             return True  # Do not restrict in DMs.
 
+        config = self.configs.get(ctx.guild.id)
+        if config is None or not config.disabled:
+            return True  # Nothing disabled here.
+
         if check_dev(ctx.bot, ctx.author):
             return True  # Bot devs are immune.
 
@@ -144,64 +178,35 @@ class configuration(commands.Cog, description='Configure the bot/server.'):
             if ctx.author.guild_permissions.manage_guild:
                 return True  # Manage guild is immune.
 
-
-        if str(ctx.command) in self.command_config[ctx.guild.id]:
-            return False  # Disabled for the whole server.
-
-        if str(ctx.command) in self.command_config[ctx.channel.id]:
-            return False  # Disabled for the channel
-
-        if str(ctx.command) in self.command_config[ctx.author.id]:
-            return False  # Disabled for the user
-
-        if any(
-            (
-                str(ctx.command) in self.command_config[role_id]
-                for role_id in ctx.author._roles
-            )
-        ):
-            return False  # Disabled for the role
-
-        return True  # Ok just in case we get here...
+        # Disabled for the whole server, the channel, the user or one of their roles.
+        return not config.is_disabled(
+            str(ctx.command), ctx.guild.id, ctx.channel.id, ctx.author.id, getattr(ctx.author, '_roles', ())
+        )
 
     async def disable_command(self, ctx, entity, commands):
+        commands = list(dict.fromkeys(commands))
         query = """
                 INSERT INTO command_config (server_id, entity_id, command)
-                VALUES ($1, $2, $3);
+                SELECT $1, $2, command FROM UNNEST($3::TEXT[]) AS command
+                ON CONFLICT DO NOTHING
+                RETURNING command;
                 """
-        failed = []
-        success = []
-        async with self.bot.db.acquire() as conn:
-            async with conn.transaction():
-                for command in commands:
-                    try:
-                        await self.bot.db.execute(
-                            query, ctx.guild.id, entity.id, command
-                        )
-                    except asyncpg.exceptions.UniqueViolationError:
-                        failed.append(
-                            (
-                                command,
-                                f"Command is already disabled for entity `{entity}`",
-                            )
-                        )
-                        continue
-                    except Exception as e:
-                        failed.append((command, e))
-                        continue
-                    else:
-                        success.append(command)
-                        self.command_config[entity.id].append(command)
+
+        # One statement for the whole batch, the cache only changes once it's committed
+        records = await self.bot.db.fetch(query, ctx.guild.id, entity.id, commands)
+        success = [record["command"] for record in records]
+        await self.update_config(ctx.guild.id, self.get_config(ctx.guild.id).disable(entity.id, success))
+
+        failed = [command for command in commands if command not in success]
         if success:
             await ctx.send(
                 f"Disabled command{'' if len(success) == 1 else 's'} `{', '.join(success)}` for entity `{entity}`"
             )
         if failed:
             await ctx.send(
-                f"Failed to disable the following commands: `{','.join(failed)}`"
+                f"Command{'' if len(failed) == 1 else 's'} `{', '.join(failed)}` already disabled for entity `{entity}`"
             )
 
-    
     async def enable_command(self, ctx, entity, commands):
         query = """
                 DELETE FROM command_config
@@ -210,9 +215,7 @@ class configuration(commands.Cog, description='Configure the bot/server.'):
                 AND command = ANY($3::TEXT[]);
                 """
         await self.bot.db.execute(query, ctx.guild.id, entity.id, commands)
-        self.command_config[entity.id] = [
-            x for x in self.command_config[entity.id] if x not in commands
-        ]
+        await self.update_config(ctx.guild.id, self.get_config(ctx.guild.id).enable(entity.id, commands))
         await ctx.send(
             f"Enabled commands `{', '.join(commands)}` for entity `{entity}`"
         )
@@ -409,6 +412,7 @@ class configuration(commands.Cog, description='Configure the bot/server.'):
         await ctx.trigger_typing()
         query = "DELETE FROM command_config WHERE server_id = $1;"
         await self.bot.db.execute(query, ctx.guild.id)
+        await self.update_config(ctx.guild.id, self.get_config(ctx.guild.id).without_disabled())
 
         await ctx.send('Cleared the server\'s disabled command list.')
 
@@ -554,7 +558,7 @@ class configuration(commands.Cog, description='Configure the bot/server.'):
                 """
 
         await self.bot.db.execute(query, ctx.guild.id)
-        self.ignored[ctx.guild.id].clear()
+        await self.update_config(ctx.guild.id, self.get_config(ctx.guild.id).without_ignored())
         await ctx.send(f'Cleared the server\'s ignored list.')
 
 
@@ -578,9 +582,7 @@ class configuration(commands.Cog, description='Configure the bot/server.'):
         entries = [c.id for c in entities]
 
         await self.bot.db.execute(query, ctx.guild.id, entries)
-        self.ignored[ctx.guild.id] = [
-            x for x in self.ignored[ctx.guild.id] if not x in entries
-        ]
+        await self.update_config(ctx.guild.id, self.get_config(ctx.guild.id).unignore(*entries))
         await ctx.send(
             f'Removed `{", ".join([str(x) for x in entries])}` from the ignored list.'
         )
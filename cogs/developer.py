@@ -289,6 +289,47 @@ class developer(commands.Cog, description="Developer commands."):
             await ctx.send(f'Left **{guild.name}** (ID: {guild.id})')
 
 
+    @developer_cmds.command(name='reactions')
+    @commands.is_owner()
+    async def dev_reactions(self, ctx : MyContext):
+        """Show how many raw reactions each handler was sent."""
+
+        stats = self.bot.reactions.stats
+        handlers = [(name, count) for name, count in stats.most_common() if name not in ('events', 'dropped')]
+
+        embed = Embed()
+        embed.add_field(name='Events', value=f"{stats['events']:,}")
+        embed.add_field(name='Dropped', value=f"{stats['dropped']:,}")
+        embed.add_field(name='Routes', value=f"{len(self.bot.reactions):,}")
+        embed.description = '\n'.join(f"`{name}` {count:,}" for name, count in handlers) or 'No reactions routed yet.'
+
+        cog = self.bot.get_cog('reactionroles')
+        if cog:
+            changes = cog.role_changes.stats
+            embed.add_field(name='Role changes', value=f"{changes['changes']:,} ({changes['coalesced']:,} coalesced)")
+            embed.add_field(name='Member edits', value=f"{changes['flushes']:,} ({len(cog.role_changes):,} waiting)")
+        await ctx.send(embed=embed)
+
+    @developer_cmds.command(name='jobs')
+    @commands.is_owner()
+    async def dev_jobs(self, ctx : MyContext, cancel : Optional[int] = None):
+        """Show the background jobs running in this process, or cancel one by ID."""
+
+        if cancel is not None:
+            if not await self.bot.jobs.cancel(cancel):
+                return await ctx.send(f'Job {cancel} is not running.')
+            return await ctx.check()
+
+        jobs = list(self.bot.jobs.running.values())
+        if not jobs:
+            return await ctx.send('No jobs running.')
+
+        to_paginate = [
+            f"`{job.id}` **{job.kind}** in {job.guild_id} - {job.processed:,}/{len(job):,} ({job.rate:.1f}/s)"
+            for job in jobs
+        ]
+        await ctx.paginate(to_paginate)
+
     @developer_cmds.command(name='noprefix')
     @commands.is_owner()
     async def dev_noprefix(self, ctx):
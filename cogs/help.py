@@ -348,7 +348,7 @@ class NewHelpView(discord.ui.View):
 
         embed.add_field(name='Guilds', value=guilds)
 
-        count = await self.bot.db.fetchval('SELECT COUNT(*) as c FROM messages')
+        count = await self.bot.db.fetchval('SELECT COALESCE(SUM(count), 0) AS c FROM message_totals')
 
         embed.add_field(name='Messages', value=count)
         embed.add_field(name='Uptime', value=get_bot_uptime(self.bot, brief=True))
@@ -24,6 +24,7 @@ from humanize.time import precisedelta
 
 from utils import remind_utils
 from utils.useful import Cooldown, Embed
+from utils.job_utils import edit_progress
 
 SUPPORT_ROLE = 814018291353124895
 
@@ -181,10 +182,30 @@ class moderation(commands.Cog, description="Moderation commands."):
     def __init__(self, bot : MetroBot):
         self.bot = bot
 
+        # Bans share a small bucket, discord.py paces them
+        bot.jobs.register('ban', self.ban_job_factory, concurrency=1)
+
     @property
     def emoji(self) -> str:
         return '🔨'
 
+    async def ban_job_factory(self, record):
+        guild = self.bot.get_guild(record['guild_id'])
+        if guild is None:
+            return None
+        reason = json.loads(record['extra'])['reason']
+
+        async def action(user_id: int):
+            await guild.ban(discord.Object(id=user_id), reason=reason)
+
+        def status(job) -> str:
+            if job.finished is None:
+                return f"Banning... {job.processed:,}/{len(job):,}"
+            canceled = "Canceled. " if job.status == 'cancelled' else ""
+            return f"{canceled}Banned {job.stats['done']:,}/{len(job):,} members."
+
+        return action, edit_progress(self.bot, record, status)
+
     @commands.command(name="kick", brief="Kick a member from the server.")
     @commands.has_guild_permissions(kick_members=True)
     @commands.bot_has_permissions(send_messages=True, kick_members=True)
@@ -407,17 +428,11 @@ class moderation(commands.Cog, description="Moderation commands."):
         if confirm is False:
             return await ctx.send('Canceled.')
         
-        d = await ctx.send("Banning...")
-
-        fails = 0
-        for member in members:
-            try:
-                await ctx.guild.ban(member, reason=reason)
-            except:
-                fails += 1
-
-        await d.delete(silent=True)
-        await ctx.send(f'Banned {total_members-fails}/{total_members} members.')
+        message = await ctx.send("Banning...")
+        await self.bot.jobs.create(
+            'ban', ctx.guild.id, ctx.author.id, [member.id for member in members],
+            extra={'reason': reason}, channel_id=ctx.channel.id, message_id=message.id
+        )
 
     @commands.command()
     @commands.bot_has_permissions(send_messages=True)
@@ -1137,7 +1152,8 @@ class moderation(commands.Cog, description="Moderation commands."):
                 failed.append(f"• `{user}` was already muted")
                 continue
 
-            await self.bot.db.fetchval("DELETE FROM reminders WHERE event = 'mute' AND extra->'kwargs'->>'user_id' = $1", str(user.id))
+            records = await self.bot.db.fetch("DELETE FROM reminders WHERE event = 'mute' AND guild_id = $1 AND target_id = $2 RETURNING id", ctx.guild.id, user.id)
+            reminder_cog.timers.remove(*[record['id'] for record in records])
             try:
                 if endtime:
                     timer = await reminder_cog.create_timer(
@@ -1244,9 +1260,10 @@ class moderation(commands.Cog, description="Moderation commands."):
                     select (id, extra)
                     from reminders
                     where event = 'mute'
-                    and extra->'kwargs'->>'user_id' = $1
+                    and guild_id = $1
+                    and target_id = $2
                     """
-            s = await self.bot.db.fetchval(query, str(user.id))
+            s = await self.bot.db.fetchval(query, ctx.guild.id, user.id)
             if not s:
                 await user.remove_roles(muterole)
 
@@ -1271,6 +1288,7 @@ class moderation(commands.Cog, description="Moderation commands."):
                         WHERE id = $1
                         """
                 await self.bot.db.execute(query, task_id)
+                reminder_cog.timers.remove(task_id)
 
                 em = Embed()
                 em.colour = discord.Colour.yellow()
@@ -1323,9 +1341,10 @@ class moderation(commands.Cog, description="Moderation commands."):
                 SELECT (expires, extra, created)
                 FROM reminders
                 WHERE event = 'mute'
+                AND guild_id = $1
                 ORDER BY expires;
                 """
-        records = await self.bot.db.fetch(query)
+        records = await self.bot.db.fetch(query, ctx.guild.id)
         if not records:
             return await ctx.send("No one is muted in this guild.")
 
@@ -1406,7 +1425,8 @@ class moderation(commands.Cog, description="Moderation commands."):
         except discord.HTTPException:
             raise commands.BadArgument(f"I am having trouble adding `@{muterole.name}` to your roles.")
 
-        await self.bot.db.fetchval("DELETE FROM reminders WHERE event = 'mute' AND extra->'kwargs'->>'user_id' = $1", str(ctx.author.id))
+        records = await self.bot.db.fetch("DELETE FROM reminders WHERE event = 'mute' AND guild_id = $1 AND target_id = $2 RETURNING id", ctx.guild.id, ctx.author.id)
+        reminder_cog.timers.remove(*[record['id'] for record in records])
         try:
             await reminder_cog.create_timer(
                         duration.dt.replace(tzinfo=None),
@@ -1,10 +1,13 @@
-from typing import Optional, Union
+from collections import Counter
+from typing import Dict, Optional, Tuple, Union
 import discord
 from discord.ext import commands
 
 from bot import MetroBot
 from utils.custom_context import MyContext
 from utils.converters import RoleConverter
+from utils.reaction_utils import EmojiKey, emoji_key
+from utils.role_utils import RoleCoalescer
 
 def setup(bot: MetroBot):
     bot.add_cog(reactionroles(bot))
@@ -13,9 +16,47 @@ class reactionroles(commands.Cog, description='Manage the reaction role system.'
     def __init__(self, bot: MetroBot):
         self.bot = bot
 
-        self.reactionroles = {}
+        self.reactionroles: Dict[Tuple[int, EmojiKey], int] = {} # (message_id, emoji id or name): role_id
+        self.messages = Counter() # message_id: reaction roles on it
+        self.role_changes = RoleCoalescer(self.apply_role_changes, bot.member_edits)
 
         bot.loop.create_task(self.load_reactionroles())
+        bot.cache_bus.register('reactionroles', self.refresh_reactionroles)
+
+    def cog_unload(self):
+        self.bot.cache_bus.unregister('reactionroles', self.refresh_reactionroles)
+        self._unregister_routes()
+
+    def _unregister_routes(self):
+        self.bot.reactions.unregister_all(self.add_reaction_role_handler)
+        self.bot.reactions.unregister_all(self.remove_reaction_role_handler)
+
+    @staticmethod
+    def key(message_id: int, emoji: str) -> Tuple[int, EmojiKey]:
+        """Index key for an emoji as stored, `<:name:id>` or the unicode emoji."""
+        return message_id, emoji_key(discord.PartialEmoji.from_str(emoji))
+
+    def cache(self, message_id: int, emoji: str, role_id: int):
+        key = self.key(message_id, emoji)
+        if key not in self.reactionroles:
+            self.messages[message_id] += 1
+        self.reactionroles[key] = role_id
+
+    def uncache(self, message_id: int, emoji: str):
+        if self.reactionroles.pop(self.key(message_id, emoji), None) is not None:
+            self.messages[message_id] -= 1
+            if self.messages[message_id] <= 0:
+                del self.messages[message_id]
+
+    def sync_route(self, message_id: int):
+        """Only route reactions on `message_id` here while it has reaction roles."""
+
+        if message_id in self.messages:
+            self.bot.reactions.register(self.add_reaction_role_handler, message_id=message_id, events=('add',))
+            self.bot.reactions.register(self.remove_reaction_role_handler, message_id=message_id, events=('remove',))
+        else:
+            self.bot.reactions.unregister(self.add_reaction_role_handler, message_id=message_id)
+            self.bot.reactions.unregister(self.remove_reaction_role_handler, message_id=message_id)
 
     @property
     def emoji(self) -> str:
@@ -25,66 +66,82 @@ class reactionroles(commands.Cog, description='Manage the reaction role system.'
         await self.bot.wait_until_ready()
 
         query = """
-                SELECT (emoji, message_id, role_id)
+                SELECT emoji, message_id, role_id
                 FROM reactionroles
                 """
         records = await self.bot.db.fetch(query)
-        if records:
-            for record in records:
-                try:
-                    self.reactionroles[record['row'][0]][record['row'][1]] = record['row'][2]
-                except KeyError:
-                    self.reactionroles[record['row'][0]] = {record['row'][1]: record['row'][2]}
-
-    @commands.Cog.listener('on_raw_reaction_add')
-    async def add_reaction_role_handler(self, payload: discord.RawReactionActionEvent):
-        if not payload.guild_id:
-            return 
+        for record in records:
+            self.cache(record['message_id'], record['emoji'], record['role_id'])
+        for message_id in self.messages:
+            self.sync_route(message_id)
 
-        data = self.reactionroles.get(str(payload.emoji))
-        if not data:
-            return # Not in cache, we aren't gonna try
+    async def refresh_reactionroles(self, message_id: Optional[str]):
+        """Another process changed a message's reaction roles, or all of them if `message_id` is None."""
 
-        guild = self.bot.get_guild(payload.guild_id)
-        if not guild:
-            return # Somehow this is possible when we check the guild_id but why not be safe
+        if message_id is None:
+            self._unregister_routes()
+            self.reactionroles = {}
+            self.messages.clear()
+            return await self.load_reactionroles()
 
-        member = await self.bot.get_or_fetch_member(guild, payload.user_id)
-        if not member:
-            return # can't find member for some odd reason?
+        message_id = int(message_id)
+        for key in [key for key in self.reactionroles if key[0] == message_id]:
+            del self.reactionroles[key]
+        self.messages.pop(message_id, None)
 
-        role = data.get(payload.message_id)
-        if not role:
-            return # Somehow role isn't found :(
+        query = """
+                SELECT emoji, role_id
+                FROM reactionroles
+                WHERE message_id = $1
+                """
+        for record in await self.bot.db.fetch(query, message_id):
+            self.cache(message_id, record['emoji'], record['role_id'])
+        self.sync_route(message_id)
+
+    def role_for(self, payload: discord.RawReactionActionEvent) -> Optional[int]:
+        if not payload.guild_id or payload.user_id == self.bot.user.id:
+            return None # Ignore our own reaction from `rr add`
+        return self.reactionroles.get((payload.message_id, emoji_key(payload.emoji)))
+
+    async def add_reaction_role_handler(self, payload: discord.RawReactionActionEvent):
+        role_id = self.role_for(payload)
+        if role_id is not None:
+            self.role_changes.queue(payload.guild_id, payload.user_id, role_id, True, member=payload.member)
 
-        try:
-            await member.add_roles(discord.Object(role), reason='reactionroleadd')
-        except discord.HTTPException:
-            pass # no perms, can't really do anything...
-            
-    @commands.Cog.listener('on_raw_reaction_remove') #honestly an inverse of on_raw_reaction_add
     async def remove_reaction_role_handler(self, payload: discord.RawReactionActionEvent):
-        if not payload.guild_id:
-            return 
+        role_id = self.role_for(payload)
+        if role_id is not None:
+            self.role_changes.queue(payload.guild_id, payload.user_id, role_id, False)
 
-        data = self.reactionroles.get(str(payload.emoji))
-        if not data:
-            return # Not in cache, we aren't gonna try
+    async def apply_role_changes(self, guild_id: int, member_id: int, member: Optional[discord.Member], changes: Dict[int, bool]):
+        """Apply a member's coalesced reaction role changes with as few requests as possible."""
 
-        guild = self.bot.get_guild(payload.guild_id)
+        guild = self.bot.get_guild(guild_id)
         if not guild:
-            return # Somehow this is possible when we check the guild_id but why not be safe
+            return
 
-        member = await self.bot.get_or_fetch_member(guild, payload.user_id)
+        # Add payloads carry the member, removes don't
+        member = guild.get_member(member_id) or member or await self.bot.get_or_fetch_member(guild, member_id)
         if not member:
             return # can't find member for some odd reason?
 
-        role = data.get(payload.message_id)
-        if not role:
-            return # Somehow role isn't found :(
+        current = set(member._roles)
+        changes = {role_id: add for role_id, add in changes.items() if add != (role_id in current)}
+        if not changes:
+            return # Added and removed again, or already in that state
 
         try:
-            await member.remove_roles(discord.Object(role), reason='reactionroleadd')
+            if len(changes) == 1:
+                # One role only touches that role, so nothing else changing meanwhile is overwritten
+                [(role_id, add)] = changes.items()
+                method = member.add_roles if add else member.remove_roles
+                await method(discord.Object(role_id), reason='reactionrole')
+            else:
+                # Everything merged in the window goes out as one edit. The coalescer only runs one
+                # flush per member at a time, so our own changes can't race each other here.
+                adds = {role_id for role_id, add in changes.items() if add}
+                roles = (current | adds) - (changes.keys() - adds)
+                await member.edit(roles=[discord.Object(role_id) for role_id in roles], reason='reactionrole')
         except discord.HTTPException:
             pass # no perms, can't really do anything...
 
@@ -132,10 +189,9 @@ class reactionroles(commands.Cog, description='Manage the reaction role system.'
                 """
         await self.bot.db.execute(query, ctx.guild.id, message.channel.id, message.id, role.id, str(emoji))
         
-        try:
-            self.reactionroles[str(emoji)][message.id] = role.id
-        except KeyError:
-            self.reactionroles[str(emoji)] = {message.id: role.id}
+        self.cache(message.id, str(emoji), role.id)
+        self.sync_route(message.id)
+        await self.bot.cache_bus.publish('reactionroles', message.id)
 
         await message.add_reaction(emoji)
         await ctx.send(f"{self.bot.emotes['check']} Added \"{emoji}\" to hand out **{role.name}**", allowed_mentions=discord.AllowedMentions.none())
@@ -160,7 +216,9 @@ class reactionroles(commands.Cog, description='Manage the reaction role system.'
         if status == "DELETE 0":
             raise commands.BadArgument("Could not find that reaction role in my database.")
 
-        self.reactionroles[str(emoji)].pop(message.id)
+        self.uncache(message.id, str(emoji))
+        self.sync_route(message.id)
+        await self.bot.cache_bus.publish('reactionroles', message.id)
 
         await ctx.send(f"{self.bot.emotes['check']} Removed \"{emoji}\" to hand out **{role.name}**")
 
@@ -1,6 +1,6 @@
 import datetime
 import json
-from typing import Optional, Union
+from typing import List, Optional, Union
 import discord
 import re
 from discord.embeds import EmptyEmbed
@@ -17,6 +17,7 @@ from utils.converters import ActionReason, ImageConverter, RoleConverter
 from utils.custom_context import MyContext
 from utils.remind_utils import FutureTime, UserFriendlyTime, human_timedelta
 from utils.useful import Cooldown, Embed
+from utils.job_utils import BulkJob, edit_progress
 from utils.parsing import RoleParser
 from cogs.utility import Timer
 
@@ -41,6 +42,9 @@ class serverutils(commands.Cog, description='Server utilities like role, lockdow
     def __init__(self, bot: MetroBot):
         self.bot = bot
 
+        bot.jobs.register('role', self.role_job_factory, concurrency=bot.member_edits.rate, limiter=bot.member_edits)
+        bot.jobs.register('lockdown', self.lockdown_job_factory, concurrency=5)
+
     @property
     def emoji(self) -> str:
         return '📓'
@@ -72,9 +76,10 @@ class serverutils(commands.Cog, description='Server utilities like role, lockdow
                 SELECT (id)
                 FROM reminders
                 WHERE event = 'lockdown'
-                AND EXTRA->'kwargs'->>'channel_id' = $1; 
+                AND guild_id = $1
+                AND target_id = $2;
                 """
-        data = await self.bot.db.fetchval(query, str(channel.id))
+        data = await self.bot.db.fetchval(query, ctx.guild.id, channel.id)
         if data:
             raise commands.BadArgument(f"{self.bot.cross} Channel {channel.mention} is already locked.")
         
@@ -152,9 +157,10 @@ class serverutils(commands.Cog, description='Server utilities like role, lockdow
                 SELECT (id, extra)
                 FROM reminders
                 WHERE event = 'lockdown'
-                AND extra->'kwargs'->>'channel_id' = $1;
+                AND guild_id = $1
+                AND target_id = $2;
                 """
-        s = await self.bot.db.fetchval(query, str(channel.id))
+        s = await self.bot.db.fetchval(query, ctx.guild.id, channel.id)
         if not s:
             overwrites = channel.overwrites_for(ctx.guild.default_role)
             perms = overwrites.send_messages
@@ -177,6 +183,9 @@ class serverutils(commands.Cog, description='Server utilities like role, lockdow
                     WHERE id = $1
                     """
             await self.bot.db.execute(query, task_id)
+            reminder_cog = self.bot.get_cog('utility')
+            if reminder_cog:
+                reminder_cog.timers.remove(task_id)
         reason = "Channel unlocked by command execution."
 
         overwrites = channel.overwrites_for(ctx.guild.default_role)
@@ -189,7 +198,150 @@ class serverutils(commands.Cog, description='Server utilities like role, lockdow
         await message.edit(
             content=f"{self.bot.check} Channel {channel.mention} unlocked."
         )
-    
+
+    @commands.command(name='serverlock', aliases=['lockall'])
+    @commands.has_guild_permissions(manage_channels=True)
+    @commands.bot_has_guild_permissions(manage_channels=True, manage_roles=True)
+    @commands.check(Cooldown(1, 120, 1, 90, commands.BucketType.guild))
+    async def serverlock(self, ctx: MyContext):
+        """
+        Lock every text channel in the server.
+
+        Denies send messages to the default role in each channel that isn't locked already.
+        This runs in the background and carries on if I restart, use `serverunlock` to undo it.
+        """
+
+        if self.bot.jobs.find(ctx.guild.id, 'lockdown'):
+            raise commands.BadArgument(f"A lockdown job is already running in this server. See `{ctx.clean_prefix}jobs`.")
+
+        default = ctx.guild.default_role
+        targets = [
+            channel.id for channel in ctx.guild.text_channels
+            if channel.overwrites_for(default).send_messages is not False and channel.permissions_for(ctx.guild.me).manage_roles
+        ]
+        if not targets:
+            raise commands.BadArgument("There are no channels I can lock.")
+
+        confirm = await ctx.confirm(f"Are you sure you want to lock **{len(targets)}** channels?")
+        if confirm is False:
+            raise commands.BadArgument("Canceled.")
+        if confirm is None:
+            raise commands.BadArgument("Timed out.")
+
+        await self.start_lockdown_job(ctx, targets, lock=True)
+
+    @commands.command(name='serverunlock', aliases=['unlockall'])
+    @commands.has_guild_permissions(manage_channels=True)
+    @commands.bot_has_guild_permissions(manage_channels=True, manage_roles=True)
+    @commands.check(Cooldown(1, 120, 1, 90, commands.BucketType.guild))
+    async def serverunlock(self, ctx: MyContext):
+        """Unlock the channels locked by the last `serverlock`."""
+
+        if self.bot.jobs.find(ctx.guild.id, 'lockdown'):
+            raise commands.BadArgument(f"A lockdown job is already running in this server. See `{ctx.clean_prefix}jobs`.")
+
+        query = """
+                SELECT targets[1:cursor]
+                FROM jobs
+                WHERE kind = 'lockdown'
+                AND guild_id = $1
+                AND (extra->>'lock')::boolean
+                ORDER BY id DESC
+                LIMIT 1
+                """
+        locked = await self.bot.db.fetchval(query, ctx.guild.id) or []
+
+        default = ctx.guild.default_role
+        targets = []
+        for channel_id in locked:
+            channel = ctx.guild.get_channel(channel_id)
+            if channel is not None and channel.overwrites_for(default).send_messages is False:
+                targets.append(channel_id)
+        if not targets:
+            raise commands.BadArgument("There are no locked channels to unlock.")
+
+        await self.start_lockdown_job(ctx, targets, lock=False)
+
+    async def start_lockdown_job(self, ctx: MyContext, targets: List[int], *, lock: bool):
+        message = await ctx.send(f"{'Locking' if lock else 'Unlocking'} **{len(targets)}** channels...")
+        extra = {'lock': lock, 'reason': await ActionReason().convert(ctx, f"Server {'locked' if lock else 'unlocked'} by command.")}
+        await self.bot.jobs.create(
+            'lockdown', ctx.guild.id, ctx.author.id, targets, extra=extra, channel_id=ctx.channel.id, message_id=message.id
+        )
+
+    async def lockdown_job_factory(self, record):
+        guild = self.bot.get_guild(record['guild_id'])
+        if guild is None:
+            return None
+        extra = json.loads(record['extra'])
+        lock = extra['lock']
+
+        async def action(channel_id: int):
+            channel = guild.get_channel(channel_id)
+            if channel is None:
+                return # Deleted since
+
+            overwrites = channel.overwrites_for(guild.default_role)
+            overwrites.send_messages = False if lock else None
+            await channel.set_permissions(guild.default_role, overwrite=overwrites, reason=extra['reason'])
+
+        def status(job: BulkJob) -> str:
+            if job.finished is None:
+                return f"{'Locking' if lock else 'Unlocking'} channels: {job.processed:,}/{len(job):,}"
+
+            content = "Canceled. " if job.status == 'cancelled' else f"{self.bot.check} "
+            content += f"{'Locked' if lock else 'Unlocked'} {job.stats['done']:,}/{len(job):,} channels."
+            if job.stats['failed']:
+                content += f"\nFailed to {'lock' if lock else 'unlock'} {job.stats['failed']:,} channels due to permission errors."
+            return content
+
+        return action, edit_progress(self.bot, record, status)
+
+    @commands.group(name='jobs', invoke_without_command=True, case_insensitive=True)
+    @commands.has_guild_permissions(manage_guild=True)
+    async def jobs(self, ctx: MyContext):
+        """
+        List this server's recent background jobs.
+
+        These are mass role changes, multibans and server lockdowns.
+        Unfinished jobs carry on from where they were if I restart.
+        """
+
+        query = """
+                SELECT id, kind, status, cardinality(targets) AS total, done, failed, created
+                FROM jobs
+                WHERE guild_id = $1
+                ORDER BY id DESC
+                LIMIT 10
+                """
+        records = await self.bot.db.fetch(query, ctx.guild.id)
+        if not records:
+            raise commands.BadArgument("This server has no jobs.")
+
+        to_send = []
+        for record in records:
+            job = self.bot.jobs.running.get(record['id'])
+            done, failed = (job.stats['done'], job.stats['failed']) if job else (record['done'], record['failed'])
+            created = record['created'].replace(tzinfo=datetime.timezone.utc)
+            to_send.append(
+                f"`{record['id']}` **{record['kind']}** {record['status']} - {done + failed:,}/{record['total']:,} "
+                f"({failed:,} failed) {discord.utils.format_dt(created, 'R')}"
+            )
+
+        embed = Embed(color=ctx.color)
+        embed.description = "\n".join(to_send)
+        embed.set_footer(text=f"Use {ctx.clean_prefix}jobs cancel <id> to stop a running job.")
+        await ctx.send(embed=embed)
+
+    @jobs.command(name='cancel', aliases=['stop'])
+    @commands.has_guild_permissions(manage_guild=True)
+    async def jobs_cancel(self, ctx: MyContext, job_id: int):
+        """Cancel a running background job."""
+
+        if not await self.bot.jobs.cancel(job_id, guild_id=ctx.guild.id):
+            raise commands.BadArgument("That job is not running in this server.")
+        await ctx.check()
+
 
     async def cleanup_code(self, content):
         """Automatically removes code blocks from the code."""
@@ -223,7 +375,104 @@ class serverutils(commands.Cog, description='Server utilities like role, lockdow
         embed.set_footer(text=f"ID: {role.id}")
 
         return embed
-        
+
+    def role_action(self, guild_id: int, role_id: int, *, add: bool, reason: str):
+        method = self.bot.http.add_role if add else self.bot.http.remove_role
+
+        async def action(member_id: int):
+            await method(guild_id, member_id, role_id, reason=reason)
+
+        return action
+
+    async def start_role_job(self, ctx: MyContext, role: discord.Role, members: List[discord.Member], *, add: bool, noun: str, reason: str,
+                             list_members: bool = False):
+        """
+        Add or remove `role` for `members` in a stored background job.
+
+        Members who already have (or don't have) the role are skipped up front.
+        One message is edited with the progress and the final result,
+        which names every member instead of counting them with `list_members`.
+        """
+
+        if self.bot.jobs.find(ctx.guild.id, 'role'):
+            raise commands.BadArgument(f"A role job is already running in this server. Use `{ctx.clean_prefix}role cancel` to stop it.")
+
+        targets, hierarchy, already_has = [], [], []
+        for member in members:
+            if not can_execute_action(ctx, ctx.author, member):
+                hierarchy.append(member)
+            elif member._roles.has(role.id) is add:
+                already_has.append(member)
+            else:
+                targets.append(member)
+
+        message = await ctx.send(f"Beginning to {'add' if add else 'remove'} **{role.name}** {'to' if add else 'from'} **{len(targets):,}** {noun}.")
+        extra = {
+            'role_id': role.id, 'add': add, 'noun': noun, 'reason': reason,
+            'already_has': len(already_has), 'hierarchy': len(hierarchy),
+        }
+        if list_members:
+            extra['names'] = {str(member.id): str(member) for member in targets}
+            extra['already_has_names'] = [str(member) for member in already_has]
+            extra['hierarchy_names'] = [str(member) for member in hierarchy]
+        await self.bot.jobs.create(
+            'role', ctx.guild.id, ctx.author.id, [member.id for member in targets],
+            extra=extra, channel_id=ctx.channel.id, message_id=message.id
+        )
+
+    async def role_job_factory(self, record):
+        guild = self.bot.get_guild(record['guild_id'])
+        extra = json.loads(record['extra'])
+        role = guild and guild.get_role(extra['role_id'])
+        if role is None:
+            return None
+
+        action = self.role_action(guild.id, role.id, add=extra['add'], reason=extra['reason'])
+        return action, edit_progress(self.bot, record, lambda job: self.role_job_status(job, role, extra))
+
+    def role_job_status(self, job: BulkJob, role: discord.Role, extra: dict) -> str:
+        add, noun = extra['add'], extra['noun']
+        verb, doing, done, direction = ('add', 'Adding', 'Added', 'to') if add else ('remove', 'Removing', 'Removed', 'from')
+
+        if job.finished is None:
+            eta = f", about {humanize.naturaldelta(job.eta)} left" if job.eta is not None else ""
+            return (f"{doing} **{role.name}** {direction} {noun}: "
+                    f"{job.processed:,}/{len(job):,} ({job.rate:.1f} {noun}/s{eta})")
+
+        if 'names' in extra:
+            return self.role_job_summary(job, role, extra)
+
+        content = "Canceled. " if job.status == 'cancelled' else ""
+        content += (f"{done} **{role.name}** {direction} {job.stats['done']:,}/{len(job) + extra['already_has'] + extra['hierarchy']:,} {noun} "
+                    f"in {humanize.precisedelta(datetime.timedelta(seconds=job.elapsed))} ({job.rate:.1f} {noun}/s).")
+        if extra['already_has']:
+            content += f"\n{extra['already_has']:,} {noun} {'already had' if add else 'did not have'} **{role.name}**."
+        failed = extra['hierarchy'] + job.stats['failed']
+        if failed:
+            content += f"\nFailed to {verb} **{role.name}** {direction} {failed:,} {noun} due to role hierarchy or permission errors."
+        return content
+
+    def role_job_summary(self, job: BulkJob, role: discord.Role, extra: dict) -> str:
+        """Final report of `addmulti` and `removemulti`, naming the members."""
+
+        add, names = extra['add'], extra['names']
+        # Failures from before a restart aren't kept, only this run's are named
+        failures = set(job.failures)
+        processed = job.targets[:job.checkpoint]
+        success = [names[str(member_id)] for member_id in processed if member_id not in failures]
+        failed = [names[str(member_id)] for member_id in job.failures]
+
+        to_send = ["Canceled."] if job.status == 'cancelled' else []
+        if success:
+            to_send.append(f"{'Added' if add else 'Removed'} **{role.name}** {'to' if add else 'from'} {', '.join(success)}")
+        if extra['already_has_names']:
+            to_send.append(f"{', '.join(extra['already_has_names'])} {'already had' if add else 'did not have'} **{role.name}**")
+        if extra['hierarchy_names']:
+            to_send.append(f"You are not high enough in role hierarchy to {'add roles to' if add else 'remove roles from'}: {', '.join(extra['hierarchy_names'])}")
+        if failed:
+            to_send.append(f"Failed to {'add' if add else 'remove'} **{role.name}** {'to' if add else 'from'} {', '.join(failed)}")
+        return "\n".join(to_send)[:2000] or f"Nothing to {'add' if add else 'remove'}."
+
     @commands.group(invoke_without_command=True)
     @commands.has_guild_permissions(manage_roles=True)
     @commands.bot_has_guild_permissions(manage_roles=True)
@@ -326,27 +575,9 @@ class serverutils(commands.Cog, description='Server utilities like role, lockdow
             )
             return await ctx.send(to_send)
 
-        success, hierarchy, already_has = [], [], []
-        for member in members:
-            if not can_execute_action(ctx, ctx.author, member):
-                hierarchy.append(str(member))
-                continue
-
-            if role not in member.roles:
-                await member.add_roles(role, reason=f'Add-multi role command invoked by: {ctx.author} (ID: {ctx.author.id})')
-                success.append(str(member))
-            else:
-                already_has.append(str(member))
-
-        to_send = []
-        if success:
-            to_send.append(f"Added **{role.name}** to {', '.join(success)}")
-        if already_has:
-            to_send.append(f"{', '.join(already_has)} already had **{role.name}**")
-        if hierarchy:
-            to_send.append(f"You are not high enough in role hierarchy to add roles to: {', '.join(hierarchy)}")
-        if to_send:
-            await ctx.send("\n".join(to_send))
+        await self.start_role_job(
+            ctx, role, list(dict.fromkeys(members)), add=True, noun='members', list_members=True,
+            reason=f'Add-multi role command invoked by: {ctx.author} (ID: {ctx.author.id})')
 
 
     @role.command(name='removemulti')
@@ -366,28 +597,21 @@ class serverutils(commands.Cog, description='Server utilities like role, lockdow
             )
             return await ctx.send(to_send)
 
-        success, hierarchy, already_has = [], [], []
-        for member in members:
-            if not can_execute_action(ctx, ctx.author, member):
-                hierarchy.append(str(member))
-                continue
+        await self.start_role_job(
+            ctx, role, list(dict.fromkeys(members)), add=False, noun='members', list_members=True,
+            reason=f'Remove-multi role command invoked by: {ctx.author} (ID: {ctx.author.id})')
 
-            if role in member.roles:
-                await member.remove_roles(role, reason=f'Remove-multi role command invoked by: {ctx.author} (ID: {ctx.author.id})')
-                success.append(str(member))
-            else:
-                already_has.append(str(member))
 
-        to_send = []
-        if success:
-            to_send.append(f"Removed **{role.name}** from {', '.join(success)}")
-        if already_has:
-            to_send.append(f"{', '.join(already_has)} doesn't have **{role.name}**")
-        if hierarchy:
-            to_send.append(f"You are not high enough in role hierarchy to remove roles from: {', '.join(hierarchy)}")
-        if to_send:
-            await ctx.send("\n".join(to_send))
+    @role.command(name='cancel', aliases=['stop'])
+    @commands.has_guild_permissions(manage_roles=True)
+    async def role_cancel(self, ctx: MyContext):
+        """Cancel the mass role job running in this server."""
+
+        job = self.bot.jobs.find(ctx.guild.id, 'role')
+        if job is None or not await self.bot.jobs.cancel(job.id):
+            raise commands.BadArgument("There is no role job running in this server.")
 
+        await ctx.check()
 
     @role.command(name='all')
     @commands.has_guild_permissions(manage_roles=True)
@@ -415,35 +639,9 @@ class serverutils(commands.Cog, description='Server utilities like role, lockdow
         if ctx.guild.chunked is False:
             await ctx.guild.chunk()
 
-        await ctx.send(f"Beginning to add **{role.name}** to **{len(ctx.guild.members)}** members.")
-        
-        success, failed, already_has = 0, 0, 0
-
-        async with ctx.typing():
-            for member in ctx.guild.members:
-                if not can_execute_action(ctx, ctx.author, member):
-                    failed += 1
-                    continue
-
-                if role in member.roles:
-                    already_has += 1
-                    continue
-
-                try:
-                    await member.add_roles(role, reason=f'Role-all invoked by: {ctx.author} (ID: {ctx.author.id})')
-                    success += 1
-                except discord.HTTPException:
-                    failed += 1
-
-        to_send = ""
-        if success:
-            to_send += f"Successfully added **{role.name}** to {success}/{len(ctx.guild.members)} members."
-        if already_has:
-            to_send += f"{already_has} members already had **{role.name}**"
-        if failed:
-            to_send += f"Failed to add **{role.name}** to {failed} members due to role hierarchy or permission errors."
-
-        await ctx.send(to_send)
+        await self.start_role_job(
+            ctx, role, ctx.guild.members, add=True, noun='members',
+            reason=f'Role-all invoked by: {ctx.author} (ID: {ctx.author.id})')
 
     @role.command(name='rall', aliases=['removeall'])
     @commands.has_guild_permissions(manage_roles=True)
@@ -471,35 +669,9 @@ class serverutils(commands.Cog, description='Server utilities like role, lockdow
         if ctx.guild.chunked is False:
             await ctx.guild.chunk()
 
-        await ctx.send(f"Beginning to remove **{role.name}** from **{len(ctx.guild.members)}** members.")
-        
-        success, failed, already_has = 0, 0, 0
-
-        async with ctx.typing():
-            for member in ctx.guild.members:
-                if not can_execute_action(ctx, ctx.author, member):
-                    failed += 1
-                    continue
-
-                if not role in member.roles:
-                    already_has += 1
-                    continue
-
-                try:
-                    await member.remove_roles(role, reason=f'Role-removeall invoked by: {ctx.author} (ID: {ctx.author.id})')
-                    success += 1
-                except discord.HTTPException:
-                    failed += 1
-
-        to_send = ""
-        if success:
-            to_send += f"Successfully removed **{role.name}** from {success}/{len(ctx.guild.members)} members."
-        if already_has:
-            to_send += f"{already_has} members didn't even have **{role.name}**"
-        if failed:
-            to_send += f"Failed to remove **{role.name}** from {failed} members due to role hierarchy or permission errors."
-
-        await ctx.send(to_send)
+        await self.start_role_job(
+            ctx, role, ctx.guild.members, add=False, noun='members',
+            reason=f'Role-removeall invoked by: {ctx.author} (ID: {ctx.author.id})')
 
     @role.command(name='bots')
     @commands.has_guild_permissions(manage_roles=True)
@@ -527,35 +699,9 @@ class serverutils(commands.Cog, description='Server utilities like role, lockdow
         if ctx.guild.chunked is False:
             await ctx.guild.chunk()
 
-        await ctx.send(f"Beginning to add **{role.name}** to **{len(ctx.guild.bots)}** bots.")
-        
-        success, failed, already_has = 0, 0, 0
-
-        async with ctx.typing():
-            for bot in ctx.guild.bots:
-                if not can_execute_action(ctx, ctx.author, bot):
-                    failed += 1
-                    continue
-
-                if role in bot.roles:
-                    already_has += 1
-                    continue
-
-                try:
-                    await bot.add_roles(role, reason=f'Role-all-bots invoked by: {ctx.author} (ID: {ctx.author.id})')
-                    success += 1
-                except discord.HTTPException:
-                    failed += 1
-
-        to_send = ""
-        if success:
-            to_send += f"Successfully added **{role.name}** to {success}/{len(ctx.guild.bots)} bots."
-        if already_has:
-            to_send += f"{already_has} bots already had **{role.name}**"
-        if failed:
-            to_send += f"Failed to add **{role.name}** to {failed} bots due to role hierarchy or permission errors."
-
-        await ctx.send(to_send)
+        await self.start_role_job(
+            ctx, role, ctx.guild.bots, add=True, noun='bots',
+            reason=f'Role-all-bots invoked by: {ctx.author} (ID: {ctx.author.id})')
 
     @role.command(name='rbots')
     @commands.has_guild_permissions(manage_roles=True)
@@ -583,35 +729,9 @@ class serverutils(commands.Cog, description='Server utilities like role, lockdow
         if ctx.guild.chunked is False:
             await ctx.guild.chunk()
 
-        await ctx.send(f"Beginning to remove **{role.name}** from **{len(ctx.guild.bots)}** bots.")
-        
-        success, failed, already_has = 0, 0, 0
-
-        async with ctx.typing():
-            for bot in ctx.guild.bots:
-                if not can_execute_action(ctx, ctx.author, bot):
-                    failed += 1
-                    continue
-
-                if not role in bot.roles:
-                    already_has += 1
-                    continue
-
-                try:
-                    await bot.remove_roles(role, reason=f'Role-removeall-bots invoked by: {ctx.author} (ID: {ctx.author.id})')
-                    success += 1
-                except discord.HTTPException:
-                    failed += 1
-
-        to_send = ""
-        if success:
-            to_send += f"Successfully removed **{role.name}** from {success}/{len(ctx.guild.bots)} bots."
-        if already_has:
-            to_send += f"{already_has} bots didn't even have **{role.name}**"
-        if failed:
-            to_send += f"Failed to remove **{role.name}** to {failed} bots due to role hierarchy or permission errors."
-
-        await ctx.send(to_send)
+        await self.start_role_job(
+            ctx, role, ctx.guild.bots, add=False, noun='bots',
+            reason=f'Role-removeall-bots invoked by: {ctx.author} (ID: {ctx.author.id})')
 
     @role.command(name='humans')
     @commands.has_guild_permissions(manage_roles=True)
@@ -639,35 +759,9 @@ class serverutils(commands.Cog, description='Server utilities like role, lockdow
         if ctx.guild.chunked is False:
             await ctx.guild.chunk()
 
-        await ctx.send(f"Beginning to add **{role.name}** to **{len(ctx.guild.humans)}** humans.")
-        
-        success, failed, already_has = 0, 0, 0
-
-        async with ctx.typing():
-            for human in ctx.guild.humans:
-                if not can_execute_action(ctx, ctx.author, human):
-                    failed += 1
-                    continue
-
-                if role in human.roles:
-                    already_has += 1
-                    continue
-
-                try:
-                    await human.add_roles(role, reason=f'Role-all-humans invoked by: {ctx.author} (ID: {ctx.author.id})')
-                    success += 1
-                except discord.HTTPException:
-                    failed += 1
-
-        to_send = ""
-        if success:
-            to_send += f"Successfully added **{role.name}** to {success}/{len(ctx.guild.humans)} humans."
-        if already_has:
-            to_send += f"{already_has} humans already had **{role.name}**"
-        if failed:
-            to_send += f"Failed to add **{role.name}** to {failed} humans due to role hierarchy or permission errors."
-
-        await ctx.send(to_send)
+        await self.start_role_job(
+            ctx, role, ctx.guild.humans, add=True, noun='humans',
+            reason=f'Role-all-humans invoked by: {ctx.author} (ID: {ctx.author.id})')
 
     @role.command(name='rhumans')
     @commands.has_guild_permissions(manage_roles=True)
@@ -695,35 +789,9 @@ class serverutils(commands.Cog, description='Server utilities like role, lockdow
         if ctx.guild.chunked is False:
             await ctx.guild.chunk()
 
-        await ctx.send(f"Beginning to remove **{role.name}** from **{len(ctx.guild.humans)}** humans.")
-        
-        success, failed, already_has = 0, 0, 0
-
-        async with ctx.typing():
-            for human in ctx.guild.humans:
-                if not can_execute_action(ctx, ctx.author, human):
-                    failed += 1
-                    continue
-
-                if not role in human.roles:
-                    already_has += 1
-                    continue
-
-                try:
-                    await human.remove_roles(role, reason=f'Role-removeall-humans invoked by: {ctx.author} (ID: {ctx.author.id})')
-                    success += 1
-                except discord.HTTPException:
-                    failed += 1
-
-        to_send = ""
-        if success:
-            to_send += f"Successfully removed **{role.name}** from {success}/{len(ctx.guild.humans)} humans."
-        if already_has:
-            to_send += f"{already_has} humans didn't even have **{role.name}**"
-        if failed:
-            to_send += f"Failed to remove **{role.name}** to {failed} humans due to role hierarchy or permission errors."
-
-        await ctx.send(to_send)
+        await self.start_role_job(
+            ctx, role, ctx.guild.humans, add=False, noun='humans',
+            reason=f'Role-removeall-humans invoked by: {ctx.author} (ID: {ctx.author.id})')
 
     @role.command(
         name='list',
@@ -873,35 +941,9 @@ class serverutils(commands.Cog, description='Server utilities like role, lockdow
         if ctx.guild.chunked is False:
             await ctx.guild.chunk()
 
-        await ctx.send(f"Beginning to add **{target_role.name}** to **{len(base_role.members)}** members.")
-        
-        success, failed, already_has = 0, 0, 0
-
-        async with ctx.typing():
-            for human in base_role.members:
-                if not can_execute_action(ctx, ctx.author, human):
-                    failed += 1
-                    continue
-
-                if target_role in human.roles:
-                    already_has += 1
-                    continue
-
-                try:
-                    await human.add_roles(target_role, reason=f'Role-in invoked by: {ctx.author} (ID: {ctx.author.id})')
-                    success += 1
-                except discord.HTTPException:
-                    failed += 1
-
-        to_send = ""
-        if success:
-            to_send += f"Successfully added **{target_role.name}** to {success}/{len(base_role.members)} members."
-        if already_has:
-            to_send += f"{already_has} members already had **{target_role.name}**"
-        if failed:
-            to_send += f"Failed to add **{target_role.name}** to {failed} members due to role hierarchy or permission errors."
-
-        await ctx.send(to_send)
+        await self.start_role_job(
+            ctx, target_role, base_role.members, add=True, noun='members',
+            reason=f'Role-in invoked by: {ctx.author} (ID: {ctx.author.id})')
 
 
     @role.command(name='rin')
@@ -930,35 +972,9 @@ class serverutils(commands.Cog, description='Server utilities like role, lockdow
         if ctx.guild.chunked is False:
             await ctx.guild.chunk()
 
-        await ctx.send(f"Beginning to remove **{target_role.name}** from **{len(base_role.members)}** members.")
-        
-        success, failed, already_has = 0, 0, 0
-
-        async with ctx.typing():
-            for human in base_role.members:
-                if not can_execute_action(ctx, ctx.author, human):
-                    failed += 1
-                    continue
-
-                if not target_role in human.roles:
-                    already_has += 1
-                    continue
-
-                try:
-                    await human.remove_roles(target_role, reason=f'Role-rin invoked by: {ctx.author} (ID: {ctx.author.id})')
-                    success += 1
-                except discord.HTTPException:
-                    failed += 1
-
-        to_send = ""
-        if success:
-            to_send += f"Successfully removed **{target_role.name}** from {success}/{len(base_role.members)} members."
-        if already_has:
-            to_send += f"{already_has} members didn't even have **{target_role.name}**"
-        if failed:
-            to_send += f"Failed to remove **{target_role.name}** from {failed} members due to role hierarchy or permission errors."
-
-        await ctx.send(to_send)
+        await self.start_role_job(
+            ctx, target_role, base_role.members, add=False, noun='members',
+            reason=f'Role-rin invoked by: {ctx.author} (ID: {ctx.author.id})')
 
     @commands.Cog.listener()
     async def on_temprole_timer_complete(self, timer: Timer):
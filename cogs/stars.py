@@ -1,15 +1,19 @@
 import asyncio
 import enum
+import re
 import asyncpg
 import discord
 import weakref
-from discord.ext import commands
+from collections import Counter
+from discord.ext import commands, tasks
 
 from typing import Optional
 
 from bot import MetroBot
+from utils.cache_utils import MISSING, LRUCache
 from utils.custom_context import MyContext
-from utils.useful import human_join, plural
+from utils.decos import is_dev
+from utils.useful import Embed, human_join, plural, traceback_maker
 
 def requires_starboard():
     async def predicate(ctx):
@@ -56,44 +60,97 @@ class StarboardConfig:
         guild = self.bot.get_guild(self.id)
         return guild and guild.get_channel(self.channel_id)
 
+class StarMessage:
+    """
+    The parts of a starred message the starboard uses.
+
+    Cached instead of the message itself so the cache doesn't keep whole messages alive.
+    """
+    __slots__ = ('id', 'channel_mention', 'jump_url', 'type', 'content', 'created_at',
+                 'author_id', 'author_name', 'author_avatar', 'embed_image', 'attachment', 'reply')
+
+    def __init__(self, message: discord.Message):
+        self.id = message.id
+        self.channel_mention = message.channel.mention
+        self.jump_url = message.jump_url
+        self.type = message.type
+        self.content = message.content
+        self.created_at = message.created_at
+        self.author_id = message.author.id
+        self.author_name = message.author.display_name
+        self.author_avatar = message.author.display_avatar.url
+
+        embed = message.embeds[0] if message.embeds else None
+        self.embed_image = embed.url if embed and embed.type == 'image' else None
+
+        file = message.attachments[0] if message.attachments else None
+        self.attachment = (file.filename, file.url, file.is_spoiler()) if file else None # (filename, url, spoiler)
+
+        ref = message.reference
+        if ref and isinstance(ref.resolved, discord.Message):
+            self.reply = (str(ref.resolved.author), ref.resolved.jump_url) # (author, jump_url)
+        else:
+            self.reply = None
+
 def setup(bot: MetroBot):
     bot.add_cog(stars(bot))
 
 class stars(commands.Cog, description='Manage and create starboard commands. \nThis cog is 100% \of [R. Danny\'s](https://github.com/Rapptz/RoboDanny/blob/1fb95d76d1b7685e2e2ff950e11cddfc96efbfec/cogs/) starboard cog.'):
+    MESSAGE_CACHE_SIZE = 5_000
+    MESSAGE_CACHE_TTL = 3600
+    MESSAGE_MISS_TTL = 300 # Deleted or unreachable messages
+
     def __init__(self, bot: MetroBot):
         self.bot = bot
         self._locks = weakref.WeakValueDictionary()
-        self._message_cache = {}
-
+        self._message_cache = LRUCache(self.MESSAGE_CACHE_SIZE, self.MESSAGE_CACHE_TTL, self.MESSAGE_MISS_TTL)
         self._about_to_be_deleted = set()
-
+        self.spoilers = re.compile(r'\|\|(.+?)\|\|')
+        self._starboards = {} # guild_id: StarboardConfig, guilds without a starboard included
+        # bot_message_id: (starboard_channel, channel, message_id, count), only the latest count is kept
+        self._pending_edits = {}
+        self.edit_stats = Counter(queued=0, coalesced=0, dropped=0, sent=0)
+
+        bot.cache_bus.register('starboard', self.refresh_starboard)
+        bot.reactions.register(self.on_star_add, emoji='\N{WHITE MEDIUM STAR}', events=('add',))
+        bot.reactions.register(self.on_star_remove, emoji='\N{WHITE MEDIUM STAR}', events=('remove',))
+        self.star_edit_flusher.start()
+
+    def cog_unload(self):
+        self.bot.cache_bus.unregister('starboard', self.refresh_starboard)
+        # Let a running flush finish and send whatever is still queued
+        self.star_edit_flusher.stop()
+        if self._pending_edits:
+            self.bot.loop.create_task(self.flush_edits())
+        self.bot.reactions.unregister_all(self.on_star_add)
+        self.bot.reactions.unregister_all(self.on_star_remove)
 
     @property
     def emoji(self) -> str:
         return '\U00002b50'
 
-    async def get_message(self, channel, message_id):
+    async def get_message(self, channel, message_id) -> Optional[StarMessage]:
+        msg = self._message_cache.get(message_id)
+        if msg is not MISSING:
+            return msg # None if it wasn't found recently
+
         try:
-            return self._message_cache[message_id]
-        except KeyError:
-            try:
-                o = discord.Object(id=message_id + 1)
-                pred = lambda m: m.id == message_id
-                # don't wanna use get_message due to poor rate limit (1/1s) vs (50/1s)
-                msg = await channel.history(limit=1, before=o).next()
+            o = discord.Object(id=message_id + 1)
+            # don't wanna use get_message due to poor rate limit (1/1s) vs (50/1s)
+            msg = await channel.history(limit=1, before=o).next()
+        except Exception:
+            msg = None
 
-                if msg.id != message_id:
-                    return None
+        if msg is None or msg.id != message_id:
+            self._message_cache.set_missing(message_id)
+            return None
 
-                self._message_cache[message_id] = msg
-                return msg
-            except Exception:
-                return None
+        msg = StarMessage(msg)
+        self._message_cache.set(message_id, msg)
+        return msg
 
     async def reaction_action(self, fmt, payload):
-        if str(payload.emoji) != '\N{WHITE MEDIUM STAR}':
-            return
-
+        # Only star reactions are routed here
         guild = self.bot.get_guild(payload.guild_id)
         if guild is None:
             return
@@ -113,11 +170,16 @@ class stars(commands.Cog, description='Manage and create starboard commands. \nT
         except StarError:
             pass
 
+    def get_lock(self, message_id):
+        # Per message, stars on different messages don't wait on each other
+        lock = self._locks.get(message_id)
+        if lock is None:
+            self._locks[message_id] = lock = asyncio.Lock(loop=self.bot.loop)
+        return lock
+
     async def star_message(self, channel, message_id, starrer_id, *, verify=False):
         guild_id = channel.guild.id
-        lock = self._locks.get(guild_id)
-        if lock is None:
-            self._locks[guild_id] = lock = asyncio.Lock(loop=self.bot.loop)
+        lock = self.get_lock(message_id)
 
         async with lock:
             async with self.bot.db.acquire(timeout=300.0) as con:
@@ -171,33 +233,30 @@ class stars(commands.Cog, description='Manage and create starboard commands. \nT
         emoji = self.star_emoji(stars)
 
         if stars > 1:
-            content = f'{emoji} **{stars}** {message.channel.mention} ID: {message.id}'
+            content = f'{emoji} **{stars}** {message.channel_mention} ID: {message.id}'
         else:
-            content = f'{emoji} {message.channel.mention} ID: {message.id}'
+            content = f'{emoji} {message.channel_mention} ID: {message.id}'
 
 
         embed = discord.Embed(description=message.content)
-        if message.embeds:
-            data = message.embeds[0]
-            if data.type == 'image' and not self.is_url_spoiler(message.content, data.url):
-                embed.set_image(url=data.url)
-
-        if message.attachments:
-            file = message.attachments[0]
-            spoiler = file.is_spoiler()
-            if not spoiler and file.url.lower().endswith(('png', 'jpeg', 'jpg', 'gif', 'webp')):
-                embed.set_image(url=file.url)
+        if message.embed_image and not self.is_url_spoiler(message.content, message.embed_image):
+            embed.set_image(url=message.embed_image)
+
+        if message.attachment:
+            filename, url, spoiler = message.attachment
+            if not spoiler and url.lower().endswith(('png', 'jpeg', 'jpg', 'gif', 'webp')):
+                embed.set_image(url=url)
             elif spoiler:
-                embed.add_field(name='Attachment', value=f'||[{file.filename}]({file.url})||', inline=False)
+                embed.add_field(name='Attachment', value=f'||[{filename}]({url})||', inline=False)
             else:
-                embed.add_field(name='Attachment', value=f'[{file.filename}]({file.url})', inline=False)
+                embed.add_field(name='Attachment', value=f'[{filename}]({url})', inline=False)
 
-        ref = message.reference
-        if ref and isinstance(ref.resolved, discord.Message):
-            embed.add_field(name='Replying to...', value=f'[{ref.resolved.author}]({ref.resolved.jump_url})', inline=False)
+        if message.reply:
+            author, jump_url = message.reply
+            embed.add_field(name='Replying to...', value=f'[{author}]({jump_url})', inline=False)
 
         embed.add_field(name='Original', value=f'[Jump!]({message.jump_url})', inline=False)
-        embed.set_author(name=message.author.display_name, icon_url=message.author.display_avatar.url)
+        embed.set_author(name=message.author_name, icon_url=message.author_avatar)
         embed.timestamp = message.created_at
         embed.colour = self.star_gradient_colour(stars)
         return content, embed
@@ -252,7 +311,7 @@ class stars(commands.Cog, description='Manage and create starboard commands. \nT
         if msg is None:
             raise StarError('\N{BLACK QUESTION MARK ORNAMENT} This message could not be found.')
 
-        empty_message = len(msg.content) == 0 and len(msg.attachments) == 0
+        empty_message = len(msg.content) == 0 and msg.attachment is None
         if empty_message or msg.type not in (discord.MessageType.default, discord.MessageType.reply):
             raise StarError('\N{NO ENTRY SIGN} This message cannot be starred.')
 
@@ -260,68 +319,58 @@ class stars(commands.Cog, description='Manage and create starboard commands. \nT
         if msg.created_at < oldest_allowed:
             raise StarError('\N{NO ENTRY SIGN} This message is too old.')
 
-        # check if this is freshly starred
-        # originally this was a single query but it seems
-        # WHERE ... = (SELECT ... in some_cte) is bugged
-        # so I'm going to do two queries instead
+        # Creates the entry if this is freshly starred, adds the starrer
+        # and returns the new count and the message ID to edit, all in one go.
+        # Everything in the statement sees the table from before it ran,
+        # so the count is the old one plus this star.
         query = """WITH to_insert AS (
                        INSERT INTO starboard_entries AS entries (message_id, channel_id, guild_id, author_id)
                        VALUES ($1, $2, $3, $4)
                        ON CONFLICT (message_id) DO NOTHING
-                       RETURNING entries.id
-                   )
-                   INSERT INTO starrers (author_id, entry_id)
-                   SELECT $5, entry.id
-                   FROM (
-                       SELECT id FROM to_insert
+                       RETURNING entries.id, entries.bot_message_id
+                   ), entry AS (
+                       SELECT id, bot_message_id FROM to_insert
                        UNION ALL
-                       SELECT id FROM starboard_entries WHERE message_id=$1
+                       SELECT id, bot_message_id FROM starboard_entries WHERE message_id=$1
                        LIMIT 1
-                   ) AS entry
-                   RETURNING entry_id;
+                   ), starred AS (
+                       INSERT INTO starrers (author_id, entry_id)
+                       SELECT $5, entry.id FROM entry
+                       RETURNING entry_id
+                   )
+                   SELECT starred.entry_id, entry.bot_message_id,
+                          (SELECT COUNT(*) FROM starrers WHERE starrers.entry_id=starred.entry_id) + 1 AS count
+                   FROM starred, entry;
                 """
 
         try:
-            record = await connection.fetchrow(query, message_id, channel.id, guild_id, msg.author.id, starrer_id)
+            record = await connection.fetchrow(query, message_id, channel.id, guild_id, msg.author_id, starrer_id)
         except asyncpg.UniqueViolationError:
             raise StarError('\N{NO ENTRY SIGN} You already starred this message.')
 
-        entry_id = record[0]
+        if record is None:
+            # The entry was created by someone else while this ran
+            raise StarError('\N{BLACK QUESTION MARK ORNAMENT} This message could not be starred, try again.')
 
-        query = "SELECT COUNT(*) FROM starrers WHERE entry_id=$1;"
-        record = await connection.fetchrow(query, entry_id)
- 
-        count = record[0]
+        count = record['count']
         if count < starboard.threshold:
             return
 
         # at this point, we either edit the message or we create a message
         # with our star info
-        content, embed = self.get_emoji_message(msg, count)
-
-        # get the message ID to edit:
-        query = "SELECT bot_message_id FROM starboard_entries WHERE message_id=$1;"
-        record = await connection.fetchrow(query, message_id)
-        bot_message_id = record[0]
+        bot_message_id = record['bot_message_id']
 
         if bot_message_id is None:
+            content, embed = self.get_emoji_message(msg, count)
             new_msg = await starboard_channel.send(content, embed=embed)
             query = "UPDATE starboard_entries SET bot_message_id=$1 WHERE message_id=$2;"
             await connection.execute(query, new_msg.id, message_id)
         else:
-            new_msg = await self.get_message(starboard_channel, bot_message_id)
-            if new_msg is None:
-                # deleted? might as well purge the data
-                query = "DELETE FROM starboard_entries WHERE message_id=$1;"
-                await connection.execute(query, message_id)
-            else:
-                await new_msg.edit(content=content, embed=embed)
+            self.queue_edit(starboard_channel, bot_message_id, channel, message_id, count)
 
     async def unstar_message(self, channel, message_id, starrer_id, *, verify=False):
         guild_id = channel.guild.id
-        lock = self._locks.get(guild_id)
-        if lock is None:
-            self._locks[guild_id] = lock = asyncio.Lock(loop=self.bot.loop)
+        lock = self.get_lock(message_id)
 
         async with lock:
             async with self.bot.db.acquire(timeout=300.0) as con:
@@ -375,23 +424,26 @@ class stars(commands.Cog, description='Manage and create starboard commands. \nT
         if not starboard_channel.permissions_for(starboard_channel.guild.me).send_messages:
             raise StarError('\N{NO ENTRY SIGN} Cannot edit messages in starboard channel.')
 
-        query = """DELETE FROM starrers USING starboard_entries entry
-                   WHERE entry.message_id=$1
-                   AND   entry.id=starrers.entry_id
-                   AND   starrers.author_id=$2
-                   RETURNING starrers.entry_id, entry.bot_message_id
+        # Same as starring, the count comes back with the delete
+        query = """WITH removed AS (
+                       DELETE FROM starrers USING starboard_entries entry
+                       WHERE entry.message_id=$1
+                       AND   entry.id=starrers.entry_id
+                       AND   starrers.author_id=$2
+                       RETURNING starrers.entry_id, entry.bot_message_id
+                   )
+                   SELECT removed.entry_id, removed.bot_message_id,
+                          (SELECT COUNT(*) FROM starrers WHERE starrers.entry_id=removed.entry_id) - 1 AS count
+                   FROM removed;
                 """
 
         record = await connection.fetchrow(query, message_id, starrer_id)
         if record is None:
             raise StarError('\N{NO ENTRY SIGN} You have not starred this message.')
 
-        entry_id = record[0]
-        bot_message_id = record[1]
-
-        query = "SELECT COUNT(*) FROM starrers WHERE entry_id=$1;"
-        count = await connection.fetchrow(query, entry_id)
-        count = count[0]
+        entry_id = record['entry_id']
+        bot_message_id = record['bot_message_id']
+        count = record['count']
 
         if count == 0:
             # delete the entry if we have no more stars
@@ -401,36 +453,87 @@ class stars(commands.Cog, description='Manage and create starboard commands. \nT
         if bot_message_id is None:
             return
 
-        bot_message = await self.get_message(starboard_channel, bot_message_id)
-        if bot_message is None:
+        if count >= starboard.threshold:
+            self.queue_edit(starboard_channel, bot_message_id, channel, message_id, count)
             return
 
-        if count < starboard.threshold:
-            self._about_to_be_deleted.add(bot_message_id)
-            if count:
-                # update the bot_message_id to be NULL in the table since we're deleting it
-                query = "UPDATE starboard_entries SET bot_message_id=NULL WHERE id=$1;"
-                await connection.execute(query, entry_id)
+        if self._pending_edits.pop(bot_message_id, None) is not None:
+            self.edit_stats['dropped'] += 1 # Going away, no point editing it
+
+        self._about_to_be_deleted.add(bot_message_id)
+        if count:
+            # update the bot_message_id to be NULL in the table since we're deleting it
+            query = "UPDATE starboard_entries SET bot_message_id=NULL WHERE id=$1;"
+            await connection.execute(query, entry_id)
+
+        try:
+            await starboard_channel.get_partial_message(bot_message_id).delete()
+        except discord.NotFound:
+            self._about_to_be_deleted.discard(bot_message_id)
+
+    def queue_edit(self, starboard_channel, bot_message_id, channel, message_id, count):
+        """Edit a starboard message to `count` on the next flush, replacing any edit already waiting."""
+
+        if bot_message_id in self._pending_edits:
+            self.edit_stats['coalesced'] += 1
+        self.edit_stats['queued'] += 1
+        self._pending_edits[bot_message_id] = (starboard_channel, channel, message_id, count)
+
+    @tasks.loop(seconds=3)
+    async def star_edit_flusher(self):
+        # Edits are rate limited per channel, so a burst of
+        # reactions only sends the final count once per window
+        await self.flush_edits()
+
+    async def flush_edits(self):
+        pending, self._pending_edits = self._pending_edits, {}
+        for bot_message_id, (starboard_channel, channel, message_id, count) in pending.items():
+            try:
+                await self.flush_edit(starboard_channel, bot_message_id, channel, message_id, count)
+            except Exception as e:
+                print(traceback_maker(e, advance=False))
+
+    async def flush_edit(self, starboard_channel, bot_message_id, channel, message_id, count):
+        # Same lock as starring, so an unstar can't delete the message halfway through
+        async with self.get_lock(message_id):
+            if bot_message_id in self._about_to_be_deleted:
+                self.edit_stats['dropped'] += 1
+                return
 
-            await bot_message.delete()
-        else:
             msg = await self.get_message(channel, message_id)
             if msg is None:
-                raise StarError('\N{BLACK QUESTION MARK ORNAMENT} This message could not be found.')
+                return
 
             content, embed = self.get_emoji_message(msg, count)
-            await bot_message.edit(content=content, embed=embed)
+            try:
+                # No need to fetch our own message to edit it
+                await starboard_channel.get_partial_message(bot_message_id).edit(content=content, embed=embed)
+            except discord.NotFound:
+                # deleted? purge the data, unless the entry moved on to another message or is gone already
+                query = "DELETE FROM starboard_entries WHERE message_id=$1 AND bot_message_id=$2;"
+                await self.bot.db.execute(query, message_id, bot_message_id)
+                return
+            self.edit_stats['sent'] += 1
 
-    @commands.Cog.listener()
-    async def on_raw_reaction_add(self, payload):
+    @star_edit_flusher.before_loop
+    async def before_star_edit_flusher(self):
+        await self.bot.wait_until_ready()
+
+    async def on_star_add(self, payload):
         await self.reaction_action('star', payload)
 
-    @commands.Cog.listener()
-    async def on_raw_reaction_remove(self, payload):
+    async def on_star_remove(self, payload):
         await self.reaction_action('unstar', payload)
 
+    @commands.Cog.listener()
+    async def on_raw_message_edit(self, payload):
+        self._message_cache.pop(payload.message_id) # Fetched again next time it's starred
+
     @commands.Cog.listener()
     async def on_raw_message_delete(self, payload):
+        if payload.message_id in self._message_cache:
+            self._message_cache.set_missing(payload.message_id)
+
         if payload.message_id in self._about_to_be_deleted:
             # we triggered this deletion ourselves and
             # we don't need to drop it from the database
@@ -443,12 +546,16 @@ class stars(commands.Cog, description='Manage and create starboard commands. \nT
 
         # at this point a message got deleted in the starboard
         # so just delete it from the database
-        async with self.bot.pool.acquire(timeout=300.0) as con:
+        async with self.bot.db.acquire(timeout=300.0) as con:
             query = "DELETE FROM starboard_entries WHERE bot_message_id=$1;"
             await con.execute(query, payload.message_id)
 
     @commands.Cog.listener()
     async def on_raw_bulk_message_delete(self, payload):
+        for message_id in payload.message_ids:
+            if message_id in self._message_cache:
+                self._message_cache.set_missing(message_id)
+
         if payload.message_ids <= self._about_to_be_deleted:
             # see comment above
             self._about_to_be_deleted.difference_update(payload.message_ids)
@@ -458,7 +565,7 @@ class stars(commands.Cog, description='Manage and create starboard commands. \nT
         if starboard.channel is None or starboard.channel.id != payload.channel_id:
             return
 
-        async with self.bot.pool.acquire(timeout=300.0) as con:
+        async with self.bot.db.acquire(timeout=300.0) as con:
             query = "DELETE FROM starboard_entries WHERE bot_message_id=ANY($1::bigint[]);"
             await con.execute(query, list(payload.message_ids))
 
@@ -485,15 +592,36 @@ class stars(commands.Cog, description='Manage and create starboard commands. \nT
 
 
             bot_message_id = bot_message_id[0]
-            msg = await self.get_message(starboard.channel, bot_message_id)
-            if msg is not None:
-                await msg.delete()
+            if self._pending_edits.pop(bot_message_id, None) is not None:
+                self.edit_stats['dropped'] += 1
+            try:
+                await starboard.channel.get_partial_message(bot_message_id).delete()
+            except discord.HTTPException:
+                pass
 
     async def get_starboard(self, guild_id: int, *, connection: asyncpg.Pool=None):
+        try:
+            return self._starboards[guild_id]
+        except KeyError:
+            pass
+
         connection = connection or self.bot.db
         query = "SELECT * FROM starboard WHERE id=$1;"
         record = await connection.fetchrow(query, guild_id)
-        return StarboardConfig(guild_id=guild_id, bot=self.bot, record=record)
+        config = self._starboards[guild_id] = StarboardConfig(guild_id=guild_id, bot=self.bot, record=record)
+        return config
+
+    async def invalidate_starboard(self, guild_id: int):
+        """Drop a guild's cached config after changing the starboard table."""
+
+        self._starboards.pop(guild_id, None)
+        await self.bot.cache_bus.publish('starboard', guild_id)
+
+    def refresh_starboard(self, guild_id: Optional[str]):
+        if guild_id is None:
+            self._starboards.clear()
+        else:
+            self._starboards.pop(int(guild_id), None)
 
     @commands.group(case_insensitive=True, invoke_without_command=True)
     @commands.has_guild_permissions(manage_guild=True)
@@ -523,6 +651,7 @@ class stars(commands.Cog, description='Manage and create starboard commands. \nT
             if confirm is False:
                 return await ctx.send("Aborting starboard creation. Join bot support server for more info.")
             await self.bot.db.execute("DELETE FROM starboard WHERE id=$1", ctx.guild.id)
+            await self.invalidate_starboard(ctx.guild.id)
 
         perms = ctx.channel.permissions_for(ctx.me)
 
@@ -552,6 +681,7 @@ class stars(commands.Cog, description='Manage and create starboard commands. \nT
             await channel.delete(reason='Failure to commit to create the starboard.')
             await ctx.send('Could not create the channel due to an internal error. Join the bot support server for help.')
         else:
+            await self.invalidate_starboard(ctx.guild.id)
             await ctx.send(f'\N{GLOWING STAR} Starboard created at {channel.mention}.')
 
     @commands.group(invoke_without_command=True)
@@ -593,6 +723,26 @@ class stars(commands.Cog, description='Manage and create starboard commands. \nT
         else:
             await ctx.message.delete()
 
+    @star.command(name='editstats', hidden=True)
+    @is_dev()
+    async def star_edit_stats(self, ctx):
+        """Show the starboard edit and message cache counters."""
+
+        stats = self.edit_stats
+        cache = self._message_cache.stats
+        embed = Embed()
+        embed.colour = discord.Colour.gold()
+        embed.add_field(name='Queued', value=f"{stats['queued']:,}")
+        embed.add_field(name='Sent', value=f"{stats['sent']:,}")
+        embed.add_field(name='Coalesced', value=f"{stats['coalesced']:,}")
+        embed.add_field(name='Dropped', value=f"{stats['dropped']:,}")
+        embed.add_field(name='Waiting', value=f"{len(self._pending_edits):,}")
+        embed.add_field(name='Cached messages', value=f"{len(self._message_cache):,}/{self.MESSAGE_CACHE_SIZE:,}")
+        embed.add_field(name='Cache hits', value=f"{cache['hits']:,} (+{cache['negative_hits']:,} negative)")
+        embed.add_field(name='Cache misses', value=f"{cache['misses']:,}")
+        embed.add_field(name='Evictions', value=f"{cache['evictions']:,} (+{cache['expired']:,} expired)")
+        await ctx.send(embed=embed)
+
     @star.command(name='lock')
     @commands.has_guild_permissions(manage_guild=True)
     @requires_starboard()
@@ -609,6 +759,7 @@ class stars(commands.Cog, description='Manage and create starboard commands. \nT
 
         query = "UPDATE starboard SET locked=TRUE WHERE id=$1;"
         await ctx.bot.db.execute(query, ctx.guild.id)
+        await self.invalidate_starboard(ctx.guild.id)
 
         await ctx.send('Starboard is now locked.')
 
@@ -622,6 +773,7 @@ class stars(commands.Cog, description='Manage and create starboard commands. \nT
 
         query = "UPDATE starboard SET locked=FALSE WHERE id=$1;"
         await ctx.bot.db.execute(query, ctx.guild.id)
+        await self.invalidate_starboard(ctx.guild.id)
 
         await ctx.send('Starboard is now unlocked.')
 
@@ -643,6 +795,7 @@ class stars(commands.Cog, description='Manage and create starboard commands. \nT
         stars = min(max(stars, 1), 100)
         query = "UPDATE starboard SET threshold=$2 WHERE id=$1;"
         await self.bot.db.execute(query, ctx.guild.id, stars)
+        await self.invalidate_starboard(ctx.guild.id)
 
         await ctx.send(f'Messages now require {plural(stars):star} to show up in the starboard.')
 
@@ -681,6 +834,7 @@ class stars(commands.Cog, description='Manage and create starboard commands. \nT
         # generating that with these clamp units is overkill
         query = f"UPDATE starboard SET max_age='{number} {units}'::interval WHERE id=$1;"
         await ctx.bot.db.execute(query, ctx.guild.id)
+        await self.invalidate_starboard(ctx.guild.id)
 
         if number == 1:
             age = f'1 {units[:-1]}'
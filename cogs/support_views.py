@@ -20,6 +20,13 @@ class support(commands.Cog, description='Support only commands.'):
     def __init__(self, bot : MetroBot):
         self.bot = bot
 
+        # mCheck and mCross on bot requests
+        for emoji_id in (819254444197019669, 819254444217860116):
+            bot.reactions.register(self.bot_request_reaction, guild_id=SUPPORT_GUILD, emoji=emoji_id, events=('add',))
+
+    def cog_unload(self):
+        self.bot.reactions.unregister_all(self.bot_request_reaction)
+
     @property
     def emoji(self) -> str:
         return '🧪'
@@ -33,11 +40,7 @@ class support(commands.Cog, description='Support only commands.'):
         if member.bot:
             await member.add_roles(discord.Object(id=BOTS_ROLE))
 
-    @commands.Cog.listener()
-    async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
-        if payload.guild_id != SUPPORT_GUILD:
-            return 
-
+    async def bot_request_reaction(self, payload: discord.RawReactionActionEvent):
         if payload.channel_id != BOT_REQUESTS_CHANNEL:
             return
 
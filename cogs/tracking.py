@@ -2,31 +2,76 @@
 # https://github.com/Hecate946/Neutra/blob/ed933823abab40d1e35794bb43fa9df9c1d4ab9b/cogs/batch.py
 
 import asyncio
-from collections import defaultdict
-import json
+import datetime
+from collections import Counter, defaultdict
 import time
 from typing import Optional
+import asyncpg
 import discord
 from discord.ext import commands, tasks
 
 from bot import MetroBot
 from utils.custom_context import MyContext
+from utils.decos import is_dev
+from utils.json_loader import get_path
+from utils.tracking_utils import ActivityTracker, MessageRecord, SpillFile, manage_partitions, migrate_messages_table, write_messages
 from utils.useful import Cooldown, Embed, traceback_maker
 
+HEATMAP_SHADES = ' ░▒▓█'
+DAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+
+def render_heatmap(hours) -> str:
+    highest = max(hours) or 1
+    rows = ['    ' + ''.join(str(hour // 10) if hour % 6 == 0 else ' ' for hour in range(24))]
+    rows.append('    ' + ''.join(str(hour % 10) if hour % 6 == 0 else ' ' for hour in range(24)))
+    for day, name in enumerate(DAYS):
+        row = hours[day * 24:(day + 1) * 24]
+        rows.append(f"{name} " + ''.join(HEATMAP_SHADES[round(count / highest * (len(HEATMAP_SHADES) - 1))] for count in row))
+    return '\n'.join(rows)
+
 def setup(bot : MetroBot):
     bot.add_cog(tracking(bot))
 
 class tracking(commands.Cog, description='Module for user and server stats.'):
+    INGEST_MODE = 'copy' # or 'jsonb'
+    HIGH_WATER = 50_000 # Messages buffered before new ones are dropped
+    SPILL_FILE = 'tracking_spill.bin'
+    RETENTION_MONTHS = 12 # Raw messages older than this are rolled up and dropped
+    DELETION_CHUNK = 5_000 # Rows removed per transaction for optout --remove
+    DELETION_PAUSE = 1 # Seconds between chunks
+
     def __init__(self, bot : MetroBot):
         self.bot = bot
         self.batch_lock = asyncio.Lock(loop=bot.loop)
         self.message_batch = []
+        self.deleted_batch = set()
+        self.edited_batch = set()
         self.tracking_batch = defaultdict(dict)
         self.no_tracking = {}
+        self.spill = SpillFile(f"{get_path()}/{self.SPILL_FILE}")
+        self.ingest_stats = Counter(dropped=0, spilled=0, replayed=0)
+        self.activity = ActivityTracker()
+        bot.loop.create_task(self.load_optout())
+        bot.loop.create_task(self.load_activity())
+        bot.cache_bus.register('optout', self.refresh_optout)
         self.message_inserter.start()
+        self.spill_replayer.start()
+        self.partition_manager.start()
+        self.activity_persister.start()
+        self._have_deletions = asyncio.Event(loop=bot.loop)
+        self._deletion_task = bot.loop.create_task(self.process_deletions())
 
     def cog_unload(self):
+        self.bot.cache_bus.unregister('optout', self.refresh_optout)
         self.message_inserter.stop()
+        self.spill_replayer.stop()
+        self.partition_manager.cancel()
+        self.activity_persister.stop()
+        self._deletion_task.cancel()
+        if self.message_batch:
+            # Don't lose what's buffered on reload/shutdown.
+            self.spill_batch(self.message_batch)
+            self.message_batch = []
 
     @property
     def emoji(self) -> str:
@@ -40,6 +85,26 @@ class tracking(commands.Cog, description='Module for user and server stats.'):
             for record in records:
                 self.no_tracking[record['id']] = True
 
+    async def refresh_optout(self, user_id: Optional[str]):
+        """Another process changed someone's optout, or everyone's if `user_id` is None."""
+
+        if user_id is None:
+            self.no_tracking = {}
+            return await self.load_optout()
+
+        query = "SELECT option FROM optout WHERE id = $1"
+        self.no_tracking[int(user_id)] = await self.bot.db.fetchval(query, int(user_id)) is True
+
+    async def load_activity(self):
+        await self.bot.wait_until_ready()
+
+        try:
+            async with self.bot.db.acquire() as conn:
+                await self.activity.load(conn)
+        except Exception as e:
+            # Only the commands miss the history, persisting adds to it either way
+            print(traceback_maker(e, advance=False))
+
     @tasks.loop(seconds=0.5)
     async def message_inserter(self):
         """
@@ -47,21 +112,261 @@ class tracking(commands.Cog, description='Module for user and server stats.'):
         """
         
         if self.message_batch:  # Insert every message into the db
-            query = """
-                    INSERT INTO messages (unix, timestamp,
-                    message_id, author_id, channel_id, server_id)
-                    SELECT x.unix, x.timestamp,
-                    x.message_id, x.author_id, x.channel_id, x.server_id
-                    FROM JSONB_TO_RECORDSET($1::JSONB)
-                    AS x(unix REAL, timestamp TIMESTAMP,
-                    message_id BIGINT, author_id BIGINT,
-                    channel_id BIGINT, server_id BIGINT)
-                    """
+            # Swap the buffer so on_message never waits on the database.
             async with self.batch_lock:
-                data = json.dumps(self.message_batch)
-                await self.bot.db.execute(query, data)
-                self.message_batch.clear()
-                
+                batch, self.message_batch = self.message_batch, []
+
+            try:
+                async with self.bot.db.acquire() as conn:
+                    await write_messages(conn, batch, mode=self.INGEST_MODE)
+            except Exception as e:
+                # Database is down or slow, keep the rows on disk until it's back.
+                print(traceback_maker(e, advance=False))
+                self.spill_batch(batch)
+            else:
+                self.activity.update(batch)
+
+        if self.deleted_batch or self.edited_batch:
+            await self.flag_messages()
+
+    async def flag_messages(self):
+        """
+        Bulk marks messages as deleted/edited.
+        """
+
+        async with self.batch_lock:
+            deleted, self.deleted_batch = self.deleted_batch, set()
+            edited, self.edited_batch = self.edited_batch, set()
+
+        try:
+            async with self.bot.db.acquire() as conn:
+                if deleted:
+                    await conn.execute("UPDATE messages SET deleted = True WHERE message_id = ANY($1::BIGINT[])", list(deleted))
+                if edited:
+                    await conn.execute("UPDATE messages SET edited = True WHERE message_id = ANY($1::BIGINT[])", list(edited))
+        except Exception as e:
+            print(traceback_maker(e, advance=False))
+            async with self.batch_lock: # Retry next loop
+                self.deleted_batch |= deleted
+                self.edited_batch |= edited
+
+    def spill_batch(self, batch):
+        try:
+            self.spill.append(batch)
+        except OSError as e:
+            print(traceback_maker(e, advance=False))
+            self.ingest_stats['dropped'] += len(batch)
+        else:
+            self.ingest_stats['spilled'] += len(batch)
+
+    @tasks.loop(seconds=30)
+    async def spill_replayer(self):
+        """
+        Drains the spill file back into the messages table.
+        """
+
+        if not self.spill.pending():
+            return
+
+        try:
+            async with self.bot.db.acquire() as conn:
+                for offset, records in self.spill.frames():
+                    if records:
+                        try:
+                            await write_messages(conn, records, mode=self.INGEST_MODE)
+                        except (asyncpg.DataError, asyncpg.IntegrityConstraintViolationError) as e:
+                            # This frame will never go in, set it aside instead of retrying it forever
+                            print(traceback_maker(e, advance=False))
+                            self.spill.quarantine(records)
+                        else:
+                            self.activity.update(records)
+                            self.ingest_stats['replayed'] += len(records)
+                    self.spill.commit(offset)
+        except Exception as e:
+            print(traceback_maker(e, advance=False)) # Still down, try again next loop
+            return
+        self.spill.finish()
+
+    @tasks.loop(hours=1)
+    async def partition_manager(self):
+        """
+        Keeps the monthly messages partitions ahead of time and rolls up expired ones.
+        Does nothing until an old unpartitioned table is migrated with `migratemessages`.
+        """
+
+        try:
+            async with self.bot.db.acquire() as conn:
+                created, dropped = await manage_partitions(conn, retention=self.RETENTION_MONTHS)
+        except Exception as e:
+            print(traceback_maker(e)) # Try again next loop
+            return
+
+        if created or dropped:
+            print(f"Partitions created: {', '.join(created) or 'None'} | dropped: {', '.join(dropped) or 'None'}")
+
+    @tasks.loop(minutes=5)
+    async def activity_persister(self):
+        """
+        Saves the hour-of-week histograms.
+        """
+
+        try:
+            async with self.bot.db.acquire() as conn:
+                await self.activity.persist(conn)
+        except Exception as e:
+            print(traceback_maker(e, advance=False)) # Deltas are kept, next loop retries
+
+    async def process_deletions(self):
+        """
+        Works through the optout --remove queue, oldest request first.
+        """
+
+        await self.bot.wait_until_ready()
+        try:
+            while not self.bot.is_closed():
+                self._have_deletions.clear()
+                job = await self.bot.db.fetchrow("SELECT * FROM tracking_deletions ORDER BY requested LIMIT 1")
+                if job is None:
+                    await self._have_deletions.wait()
+                    continue
+
+                await self.run_deletion(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(traceback_maker(e, advance=False))
+            await asyncio.sleep(30)
+            self._deletion_task = self.bot.loop.create_task(self.process_deletions())
+
+    async def lock_deletion(self, conn, user_id: int) -> bool:
+        """
+        Locks a queued deletion for the current transaction.
+        False if it was cancelled, an `unoptout` running meanwhile waits for the chunk to commit.
+        """
+
+        query = "SELECT 1 FROM tracking_deletions WHERE user_id = $1 FOR UPDATE"
+        return await conn.fetchval(query, user_id) is not None
+
+    async def run_deletion(self, job):
+        """
+        Removes a user's messages in chunks so no single statement
+        locks a huge amount of rows. Progress is saved with every chunk
+        and the job just continues where it was after a restart.
+
+        Running `unoptout` drops the queued job, every chunk checks
+        the job is still there first so nothing more gets removed.
+        """
+
+        user_id = job['user_id']
+        total = job['deleted']
+
+        # By row address, message_id can be NULL in old rows. ctid is only unique
+        # within a partition, so it's paired with the partition's tableoid.
+        query = """
+                DELETE FROM messages
+                WHERE author_id = $1
+                AND (tableoid, ctid) IN (
+                    SELECT tableoid, ctid
+                    FROM messages
+                    WHERE author_id = $1
+                    LIMIT $2
+                )
+                """
+        while True:
+            async with self.bot.db.acquire() as conn:
+                async with conn.transaction():
+                    if not await self.lock_deletion(conn, user_id):
+                        return
+                    status = await conn.execute(query, user_id, self.DELETION_CHUNK)
+                    deleted = int(status.split()[-1])
+                    await conn.execute("UPDATE tracking_deletions SET deleted = deleted + $2 WHERE user_id = $1", user_id, deleted)
+            total += deleted
+            if deleted < self.DELETION_CHUNK:
+                break
+            await asyncio.sleep(self.DELETION_PAUSE)
+
+        # Rows without a time set aside by migratemessages, few enough for one statement
+        async with self.bot.db.acquire() as conn:
+            async with conn.transaction():
+                if not await self.lock_deletion(conn, user_id):
+                    return
+                if await conn.fetchval("SELECT to_regclass('messages_untimed')") is not None:
+                    status = await conn.execute("DELETE FROM messages_untimed WHERE author_id = $1", user_id)
+                    deleted = int(status.split()[-1])
+                    await conn.execute("UPDATE tracking_deletions SET deleted = deleted + $2 WHERE user_id = $1", user_id, deleted)
+                    total += deleted
+
+        query = """
+                WITH removed AS (
+                    DELETE FROM message_counts
+                    WHERE author_id = $1
+                    RETURNING server_id, count
+                )
+                UPDATE message_totals
+                SET count = message_totals.count - r.total
+                FROM (
+                    SELECT server_id, SUM(count) AS total
+                    FROM removed
+                    GROUP BY server_id
+                ) AS r
+                WHERE message_totals.server_id = r.server_id
+                """
+        async with self.bot.db.acquire() as conn:
+            async with conn.transaction():
+                if not await self.lock_deletion(conn, user_id):
+                    return
+                await conn.execute(query, user_id)
+                await conn.execute("DELETE FROM tracking_deletions WHERE user_id = $1", user_id)
+
+        content = f"I finished removing your previous message tracking data. (**{total:,}** message{'' if total == 1 else 's'})"
+        try:
+            user = self.bot.get_user(user_id) or await self.bot.fetch_user(user_id)
+            await user.send(content)
+        except discord.HTTPException:
+            channel = self.bot.get_channel(job['channel_id'])
+            if channel:
+                try:
+                    await channel.send(f"<@{user_id}> {content}")
+                except discord.HTTPException:
+                    pass
+
+    async def rebuild_message_counts(self) -> int:
+        """
+        Rebuild the message counters from the raw messages table.
+
+        Returns the amount of (guild, author, day) rows written.
+        """
+
+        async with self.bot.db.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute("LOCK TABLE message_counts, message_totals IN EXCLUSIVE MODE")
+
+                # Days before this only exist as rollups now, keep them.
+                # Older migrations stamped rows without a time as the epoch, those don't count.
+                cutoff = await conn.fetchval("""SELECT MIN("timestamp")::DATE FROM messages WHERE "timestamp" > 'epoch'""")
+                await conn.execute("DELETE FROM message_counts WHERE day >= $1", cutoff or datetime.date.min)
+
+                status = await conn.execute(
+                    """
+                    INSERT INTO message_counts (server_id, author_id, day, count)
+                    SELECT server_id, author_id, timestamp::DATE, COUNT(*)
+                    FROM messages
+                    WHERE server_id IS NOT NULL
+                    AND author_id IS NOT NULL
+                    AND timestamp > 'epoch'
+                    GROUP BY server_id, author_id, timestamp::DATE
+                    """
+                )
+                await conn.execute("DELETE FROM message_totals")
+                await conn.execute(
+                    """
+                    INSERT INTO message_totals (server_id, count)
+                    SELECT server_id, SUM(count)
+                    FROM message_counts
+                    GROUP BY server_id
+                    """
+                )
+        return int(status.split()[-1])
 
     @commands.Cog.listener('on_message')
     async def message_tracking(self, message : discord.Message):
@@ -70,18 +375,39 @@ class tracking(commands.Cog, description='Module for user and server stats.'):
                 return # They don't wanna be tracked
             self.bot.message_stats[message.guild.id] += 1
             async with self.batch_lock:
-                self.message_batch.append(
-                    {
-                        "unix" : message.created_at.timestamp(),
-                        "timestamp" : str(message.created_at.utcnow()),
-                        "message_id" : message.id,
-                        "author_id" : message.author.id,
-                        "channel_id" : message.channel.id,
-                        "server_id" : message.guild.id
-                    }
-                )
+                if len(self.message_batch) >= self.HIGH_WATER:
+                    self.ingest_stats['dropped'] += 1
+                    return
+                self.message_batch.append(MessageRecord.from_message(message))
                 self.tracking_batch[message.author.id] = {time.time() : "sending a message"}
 
+    def add_flags(self, batch: set, message_ids):
+        if len(batch) >= self.HIGH_WATER:
+            self.ingest_stats['dropped'] += len(message_ids)
+            return
+        batch.update(message_ids)
+
+    @commands.Cog.listener('on_raw_message_delete')
+    async def delete_tracking(self, payload: discord.RawMessageDeleteEvent):
+        if payload.guild_id:
+            async with self.batch_lock:
+                self.add_flags(self.deleted_batch, (payload.message_id,))
+
+    @commands.Cog.listener('on_raw_bulk_message_delete')
+    async def bulk_delete_tracking(self, payload: discord.RawBulkMessageDeleteEvent):
+        if payload.guild_id:
+            async with self.batch_lock:
+                self.add_flags(self.deleted_batch, payload.message_ids)
+
+    @commands.Cog.listener('on_raw_message_edit')
+    async def edit_tracking(self, payload: discord.RawMessageUpdateEvent):
+        if not payload.data.get('guild_id'):
+            return
+        if not payload.data.get('edited_timestamp'):
+            return # Embeds loading etc.
+        async with self.batch_lock:
+            self.add_flags(self.edited_batch, (payload.message_id,))
+
     @commands.command(name='optout', usage='[--remove]')
     async def opt_out(self, ctx: MyContext, *, flags: Optional[str]):
         """
@@ -100,12 +426,20 @@ class tracking(commands.Cog, description='Module for user and server stats.'):
 
         self.no_tracking[ctx.author.id] = True
         await self.bot.db.execute("INSERT INTO optout (id, option) VALUES ($1, $2)", ctx.author.id, True)
+        await self.bot.cache_bus.publish('optout', ctx.author.id)
 
         if flags and "--remove" in flags:
-            await self.bot.db.execute("DELETE FROM messages WHERE author_id = $1", ctx.author.id)
+            self.activity.forget(ctx.author.id)
+            query = """
+                    INSERT INTO tracking_deletions (user_id, channel_id, requested)
+                    VALUES ($1, $2, $3)
+                    ON CONFLICT (user_id) DO NOTHING
+                    """
+            await self.bot.db.execute(query, ctx.author.id, ctx.channel.id, datetime.datetime.utcnow())
+            self._have_deletions.set()
 
         await ctx.check()
-        await ctx.send(f"You are now opted out of all message tracking{' and I removed all your previous data.' if flags and '--remove' in flags else '.'}")
+        await ctx.send(f"You are now opted out of all message tracking{'. I am removing your previous data in the background and will let you know when it is done.' if flags and '--remove' in flags else '.'}")
         
     @commands.command(name='unoptout')
     async def unopt_out(self, ctx: MyContext):
@@ -116,7 +450,12 @@ class tracking(commands.Cog, description='Module for user and server stats.'):
         used for message count commands that you can use.
         """
         self.no_tracking[ctx.author.id] = False
-        await self.bot.db.execute("DELETE FROM optout WHERE id=$1", ctx.author.id)
+        async with self.bot.db.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute("DELETE FROM optout WHERE id=$1", ctx.author.id)
+                # Stops a pending optout --remove, data that is already gone stays gone
+                await conn.execute("DELETE FROM tracking_deletions WHERE user_id=$1", ctx.author.id)
+        await self.bot.cache_bus.publish('optout', ctx.author.id)
 
         await ctx.check()
         await ctx.send("You have opted back into message tracking.")
@@ -129,11 +468,11 @@ class tracking(commands.Cog, description='Module for user and server stats.'):
         """
         await ctx.defer()
         query = """
-                SELECT COUNT(*) AS c
-                FROM messages
+                SELECT count
+                FROM message_totals
                 WHERE server_id = $1
                 """
-        count = await self.bot.db.fetchval(query, ctx.guild.id)
+        count = await self.bot.db.fetchval(query, ctx.guild.id) or 0
 
         embed = Embed()
         embed.colour = discord.Colour.green()
@@ -150,10 +489,10 @@ class tracking(commands.Cog, description='Module for user and server stats.'):
         member = member or ctx.author
         await ctx.defer()
         query = """
-                SELECT COUNT(*) as c
-                FROM messages
-                WHERE author_id = $1
-                AND server_id = $2
+                SELECT COALESCE(SUM(count), 0) AS c
+                FROM message_counts
+                WHERE server_id = $2
+                AND author_id = $1
                 """
         count = await self.bot.db.fetchval(query, member.id, ctx.guild.id)
 
@@ -173,8 +512,8 @@ class tracking(commands.Cog, description='Module for user and server stats.'):
         user = user or ctx.author
         await ctx.defer()
         query = """
-                SELECT COUNT(*) as c
-                FROM messages
+                SELECT COALESCE(SUM(count), 0) AS c
+                FROM message_counts
                 WHERE author_id = $1
                 """
         count = await self.bot.db.fetchval(query, user.id)
@@ -190,8 +529,8 @@ class tracking(commands.Cog, description='Module for user and server stats.'):
         """Get the total amount of messages sent."""
         await ctx.defer()
         query = """
-                SELECT COUNT(*) as c
-                FROM messages
+                SELECT COALESCE(SUM(count), 0) AS c
+                FROM message_totals
                 """
         count = await self.bot.db.fetchval(query)
 
@@ -199,4 +538,107 @@ class tracking(commands.Cog, description='Module for user and server stats.'):
         embed.colour = discord.Colour.green()
         embed.description = f"I have seen **{count:,}** message{'' if count == 1 else 's'}"\
                             f"\n*Message tracking started <t:1639287704:R>*"
-        await ctx.send(embed=embed)
\ No newline at end of file
+        await ctx.send(embed=embed)
+
+    @commands.command(name='rebuildcounts', hidden=True)
+    @is_dev()
+    async def rebuild_counts(self, ctx: MyContext):
+        """Rebuild the message counters from the raw messages table."""
+        confirm = await ctx.confirm(
+            "This will rebuild every message counter from scratch. Continue?",
+            delete_after=True, timeout=60)
+        if confirm is False:
+            raise commands.BadArgument("Canceled.")
+        if confirm is None:
+            raise commands.BadArgument("Timed out.")
+
+        async with ctx.typing():
+            start = time.perf_counter()
+            rows = await self.rebuild_message_counts()
+            end = time.perf_counter()
+
+        await ctx.send(f"{self.bot.check} Rebuilt **{rows:,}** counter row{'' if rows == 1 else 's'} in `{end - start:.2f}s`.")
+
+    @commands.command(name='migratemessages', hidden=True)
+    @is_dev()
+    async def migrate_messages(self, ctx: MyContext):
+        """Partition an old unpartitioned messages table, once."""
+        kind = await self.bot.db.fetchval("SELECT relkind FROM pg_class WHERE oid = to_regclass('messages')")
+        if kind != 'r':
+            raise commands.BadArgument("The messages table is already partitioned.")
+
+        confirm = await ctx.confirm(
+            "This validates and attaches the whole messages table, it can take a while. Continue?",
+            delete_after=True, timeout=60)
+        if confirm is False:
+            raise commands.BadArgument("Canceled.")
+        if confirm is None:
+            raise commands.BadArgument("Timed out.")
+
+        async with ctx.typing():
+            start = time.perf_counter()
+            async with self.bot.db.acquire() as conn:
+                moved = await migrate_messages_table(conn, datetime.datetime.utcnow())
+            end = time.perf_counter()
+        self.partition_manager.restart() # Create the upcoming partitions now
+
+        await ctx.send(f"{self.bot.check} Migrated the messages table in `{end - start:.2f}s`. "
+                       f"**{moved:,}** row{'' if moved == 1 else 's'} without a time moved to `messages_untimed`.")
+
+    @commands.command(name='ingeststats', hidden=True)
+    @is_dev()
+    async def ingest_stats_command(self, ctx: MyContext):
+        """Show the message tracking ingestion counters."""
+        embed = Embed()
+        embed.colour = discord.Colour.green()
+        embed.add_field(name='Buffered', value=f"{len(self.message_batch):,}/{self.HIGH_WATER:,}")
+        embed.add_field(name='Dropped', value=f"{self.ingest_stats['dropped']:,}")
+        embed.add_field(name='Spilled', value=f"{self.ingest_stats['spilled']:,}")
+        embed.add_field(name='Replayed', value=f"{self.ingest_stats['replayed']:,}")
+        embed.add_field(name='Spill file', value=f"{self.spill.size() / 1024:,.1f} KiB")
+        embed.add_field(name='Quarantined frames', value=f"{self.spill.quarantined:,}")
+        await ctx.send(embed=embed)
+
+    @commands.command(name='topchatters', aliases=['tc'])
+    @commands.check(Cooldown(2, 10, 2, 8, commands.BucketType.member))
+    async def top_chatters(self, ctx: MyContext):
+        """
+        Show the most active members in this guild this week.
+        
+        Weeks start on Monday. (UTC)
+        """
+        top = self.activity.get(ctx.guild.id).top(10)
+        if not top:
+            raise commands.BadArgument("I haven't seen any messages in this guild this week.")
+
+        embed = Embed()
+        embed.colour = discord.Colour.green()
+        embed.title = f"Top chatters this week in {ctx.guild}"
+        embed.description = '\n'.join(
+            f"**{index}.** <@{author_id}> - **{count:,}** message{'' if count == 1 else 's'}"
+            for index, (author_id, count) in enumerate(top, start=1)
+        )
+        await ctx.send(embed=embed)
+
+    @commands.command(name='busiesthours', aliases=['heatmap', 'bh'])
+    @commands.check(Cooldown(2, 10, 2, 8, commands.BucketType.member))
+    async def busiest_hours(self, ctx: MyContext):
+        """
+        Show the busiest hours of the week in this guild.
+        
+        Hours are in UTC.
+        """
+        activity = self.activity.get(ctx.guild.id)
+        if not any(activity.hours):
+            raise commands.BadArgument("I haven't seen any messages in this guild yet.")
+
+        busiest = ', '.join(
+            f"**{DAYS[hour // 24]} {hour % 24:02}:00** ({count:,})"
+            for hour, count in activity.busiest(3) if count
+        )
+
+        embed = Embed()
+        embed.colour = discord.Colour.green()
+        embed.title = f"Busiest hours in {ctx.guild} (UTC)"
+        embed.description = f"```\n{render_heatmap(activity.hours)}\n```\nBusiest: {busiest}"
+        await ctx.send(embed=embed)
@@ -1,25 +1,26 @@
 from ast import parse
-from collections import defaultdict
 import re
 import discord
 from discord.enums import try_enum
 from discord.ext import commands, menus
 
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 from bot import MetroBot
 
 from utils.json_loader import read_json
 from utils.custom_context import MyContext
-from utils.remind_utils import FutureTime, human_timedelta
+from utils.remind_utils import FutureTime
 from utils.useful import Cooldown, Embed
 from utils.useful import Embed
 from utils.new_pages import SimplePages
 from utils.remind_utils import UserFriendlyTime
 from utils.pages import ExtraPages
 from utils.converters import RoleConverter
+from utils.cache_utils import LRUCache, MISSING
+from utils.highlight_utils import HighlightIndex
+from utils.timer_utils import Timer, TimerScheduler
 
-from datetime import timedelta
 import json
 import random
 import io
@@ -154,52 +155,6 @@ class WinnerConverter(commands.Converter):
                 raise commands.BadArgument("\U00002753 There was an issue converting your winners argument.")
                 
     
-class Timer:
-    __slots__ = ("args", "kwargs", "event", "id", "created_at", "expires")
-
-    def __init__(self, *, record):
-        self.id = record["id"]
-        extra = record["extra"]
-        self.args = extra.get("args", [])
-        self.kwargs = extra.get("kwargs", {})
-        self.event = record["event"]
-        self.created_at = record["created"]
-        self.expires = record["expires"]
-
-    @classmethod
-    def temporary(cls, *, expires, created, event, args, kwargs):
-        pseudo = {
-            "id": None,
-            "extra": {"args": args, "kwargs": kwargs},
-            "event": event,
-            "created": created,
-            "expires": expires,
-        }
-        return cls(record=pseudo)
-
-    def __eq__(self, other):
-        try:
-            return self.id == other.id
-        except AttributeError:
-            return False
-
-    def __hash__(self):
-        return hash(self.id)
-
-    @property
-    def human_delta(self):
-        return human_timedelta(self.created_at)
-
-    @property
-    def author_id(self):
-        if self.args:
-            return int(self.args[0])
-        return None
-
-    def __repr__(self):
-        return f"<Timer created={self.created_at} expires={self.expires} event={self.event}>"
-
-
 class GithubError(commands.CommandError):
     pass
 
@@ -244,14 +199,21 @@ class CustomPermissions:
     pass
 
 class utility(commands.Cog, description="Get utilities like prefixes, serverinfo, source, etc."):
+    HIGHLIGHT_DEBOUNCE = 10 # Seconds matches are collected before one DM is sent
+    HIGHLIGHT_MAX_ENTRIES = 5 # Messages shown per DM
+    HIGHLIGHT_RATE = (3, 60) # DMs per seconds per user
+    HIGHLIGHT_COOLDOWNS = 50_000 # Users with a cooldown kept at once
+
     def __init__(self, bot : MetroBot):
         self.bot = bot
         self._req_lock = asyncio.Lock(loop=self.bot.loop)
-        self._have_data = asyncio.Event(loop=bot.loop)
-        self._current_timer = None
+        self.timers = TimerScheduler(bot.db, self.call_timer)
         self._task = bot.loop.create_task(self.dispatch_timers())
 
-        self.highlight = defaultdict(list)
+        self.highlight = HighlightIndex()
+        self._highlight_pending = {} # (user_id, channel_id): {message_id: (message, words, context)}
+        # user_id: commands.Cooldown, a bucket left alone for a whole window is as good as new
+        self._highlight_cooldowns = LRUCache(self.HIGHLIGHT_COOLDOWNS, ttl=self.HIGHLIGHT_RATE[1], negative_ttl=0)
 
         bot.loop.create_task(self.load_highlight())
 
@@ -383,7 +345,8 @@ class utility(commands.Cog, description="Get utilities like prefixes, serverinfo
 
         try:
             await self.bot.db.execute(query, ctx.guild.id, prefix)
-            self.bot.prefixes[ctx.guild.id] = await self.bot.fetch_prefixes(ctx.message)
+            self.bot.set_prefixes(ctx.guild.id, (*self.bot.prefixes.get(ctx.guild.id, ()), prefix))
+            await self.bot.cache_bus.publish('prefixes', ctx.guild.id)
             
             embed = Embed()
             embed.colour = discord.Colour.green()
@@ -430,7 +393,8 @@ class utility(commands.Cog, description="Get utilities like prefixes, serverinfo
             return await ctx.send(embed=embed)
 
         await self.bot.db.execute('DELETE FROM prefixes WHERE (guild_id, prefix) = ($1, $2)', ctx.guild.id, prefix)
-        self.bot.prefixes[ctx.guild.id] = await self.bot.fetch_prefixes(ctx.message)
+        self.bot.set_prefixes(ctx.guild.id, [p for p in self.bot.prefixes.get(ctx.guild.id, ()) if p != prefix])
+        await self.bot.cache_bus.publish('prefixes', ctx.guild.id)
 
     @prefix.command(name='clear')
     @commands.has_permissions(manage_guild=True)
@@ -444,7 +408,8 @@ class utility(commands.Cog, description="Get utilities like prefixes, serverinfo
             return await ctx.send('Canceled.')
 
         await self.bot.db.execute('DELETE FROM prefixes WHERE guild_id = $1', ctx.guild.id)
-        self.bot.prefixes[ctx.guild.id] = self.bot.PRE
+        self.bot.set_prefixes(ctx.guild.id, ())
+        await self.bot.cache_bus.publish('prefixes', ctx.guild.id)
 
         embed = Embed()
         embed.description = f'{self.bot.check} **|** Reset all my prefixes!'
@@ -713,77 +678,23 @@ class utility(commands.Cog, description="Get utilities like prefixes, serverinfo
         except discord.Forbidden:
             await ctx.send("Oops! I couldn't send you a message. Are you sure your DMs are on?")
 
-    async def get_active_timer(self, *, connection=None, days=7):
-        query = "SELECT * FROM reminders WHERE expires < (CURRENT_DATE + $1::interval) ORDER BY expires LIMIT 1;"
-        con = connection or self.bot.db
-
-        record = await con.fetchrow(query, timedelta(days=days))
-        if record:
-            if type(record["extra"]) is dict:
-                extra = record["extra"]
-            else:
-                extra = json.loads(record["extra"])
-            record_dict = {
-                "id": record["id"],
-                "extra": extra,
-                "event": record["event"],
-                "created": record["created"],
-                "expires": record["expires"],
-            }
-        return Timer(record=record_dict) if record else None
-
-    async def wait_for_active_timers(self, *, connection=None, days=7):
-
-        timer = await self.get_active_timer(connection=connection, days=days)
-        
-        if timer is not None:
-            self._have_data.set()
-            return timer
-
-        self._have_data.clear()
-        self._current_timer = None
-        await self._have_data.wait()
-        return await self.get_active_timer(connection=connection, days=days)
-
-    async def call_timer(self, timer):
-        
-        # delete the timer
-        query = "DELETE FROM reminders WHERE id=$1;"
-        await self.bot.db.execute(query, timer.id)
-
+    def call_timer(self, timer):
         # dispatch the event
         event_name = f"{timer.event}_timer_complete"
         self.bot.dispatch(event_name, timer)
 
     async def dispatch_timers(self):
+        await self.bot.wait_until_ready()
 
-        try:            
-            while not self.bot.is_closed():
-                
-                # can only asyncio.sleep for up to ~48 days reliably
-                # so we're gonna cap it off at 40 days
-                # see: http://bugs.python.org/issue20493
-                timer = self._current_timer = await self.wait_for_active_timers(days=40)
-                
-                now = datetime.datetime.utcnow()
-                if timer.expires >= now:
-                    to_sleep = (timer.expires - now).total_seconds()
-                    await asyncio.sleep(to_sleep)
-
-                await self.call_timer(timer)
+        try:
+            await self.timers.load()
+            await self.timers.run()
         except asyncio.CancelledError:
             raise
         except (OSError, discord.ConnectionClosed, asyncpg.PostgresConnectionError):
-            self._task.cancel()
+            await asyncio.sleep(5)
+            self.timers = TimerScheduler(self.bot.db, self.call_timer)
             self._task = self.bot.loop.create_task(self.dispatch_timers())
-        except Exception as e:
-            raise e
-
-    async def short_timer_optimisation(self, seconds, timer):
-        await asyncio.sleep(seconds)
-        event_name = f"{timer.event}_timer_complete"
-        self.bot.dispatch(event_name, timer)
-
 
     async def create_timer(self, *args, **kwargs):
         """Creates a timer.
@@ -816,10 +727,7 @@ class utility(commands.Cog, description="Get utilities like prefixes, serverinfo
         if not when or not event:
             raise commands.BadArgument('Invalid time provided, try e.g. "tomorrow" or "3 days"')
 
-        try:
-            connection = kwargs.pop('connection')
-        except KeyError:
-            connection = self.bot.db
+        connection = kwargs.pop('connection', None)
 
         try:
             now = kwargs.pop('created')
@@ -830,43 +738,7 @@ class utility(commands.Cog, description="Get utilities like prefixes, serverinfo
         when = when.astimezone(datetime.timezone.utc).replace(tzinfo=None)
         now = now.astimezone(datetime.timezone.utc).replace(tzinfo=None)
 
-        timer = Timer.temporary(event=event, args=args, kwargs=kwargs, expires=when, created=now)
-        delta = (when - now).total_seconds()
-        if delta <= 30:
-            # a shortcut for small timers
-            self.bot.loop.create_task(self.short_timer_optimisation(delta, timer))
-            return timer
-
-        next_id_query = """SELECT MAX(id) FROM reminders;"""
-        id = await connection.fetch(next_id_query)
-
-        if id[0].get('max') is None:
-            id = 1
-        else:
-            id = int(id[0].get('max')) + 1
-
-
-        query = """INSERT INTO reminders (id, event, extra, expires, created)
-                   VALUES ($1, $2, $3::jsonb, $4, $5)
-                   RETURNING id;
-                """
-
-        jsonb = json.dumps({"args": args, "kwargs": kwargs}, default=str)
-
-        row = await connection.fetchrow(query, id, event, jsonb, when, now)
-        timer.id = row[0]
-
-        # only set the data check if it can be waited on
-        if delta <= (86400 * 40): # 40 days
-            self._have_data.set()
-
-        # check if this timer is earlier than our currently run timer
-        if self._current_timer and when < self._current_timer.expires:
-            # cancel the task and re-run it
-            self._task.cancel()
-            self._task = self.bot.loop.create_task(self.dispatch_timers())
-
-        return timer
+        return await self.timers.create(when, event, *args, connection=connection, created=now, **kwargs)
 
     @commands.group(aliases=['remind','rm'], usage="<when>", invoke_without_command=True, slash_command=True)
     @commands.bot_has_permissions(send_messages=True)
@@ -914,11 +786,11 @@ class utility(commands.Cog, description="Get utilities like prefixes, serverinfo
                 SELECT id, expires, extra #>> '{args,2}'
                 FROM reminders
                 WHERE event = 'reminder'
-                AND extra #>> '{args,0}' = $1
+                AND author_id = $1
                 ORDER BY expires;
                 """
 
-        records = await self.bot.db.fetch(query, str(ctx.author.id))
+        records = await self.bot.db.fetch(query, ctx.author.id)
 
         if not records:
             return await ctx.send('You have no reminders.')
@@ -942,19 +814,14 @@ class utility(commands.Cog, description="Get utilities like prefixes, serverinfo
                 DELETE FROM reminders
                 WHERE id=$1
                 AND event = 'reminder'
-                AND extra #>> '{args,0}' = $2;
+                AND author_id = $2;
                 """
 
-        status = await self.bot.db.execute(query, id, str(ctx.author.id))
+        status = await self.bot.db.execute(query, id, ctx.author.id)
         if status == "DELETE 0":
             return await ctx.send('Could not delete any reminders with that ID')
 
-        # if the current timer is being deleted
-        if self._current_timer and self._current_timer.id == id:
-            # cancel the task and re-run it
-            self._task.cancel()
-            self._task = self.bot.loop.create_task(self.dispatch_timers())
-
+        self.timers.remove(id)
         await ctx.send("Successfully deleted reminder.")
 
 
@@ -972,10 +839,10 @@ class utility(commands.Cog, description="Get utilities like prefixes, serverinfo
                 SELECT COUNT(*)
                 FROM reminders
                 WHERE event = 'reminder'
-                AND extra #>> '{args,0}' = $1;
+                AND author_id = $1;
                 """
 
-        author_id = str(ctx.author.id)
+        author_id = ctx.author.id
         total = await self.bot.db.fetchrow(query, author_id)
         total = total[0]
 
@@ -990,13 +857,10 @@ class utility(commands.Cog, description="Get utilities like prefixes, serverinfo
         if confirm is False:
             return await ctx.send('Canceled.')
 
-        query = """DELETE FROM reminders WHERE event = 'reminder' AND extra #>> '{args,0}' = $1;"""
+        query = """DELETE FROM reminders WHERE event = 'reminder' AND author_id = $1 RETURNING id;"""
 
-        await self.bot.db.execute(query, author_id)
-
-        if self._current_timer and self._current_timer.author_id == ctx.author.id:
-            self._task.cancel()
-            self._task = self.bot.loop.create_task(self.dispatch_timers())
+        records = await self.bot.db.fetch(query, author_id)
+        self.timers.remove(*[record['id'] for record in records])
 
         await ctx.send(f'Successfully deleted **{total}** reminder(s)')
         
@@ -1129,10 +993,10 @@ class utility(commands.Cog, description="Get utilities like prefixes, serverinfo
                 SELECT (id, expires, extra, created)
                 FROM reminders
                 WHERE event = 'giveaway'
-                AND extra #>> '{args,0}' = $1
+                AND guild_id = $1
                 ORDER BY expires;
                 """
-        records = await self.bot.db.fetch(query, str(ctx.guild.id))
+        records = await self.bot.db.fetch(query, ctx.guild.id)
         if not records:
             return await ctx.send("There are no active giveaways in this guild.")
 
@@ -1196,13 +1060,11 @@ class utility(commands.Cog, description="Get utilities like prefixes, serverinfo
                 DELETE FROM reminders
                 WHERE id=$1
                 AND event = 'giveaway'
-                AND extra #>> '{args,1}' = $2;
+                AND author_id = $2;
                 """
-        status = await self.bot.db.execute(query, id, str(ctx.author.id))
-
-        if self._current_timer and self._current_timer.id == id:
-            self._task.cancel()
-            self._task = self.bot.loop.create_task(self.dispatch_timers())
+        status = await self.bot.db.execute(query, id, ctx.author.id)
+        if status != 'DELETE 0':
+            self.timers.remove(id)
 
         guild = self.bot.get_guild(guild_id)
         if guild is None:
@@ -1396,15 +1258,17 @@ class utility(commands.Cog, description="Get utilities like prefixes, serverinfo
 
     async def load_highlight(self):
         await self.bot.wait_until_ready()
-        self.highlight = {}
+        highlight = HighlightIndex()
 
         query = """
-                SELECT * FROM highlight
+                SELECT guild_id, text, author_id FROM highlight
                 """
         records = await self.bot.db.fetch(query)
         if records:
             for record in records:
-                self.highlight[record['text']] = (record['guild_id'], record['author_id'])
+                highlight.add(record['guild_id'], record['text'], record['author_id'])
+        await highlight.build()
+        self.highlight = highlight
 
     @commands.group(name='highlight', invoke_without_command=True, case_insensitive=True, aliases=['hl'])
     @commands.guild_only()
@@ -1432,7 +1296,7 @@ class utility(commands.Cog, description="Get utilities like prefixes, serverinfo
             raise commands.BadArgument(f'"{word}" is already in your highlights list.')
         
         await self.bot.db.execute("INSERT INTO highlight (author_id, text, guild_id) VALUES ($1, $2, $3)", ctx.author.id, word, ctx.guild.id)
-        self.highlight[word] = (ctx.guild.id, ctx.author.id)
+        self.highlight.add(ctx.guild.id, word, ctx.author.id)
 
         await ctx.send(f"{self.bot.emotes['check']} Added to your highlights.\n> It is recommended to delete your message so your highlights are private.")
         await ctx.message.delete(delay=8, silent=True)
@@ -1447,7 +1311,7 @@ class utility(commands.Cog, description="Get utilities like prefixes, serverinfo
         if status != 'DELETE 1':
             raise commands.BadArgument(f"{self.bot.emotes['cross']} The word \"{word}\" is not in your highlight list.")
         
-        del self.highlight[word]
+        self.highlight.remove(ctx.guild.id, word, ctx.author.id)
         await ctx.send(f"{self.bot.emotes['check']} Removed \"{word}\" from your highlight list.")
 
     @highlight.command(name='list', aliases=['show', 'display'])
@@ -1486,50 +1350,110 @@ class utility(commands.Cog, description="Get utilities like prefixes, serverinfo
             return await ctx.send("Timed out.")
         
         await self.bot.db.execute("DELETE FROM highlight WHERE author_id = $1 AND guild_id = $2", ctx.author.id, ctx.guild.id)
-        await self.load_highlight() # whatever
+        for record in data:
+            self.highlight.remove(ctx.guild.id, record['text'], ctx.author.id)
 
         await ctx.send(f"{self.bot.emotes['check']} Cleared all your highlights.")
 
-    async def generate_context(self, msg, hl):
+    async def generate_context(self, message: discord.Message) -> List[str]:
         fmt = []
-        async for m in msg.channel.history(limit=5):
+        async for m in message.channel.history(limit=5):
             time = m.created_at.strftime("%H:%M:%S")
             fmt.append(f"**[{time}] {m.author.name}:** {m.content[:200]}")
-        e = discord.Embed(title=f"**{hl}**", description='\n'.join(fmt[::-1]))
-        e.add_field(name='Jump to', value=f"[Jump!]({m.jump_url})")
-        return e
+        return fmt[::-1]
+
+    def queue_highlight(self, user: discord.Member, message: discord.Message, word: str, context: List[str]):
+        key = (user.id, message.channel.id)
+        pending = self._highlight_pending.get(key)
+        if pending is None:
+            pending = self._highlight_pending[key] = {}
+            self.bot.loop.create_task(self.send_highlights(user, message.channel))
+
+        try:
+            pending[message.id][1].append(word)
+        except KeyError:
+            pending[message.id] = (message, [word], context)
+            if len(pending) > self.HIGHLIGHT_MAX_ENTRIES * 10: # Drop the oldest when rate limited for long
+                del pending[next(iter(pending))]
+
+    async def send_highlights(self, user: discord.Member, channel: discord.TextChannel):
+        """Sends everything a user got highlighted for in a channel as one DM."""
+
+        await asyncio.sleep(self.HIGHLIGHT_DEBOUNCE)
+
+        bucket = self._highlight_cooldowns.get(user.id)
+        if bucket is MISSING:
+            bucket = commands.Cooldown(*self.HIGHLIGHT_RATE)
+        self._highlight_cooldowns.set(user.id, bucket) # Shared with their other channels while waiting
+        retry_after = bucket.update_rate_limit()
+        while retry_after:
+            # Keep collecting, they get it all at once when the cooldown is up.
+            await asyncio.sleep(retry_after)
+            retry_after = bucket.update_rate_limit()
+        self._highlight_cooldowns.set(user.id, bucket) # Expires a full window after this use
+
+        pending = self._highlight_pending.pop((user.id, channel.id), None)
+        if not pending:
+            return
+
+        entries = list(pending.values())
+        words = list(dict.fromkeys(word for _, entry_words, _ in entries for word in entry_words))
+        last_message, _, context = entries[-1]
+
+        e = discord.Embed(title=', '.join(f"**{word}**" for word in words), description='\n'.join(context))
+        e.add_field(
+            name='Jump to',
+            value='\n'.join(f"[{discord.utils.format_dt(message.created_at, 'T')}]({message.jump_url})" for message, _, _ in entries[-self.HIGHLIGHT_MAX_ENTRIES:])
+        )
+        if len(entries) > self.HIGHLIGHT_MAX_ENTRIES:
+            e.set_footer(text=f'+ {len(entries) - self.HIGHLIGHT_MAX_ENTRIES} more message(s)')
+
+        quoted = ', '.join(f'"{word}"' for word in words)
+        try:
+            await user.send(f"In {channel.mention}, you were mentioned with the highlighted word{'' if len(words) == 1 else 's'} {quoted}", embed=e)
+        except discord.HTTPException:
+            pass
 
     @commands.Cog.listener("on_message")
     async def highlight_core(self, message: discord.Message):
         """The core of highlight."""
 
-        # If you wanna call this inefficient idc. it works fine for me
-
         if message.guild is None:
             return
         if message.author.bot:
             return
 
+        if message.guild.id not in self.highlight:
+            return
+
         final_message = self.website_regex.sub('', message.content.lower())
         final_message = self.regex_pattern.sub('', final_message)
 
-        if self.highlight:
-            try:
-                for key, value in self.highlight.items(): 
-                    if message.guild.id != value[0]:
-                        return
-                    if str(key).lower() in final_message and message.author.id != value[1]:
-                        e = await self.generate_context(message, key)
-                        user = message.guild.get_member(value[1])
-                        if user is not None and user in message.mentions:
-                            continue
-                        if user is not None and message.channel.permissions_for(user).read_messages:
-                            ctx = await self.bot.get_context(message)
-                            if ctx.prefix is not None:
-                                continue
-                            await user.send(f"In {message.channel.mention}, you were mentioned with the highlighted word \"{key}\"", embed=e)
-            except RuntimeError:
-                pass # Can't do shit really
+        matches = self.highlight.match(message.guild.id, final_message)
+        if not matches:
+            return
+
+        # Commands don't trigger highlights
+        prefixes = await self.bot.get_prefix(message)
+        if isinstance(prefixes, str):
+            prefixes = (prefixes,)
+        # The empty prefix of no-prefix mode would make every message a command
+        prefixes = tuple(prefix for prefix in prefixes if prefix)
+        if prefixes and message.content.startswith(prefixes):
+            return
+
+        mentioned = {user.id for user in message.mentions}
+        context = None
+        for key, subscribers in matches.items():
+            for author_id in tuple(subscribers):
+                if author_id == message.author.id or author_id in mentioned:
+                    continue
+                user = message.guild.get_member(author_id)
+                if user is None or not message.channel.permissions_for(user).read_messages:
+                    continue
+                if context is None: # Only fetched once per message
+                    context = await self.generate_context(message)
+                self.queue_highlight(user, message, key, context)
 
     @commands.command(name='embed')
     @commands.has_permissions(manage_messages=True)
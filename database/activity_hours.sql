@@ -0,0 +1,6 @@
+CREATE TABLE IF NOT EXISTS activity_hours
+(
+    server_id bigint NOT NULL,
+    hours bigint[] NOT NULL,
+    CONSTRAINT activity_hours_pkey PRIMARY KEY (server_id)
+)
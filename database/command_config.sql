@@ -3,4 +3,16 @@ CREATE TABLE IF NOT EXISTS command_config
     server_id bigint NOT NULL,
     entity_id bigint,
     command text COLLATE pg_catalog."default" NOT NULL
-)
+);
+
+-- One row per disabled command so bulk disables can use ON CONFLICT.
+-- Older tables could hold duplicates, drop them first.
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_class WHERE relname = 'command_config_server_id_entity_id_command_idx') THEN
+        DELETE FROM command_config a USING command_config b
+        WHERE a.ctid > b.ctid AND a.server_id = b.server_id
+        AND a.entity_id = b.entity_id AND a.command = b.command;
+        CREATE UNIQUE INDEX command_config_server_id_entity_id_command_idx ON command_config (server_id, entity_id, command);
+    END IF;
+END $$;
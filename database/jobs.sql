@@ -0,0 +1,23 @@
+-- Long running bulk jobs (mass roles, multiban, server lockdown), see utils.job_utils.JobManager.
+-- Targets before `cursor` have been processed, unfinished jobs are resumed from there on startup.
+CREATE TABLE IF NOT EXISTS jobs
+(
+    id bigserial NOT NULL,
+    kind text NOT NULL,
+    guild_id bigint NOT NULL,
+    author_id bigint NOT NULL,
+    channel_id bigint,
+    message_id bigint,
+    extra jsonb NOT NULL DEFAULT '{}'::jsonb,
+    targets bigint[] NOT NULL,
+    cursor integer NOT NULL DEFAULT 0,
+    done integer NOT NULL DEFAULT 0,
+    failed integer NOT NULL DEFAULT 0,
+    status text NOT NULL DEFAULT 'running',
+    created timestamp without time zone NOT NULL DEFAULT (now() at time zone 'utc'),
+    updated timestamp without time zone NOT NULL DEFAULT (now() at time zone 'utc'),
+    CONSTRAINT jobs_pkey PRIMARY KEY (id)
+);
+
+CREATE INDEX IF NOT EXISTS jobs_status_idx ON jobs (status);
+CREATE INDEX IF NOT EXISTS jobs_guild_id_idx ON jobs (guild_id, id);
@@ -0,0 +1,19 @@
+CREATE TABLE IF NOT EXISTS message_counts
+(
+    server_id bigint NOT NULL,
+    author_id bigint NOT NULL,
+    day date NOT NULL,
+    count bigint NOT NULL DEFAULT 0,
+    CONSTRAINT message_counts_pkey PRIMARY KEY (server_id, author_id, day)
+);
+
+CREATE INDEX IF NOT EXISTS message_counts_author_id_idx ON message_counts (author_id);
+
+CREATE TABLE IF NOT EXISTS message_totals
+(
+    server_id bigint NOT NULL,
+    count bigint NOT NULL DEFAULT 0,
+    CONSTRAINT message_totals_pkey PRIMARY KEY (server_id)
+);
+
+CREATE INDEX IF NOT EXISTS message_counts_day_idx ON message_counts (day);
@@ -1,6 +1,6 @@
 CREATE TABLE IF NOT EXISTS messages
 (
-    index bigint PRIMARY KEY,
+    index bigint GENERATED BY DEFAULT AS IDENTITY,
     unix real,
     "timestamp" timestamp without time zone,
     message_id bigint,
@@ -9,4 +9,4 @@ CREATE TABLE IF NOT EXISTS messages
     server_id bigint,
     deleted boolean DEFAULT false,
     edited boolean DEFAULT false
-)
\ No newline at end of file
+) PARTITION BY RANGE ("timestamp")
@@ -2,4 +2,15 @@ CREATE TABLE IF NOT EXISTS plonks
 (
     server_id bigint NOT NULL,
     entity_id bigint NOT NULL
-)
+);
+
+-- One row per entity so bulk ignores can use ON CONFLICT.
+-- Older tables could hold duplicates, drop them first.
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_class WHERE relname = 'plonks_server_id_entity_id_idx') THEN
+        DELETE FROM plonks a USING plonks b
+        WHERE a.ctid > b.ctid AND a.server_id = b.server_id AND a.entity_id = b.entity_id;
+        CREATE UNIQUE INDEX plonks_server_id_entity_id_idx ON plonks (server_id, entity_id);
+    END IF;
+END $$;
@@ -1,9 +1,51 @@
 CREATE TABLE IF NOT EXISTS reminders
 (
-    id bigint NOT NULL,
+    id bigserial NOT NULL,
     event text COLLATE pg_catalog."default" NOT NULL,
     extra jsonb NOT NULL,
     expires timestamp without time zone NOT NULL,
     created timestamp without time zone NOT NULL,
+    guild_id bigint,
+    author_id bigint,
+    target_id bigint,
     CONSTRAINT reminders_pkey PRIMARY KEY (id)
-)
+);
+
+-- Migrate tables from before ids came from a sequence and the
+-- commonly filtered extra fields were columns.
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_class WHERE relname = 'reminders_id_seq' AND relkind = 'S') THEN
+        CREATE SEQUENCE reminders_id_seq OWNED BY reminders.id;
+        PERFORM setval('reminders_id_seq', COALESCE((SELECT MAX(id) FROM reminders), 0) + 1, false);
+        ALTER TABLE reminders ALTER COLUMN id SET DEFAULT nextval('reminders_id_seq');
+    END IF;
+
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'reminders' AND column_name = 'target_id'
+    ) THEN
+        ALTER TABLE reminders
+            ADD COLUMN guild_id bigint,
+            ADD COLUMN author_id bigint,
+            ADD COLUMN target_id bigint;
+
+        -- Keep in sync with utils.timer_utils.timer_columns
+        UPDATE reminders SET
+            guild_id = CASE WHEN event = 'reminder' THEN NULL ELSE (extra #>> '{args,0}')::bigint END,
+            author_id = CASE WHEN event = 'reminder' THEN (extra #>> '{args,0}')::bigint ELSE (extra #>> '{args,1}')::bigint END,
+            target_id = CASE event
+                WHEN 'reminder' THEN (extra #>> '{args,1}')::bigint
+                WHEN 'tempban' THEN (extra #>> '{args,2}')::bigint
+                WHEN 'tempblock' THEN (extra #>> '{args,3}')::bigint
+                WHEN 'temprole' THEN (extra #>> '{args,3}')::bigint
+                WHEN 'giveaway' THEN (extra #>> '{args,3}')::bigint
+                WHEN 'mute' THEN (extra #>> '{kwargs,user_id}')::bigint
+                WHEN 'lockdown' THEN (extra #>> '{kwargs,channel_id}')::bigint
+            END;
+    END IF;
+END $$;
+
+CREATE INDEX IF NOT EXISTS reminders_expires_idx ON reminders (expires);
+CREATE INDEX IF NOT EXISTS reminders_event_guild_id_target_id_idx ON reminders (event, guild_id, target_id);
+CREATE INDEX IF NOT EXISTS reminders_event_author_id_idx ON reminders (event, author_id);
@@ -0,0 +1,8 @@
+CREATE TABLE IF NOT EXISTS tracking_deletions
+(
+    user_id bigint NOT NULL,
+    channel_id bigint,
+    requested timestamp without time zone NOT NULL,
+    deleted bigint NOT NULL DEFAULT 0,
+    CONSTRAINT tracking_deletions_pkey PRIMARY KEY (user_id)
+)
@@ -0,0 +1,195 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Union
+
+import asyncpg
+
+from utils.useful import traceback_maker
+
+# InvalidationBus keeps the in-memory caches of every running process in sync.
+# Whoever writes to a cached table publishes the changed key on that cache's channel,
+# every other process drops or reloads that key. A key of None means reload everything.
+# LRUCache is for caches that have to stay bounded.
+
+Handler = Callable[[Optional[str]], Union[Awaitable[None], None]]
+
+
+class InvalidationBus:
+    """
+    Cache invalidation over Postgres LISTEN/NOTIFY.
+
+    One pooled connection is held to LISTEN on every registered channel.
+    Notifications sent inside a transaction are only delivered once it commits,
+    and a process never receives its own. If the listening connection drops,
+    every cache is reloaded after reconnecting since notifications may have been missed.
+    """
+
+    CHANNEL_PREFIX = 'metro_cache_'
+    PING_EVERY = 30
+    RETRY_AFTER = 5
+
+    def __init__(self, pool: asyncpg.Pool):
+        self.pool = pool
+        self.origin = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+        self.handlers: Dict[str, Handler] = {}
+        self._conn: Optional[asyncpg.Connection] = None
+        # A connection runs one query at a time, (un)listening and the ping take turns
+        self._conn_lock = asyncio.Lock()
+
+    def register(self, channel: str, handler: Handler):
+        """Call `handler(key)` when another process publishes on `channel`."""
+
+        self.handlers[channel] = handler
+        if self._conn is not None: # Otherwise run() picks it up when it connects
+            asyncio.ensure_future(self._listen(channel, True))
+
+    def unregister(self, channel: str, handler: Optional[Handler] = None):
+        """Stop calling the handler for `channel`, for cog_unload. Only if it is still `handler` when given."""
+
+        if channel not in self.handlers or (handler is not None and self.handlers[channel] != handler):
+            return
+        del self.handlers[channel]
+        if self._conn is not None: # Otherwise run() picks it up when it connects
+            asyncio.ensure_future(self._listen(channel, False))
+
+    async def _listen(self, channel: str, listen: bool):
+        async with self._conn_lock:
+            conn = self._conn
+            if conn is None or conn.is_closed():
+                return # Listened again on reconnect
+            try:
+                if listen:
+                    await conn.add_listener(self.CHANNEL_PREFIX + channel, self._on_notify)
+                else:
+                    await conn.remove_listener(self.CHANNEL_PREFIX + channel, self._on_notify)
+            except Exception as e:
+                print(traceback_maker(e, advance=False))
+
+    async def publish(self, channel: str, key: Optional[Union[int, str]] = None, *, connection=None):
+        """
+        Tell the other processes `key` changed, or everything if it's None.
+
+        Pass the connection of an open transaction to only publish if it commits.
+        """
+
+        payload = f"{self.origin}:{'' if key is None else key}"
+        await (connection or self.pool).execute("SELECT pg_notify($1, $2)", self.CHANNEL_PREFIX + channel, payload)
+
+    def _on_notify(self, connection, pid, channel, payload):
+        origin, _, key = payload.partition(':')
+        if origin == self.origin:
+            return # Already applied locally
+
+        handler = self.handlers.get(channel[len(self.CHANNEL_PREFIX):])
+        if handler is not None:
+            self._call(handler, key or None)
+
+    def _call(self, handler: Handler, key: Optional[str]):
+        try:
+            result = handler(key)
+        except Exception as e:
+            print(traceback_maker(e, advance=False))
+            return
+
+        if asyncio.iscoroutine(result):
+            asyncio.ensure_future(self._await(result))
+
+    async def _await(self, coro):
+        try:
+            await coro
+        except Exception as e:
+            print(traceback_maker(e, advance=False))
+
+    async def run(self):
+        """Listen forever, reconnecting as needed."""
+
+        connected_before = False
+        while True:
+            try:
+                async with self.pool.acquire() as conn:
+                    async with self._conn_lock:
+                        self._conn = conn
+                        for channel in list(self.handlers):
+                            await conn.add_listener(self.CHANNEL_PREFIX + channel, self._on_notify)
+
+                    if connected_before:
+                        for handler in self.handlers.values():
+                            self._call(handler, None)
+                    connected_before = True
+
+                    while True:
+                        await asyncio.sleep(self.PING_EVERY)
+                        async with self._conn_lock:
+                            await conn.execute("SELECT 1") # Notice a dead connection
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(traceback_maker(e, advance=False))
+            finally:
+                self._conn = None # Releasing it to the pool drops the listeners
+
+            await asyncio.sleep(self.RETRY_AFTER)
+
+
+MISSING = object()
+
+
+class LRUCache:
+    """
+    A mapping bounded by size and age, least recently used entries go first.
+
+    `set_missing` caches a failed lookup for `negative_ttl` seconds,
+    `get` then returns None instead of MISSING so callers can skip the lookup.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, negative_ttl: float, *, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.clock = clock
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict() # key: (expires, value)
+        self.stats = Counter(hits=0, negative_hits=0, misses=0, evictions=0, expired=0)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get(self, key: Hashable) -> Any:
+        """The cached value, None for a cached miss, or MISSING."""
+
+        try:
+            expires, value = self._data[key]
+        except KeyError:
+            self.stats['misses'] += 1
+            return MISSING
+
+        if expires <= self.clock():
+            del self._data[key]
+            self.stats['expired'] += 1
+            self.stats['misses'] += 1
+            return MISSING
+
+        self._data.move_to_end(key)
+        self.stats['negative_hits' if value is None else 'hits'] += 1
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        self._store(key, value, self.ttl)
+
+    def set_missing(self, key: Hashable):
+        self._store(key, None, self.negative_ttl)
+
+    def pop(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def _store(self, key: Hashable, value: Any, ttl: float):
+        self._data[key] = (self.clock() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.stats['evictions'] += 1
@@ -26,10 +26,8 @@ def check_dev(bot, user : Union[discord.Member, discord.User]):
     )
 
 def check_tester(ctx : MyContext):
-    guild = ctx.bot.get_guild(SUPPORT_GUILD)
-    role = guild.get_role(TESTER_ROLE)
-    if ctx.author in role.members:
-        return True
+    # Kept up to date by MetroBot from the support guild's member events
+    return ctx.author.id in ctx.bot.testers
         
 
 
@@ -0,0 +1,71 @@
+from typing import Dict, Iterable, Mapping, Optional
+
+# Compiled per-guild view of the plonks and command_config tables for configuration's bot checks.
+# A snapshot is never changed in place, every write builds a new one and swaps it in,
+# so a check never sees a half applied change.
+
+
+class GuildConfig:
+    """
+    Ignored entity IDs and `command -> disabled entity IDs` for one guild.
+
+    Entity IDs are the guild (for `~`), channels, roles and members.
+    """
+
+    __slots__ = ('ignored', 'disabled')
+
+    def __init__(self, ignored: Iterable[int] = (), disabled: Optional[Mapping[str, Iterable[int]]] = None):
+        self.ignored = frozenset(ignored)
+        self.disabled: Dict[str, frozenset] = {
+            command: frozenset(entities) for command, entities in (disabled or {}).items() if entities
+        }
+
+    def __bool__(self) -> bool:
+        return bool(self.ignored or self.disabled)
+
+    def is_ignored(self, guild_id: int, channel_id: int, author_id: int, role_ids: Iterable[int]) -> bool:
+        ignored = self.ignored
+        if not ignored:
+            return False
+        return (
+            guild_id in ignored
+            or channel_id in ignored
+            or author_id in ignored
+            or not ignored.isdisjoint(role_ids)
+        )
+
+    def is_disabled(self, command: str, guild_id: int, channel_id: int, author_id: int, role_ids: Iterable[int]) -> bool:
+        entities = self.disabled.get(command)
+        if entities is None:
+            return False
+        return (
+            guild_id in entities
+            or channel_id in entities
+            or author_id in entities
+            or not entities.isdisjoint(role_ids)
+        )
+
+    def ignore(self, *entity_ids: int) -> 'GuildConfig':
+        return GuildConfig(self.ignored.union(entity_ids), self.disabled)
+
+    def unignore(self, *entity_ids: int) -> 'GuildConfig':
+        return GuildConfig(self.ignored.difference(entity_ids), self.disabled)
+
+    def disable(self, entity_id: int, commands: Iterable[str]) -> 'GuildConfig':
+        disabled = dict(self.disabled)
+        for command in commands:
+            disabled[command] = disabled.get(command, frozenset()) | {entity_id}
+        return GuildConfig(self.ignored, disabled)
+
+    def enable(self, entity_id: int, commands: Iterable[str]) -> 'GuildConfig':
+        disabled = dict(self.disabled)
+        for command in commands:
+            if command in disabled:
+                disabled[command] = disabled[command] - {entity_id}
+        return GuildConfig(self.ignored, disabled)
+
+    def without_ignored(self) -> 'GuildConfig':
+        return GuildConfig((), self.disabled)
+
+    def without_disabled(self) -> 'GuildConfig':
+        return GuildConfig(self.ignored, None)
@@ -0,0 +1,204 @@
+import asyncio
+import sys
+from collections import deque
+from typing import Dict, Iterable, List, Set
+
+# Multi-pattern matcher for highlights.
+# One pass over the message finds every highlighted word in it,
+# no matter how many words the guild has.
+
+
+class AhoCorasick:
+    """
+    An Aho–Corasick automaton over a set of words.
+
+    Matches are substrings, the same as `word in text`.
+    The automaton is immutable, build a new one when the words change.
+    """
+
+    __slots__ = ('goto', 'fail', 'output')
+
+    def __init__(self, words: Iterable[str]):
+        self.goto: List[dict] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[tuple] = [()]
+
+        for word in words:
+            if not word:
+                continue
+            state = 0
+            for char in word:
+                nxt = self.goto[state].get(char)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][char] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(())
+                state = nxt
+            self.output[state] += (word,)
+
+        # Breadth first so every state's fail link is done before its children
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self.goto[state].items():
+                queue.append(nxt)
+                fail = self.fail[state]
+                while fail and char not in self.goto[fail]:
+                    fail = self.fail[fail]
+                self.fail[nxt] = self.goto[fail].get(char, 0)
+                self.output[nxt] += self.output[self.fail[nxt]]
+
+    def __len__(self) -> int:
+        return len(self.goto)
+
+    def find(self, text: str) -> Set[str]:
+        """Return every word that appears in `text`."""
+
+        goto, fail, output = self.goto, self.fail, self.output
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+
+class HighlightIndex:
+    """
+    guild_id -> word -> set of subscriber IDs, plus a matcher for big guilds.
+
+    Words are interned so a common word watched in many guilds is stored once.
+    Below `AUTOMATON_AT` words a plain `word in text` scan is faster than the
+    automaton, so only guilds with more words get one.
+
+    Matching never builds an automaton: words added since a guild's matcher
+    was built are checked with `in` until the matcher catches up, removed ones
+    are dropped from the results. Once a guild has `REBUILD_AFTER` such changes
+    its matcher is rebuilt in the default executor and swapped in when done.
+    Call `build` once after loading so every big guild starts with a matcher.
+    """
+
+    __slots__ = ('guilds', 'matchers', 'added', 'removed', '_building', 'ready')
+
+    AUTOMATON_AT = 150 # Break-even is around 100 words, see benchmarks/highlight_matcher.py
+    REBUILD_AFTER = 32
+
+    def __init__(self):
+        self.guilds: Dict[int, Dict[str, Set[int]]] = {}
+        self.matchers: Dict[int, AhoCorasick] = {}
+        self.added: Dict[int, Set[str]] = {} # Words the guild's matcher doesn't know yet
+        self.removed: Dict[int, int] = {} # Words the guild's matcher still knows
+        self._building: Set[int] = set()
+        self.ready = False
+
+    def __contains__(self, guild_id: int) -> bool:
+        return guild_id in self.guilds
+
+    def _tracked(self, guild_id: int) -> bool:
+        # Changes only need tracking for a guild with a matcher, or one on the way
+        return guild_id in self.matchers or guild_id in self._building
+
+    def add(self, guild_id: int, word: str, user_id: int):
+        words = self.guilds.setdefault(guild_id, {})
+        subscribers = words.get(word)
+        if subscribers is None:
+            word = sys.intern(word)
+            words[word] = {user_id}
+            if self._tracked(guild_id):
+                self.added.setdefault(guild_id, set()).add(word)
+            self._changed(guild_id)
+        else:
+            subscribers.add(user_id)
+
+    def remove(self, guild_id: int, word: str, user_id: int):
+        words = self.guilds.get(guild_id)
+        if not words or word not in words:
+            return
+
+        subscribers = words[word]
+        subscribers.discard(user_id)
+        if not subscribers:
+            del words[word]
+            if not words:
+                del self.guilds[guild_id]
+            if len(words) < self.AUTOMATON_AT:
+                self._drop_matcher(guild_id) # Back to scanning
+                return
+            if not self._tracked(guild_id):
+                return
+
+            added = self.added.get(guild_id)
+            if added and word in added:
+                added.discard(word)
+            else:
+                self.removed[guild_id] = self.removed.get(guild_id, 0) + 1
+                self._changed(guild_id)
+
+    def _drop_matcher(self, guild_id: int):
+        self.matchers.pop(guild_id, None)
+        self.added.pop(guild_id, None)
+        self.removed.pop(guild_id, None)
+
+    def words(self, guild_id: int, user_id: int) -> List[str]:
+        """Every word `user_id` watches in this guild."""
+        return [word for word, subscribers in self.guilds.get(guild_id, {}).items() if user_id in subscribers]
+
+    def match(self, guild_id: int, text: str) -> Dict[str, Set[int]]:
+        """Return `{word: subscribers}` for every highlighted word in `text`."""
+
+        words = self.guilds.get(guild_id)
+        if not words:
+            return {}
+
+        matcher = self.matchers.get(guild_id)
+        if matcher is None:
+            return {word: subscribers for word, subscribers in words.items() if word in text}
+
+        found = matcher.find(text)
+        found.update(word for word in self.added.get(guild_id, ()) if word in text)
+        return {word: words[word] for word in found if word in words}
+
+    def _changed(self, guild_id: int):
+        if not self.ready or guild_id in self._building:
+            return
+        if guild_id in self.matchers:
+            needed = len(self.added.get(guild_id, ())) + self.removed.get(guild_id, 0) >= self.REBUILD_AFTER
+        else:
+            needed = len(self.guilds.get(guild_id, ())) >= self.AUTOMATON_AT
+        if needed:
+            asyncio.ensure_future(self.rebuild(guild_id))
+
+    async def rebuild(self, guild_id: int):
+        """Build a new matcher for the guild's current words off the event loop and swap it in."""
+
+        if guild_id in self._building:
+            return
+        self._building.add(guild_id)
+        try:
+            words = list(self.guilds.get(guild_id, ()))
+            removed = self.removed.get(guild_id, 0)
+            matcher = await asyncio.get_event_loop().run_in_executor(None, AhoCorasick, words)
+
+            if len(self.guilds.get(guild_id, ())) < self.AUTOMATON_AT:
+                self._drop_matcher(guild_id) # Shrank meanwhile
+                return
+            self.matchers[guild_id] = matcher
+            # Changes made while building stay pending for the next one
+            self.added.setdefault(guild_id, set()).difference_update(words)
+            self.removed[guild_id] = max(self.removed.get(guild_id, 0) - removed, 0)
+        finally:
+            self._building.discard(guild_id)
+        self._changed(guild_id)
+
+    async def build(self):
+        """Build every big guild's matcher, then keep them up to date as words change."""
+
+        for guild_id, words in list(self.guilds.items()):
+            if len(words) >= self.AUTOMATON_AT:
+                await self.rebuild(guild_id)
+        self.ready = True
@@ -0,0 +1,310 @@
+import asyncio
+import json
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import asyncpg
+import discord
+
+from utils.useful import traceback_maker
+
+# Background jobs that do one request per target (member, channel...) for a precomputed list of targets.
+# The command that starts a job returns straight away, the job reports its own progress.
+
+Action = Callable[[int], Awaitable[None]] # Called with each target ID
+Progress = Callable[['BulkJob'], Awaitable[None]]
+
+
+class BulkJob:
+    """
+    Runs `action` for every target ID with bounded concurrency.
+
+    `concurrency` workers take targets in order, each waiting on `limiter`
+    (per guild pacing like MemberEditLimiter) before its request, so a job
+    goes as fast as the rate limit bucket allows and no faster.
+    `progress(job)` is awaited every `progress_every` seconds and once more when the job ends.
+    An HTTPException counts the target as failed and the job carries on.
+
+    `cursor`, `done` and `failed` continue a job from an earlier run.
+    """
+
+    CONCURRENCY = 10
+    PROGRESS_EVERY = 5.0
+
+    def __init__(self, targets: Sequence[int], action: Action, *, guild_id: int, limiter=None,
+                 concurrency: int = CONCURRENCY, progress: Optional[Progress] = None,
+                 progress_every: float = PROGRESS_EVERY, clock: Callable[[], float] = time.monotonic,
+                 cursor: int = 0, done: int = 0, failed: int = 0):
+        self.id: Optional[int] = None # Set for jobs stored by JobManager
+        self.kind: Optional[str] = None
+        self.targets = list(targets)
+        self.action = action
+        self.guild_id = guild_id
+        self.limiter = limiter
+        self.concurrency = concurrency
+        self.progress = progress
+        self.progress_every = progress_every
+        self.clock = clock
+
+        self.cursor = cursor # Index of the next target to hand out
+        self.stats = Counter(done=done, failed=failed)
+        self.failures: List[int] = []
+        self._resumed_at = done + failed
+        # Every target before `checkpoint` has been processed, with `checkpoint_stats` as outcomes.
+        # Workers finish out of order, outcomes past the checkpoint wait in `_ahead`.
+        self.checkpoint = cursor
+        self.checkpoint_stats = Counter(done=done, failed=failed)
+        self._ahead: Dict[int, bool] = {}
+        self._cancelled = False
+        self.status = 'pending' # running, done or cancelled
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self.targets)
+
+    @property
+    def processed(self) -> int:
+        return self.stats['done'] + self.stats['failed']
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or self.clock()) - self.started
+
+    @property
+    def rate(self) -> float:
+        """Targets processed per second by this run."""
+        elapsed = self.elapsed
+        return (self.processed - self._resumed_at) / elapsed if elapsed else 0.0
+
+    @property
+    def eta(self) -> Optional[float]:
+        rate = self.rate
+        return (len(self.targets) - self.processed) / rate if rate else None
+
+    def start(self) -> asyncio.Task:
+        self._task = asyncio.ensure_future(self.run())
+        return self._task
+
+    def cancel(self):
+        """Stop the job for good. Cancelling its task directly (e.g. on shutdown) only interrupts it."""
+        if self._task is not None and not self._task.done():
+            self._cancelled = True
+            self._task.cancel()
+
+    async def wait(self):
+        """Wait for the job to finish, however it finishes."""
+        if self._task is not None:
+            await asyncio.wait((self._task,))
+
+    async def run(self):
+        self.status = 'running'
+        self.started = self.clock()
+
+        workers = [asyncio.ensure_future(self._worker()) for _ in range(max(min(self.concurrency, len(self.targets)), 1))]
+        reporter = asyncio.ensure_future(self._report()) if self.progress else None
+        try:
+            await asyncio.gather(*workers)
+            self.status = 'done'
+        except asyncio.CancelledError:
+            if not self._cancelled:
+                raise # Interrupted, no final report so a stored job stays resumable
+            self.status = 'cancelled'
+        finally:
+            for worker in workers:
+                worker.cancel()
+            if reporter is not None:
+                reporter.cancel()
+            self.finished = self.clock()
+
+        await self._call_progress()
+
+    async def _worker(self):
+        while self.cursor < len(self.targets):
+            index = self.cursor
+            target = self.targets[index]
+            self.cursor += 1
+
+            try:
+                if self.limiter is not None:
+                    await self.limiter.acquire(self.guild_id)
+                await self.action(target)
+            except discord.HTTPException:
+                ok = False
+            except Exception as e:
+                print(traceback_maker(e, advance=False))
+                ok = False
+            else:
+                ok = True
+
+            if not ok:
+                self.failures.append(target)
+            self.stats['done' if ok else 'failed'] += 1
+            self._ahead[index] = ok
+            while self.checkpoint in self._ahead:
+                self.checkpoint_stats['done' if self._ahead.pop(self.checkpoint) else 'failed'] += 1
+                self.checkpoint += 1
+
+    async def _report(self):
+        while True:
+            await asyncio.sleep(self.progress_every)
+            await self._call_progress()
+
+    async def _call_progress(self):
+        if self.progress is None:
+            return
+        try:
+            await self.progress(self)
+        except Exception as e:
+            print(traceback_maker(e, advance=False))
+
+
+# Builds a stored job's action and progress report from its row, None if it can't run anymore
+Factory = Callable[[asyncpg.Record], Awaitable[Optional[Tuple[Action, Optional[Progress]]]]]
+
+
+class JobKind(NamedTuple):
+    factory: Factory
+    concurrency: int
+    limiter: Any
+
+
+class JobManager:
+    """
+    BulkJobs stored in the `jobs` table so they survive restarts.
+
+    A row holds the job's target IDs, the checkpoint to resume from and the outcome counts,
+    saved with every progress report. Cogs register a factory per kind of job that rebuilds
+    the action from the row, so `resume` can pick up where a job left off. Targets in flight
+    when the bot stopped are processed again, which is harmless for adding roles, banning or locking.
+
+    A job cancelled from another process is noticed at its next checkpoint.
+    """
+
+    def __init__(self, pool: asyncpg.Pool):
+        self.pool = pool
+        self.kinds: Dict[str, JobKind] = {}
+        self.running: Dict[int, BulkJob] = {}
+
+    def register(self, kind: str, factory: Factory, *, concurrency: int = 1, limiter=None):
+        self.kinds[kind] = JobKind(factory, concurrency, limiter)
+
+    def find(self, guild_id: int, kind: str) -> Optional[BulkJob]:
+        for job in self.running.values():
+            if job.guild_id == guild_id and job.kind == kind:
+                return job
+        return None
+
+    async def create(self, kind: str, guild_id: int, author_id: int, targets: Sequence[int], *,
+                     extra: Optional[Dict[str, Any]] = None, channel_id: Optional[int] = None,
+                     message_id: Optional[int] = None) -> Optional[BulkJob]:
+        """Store a new job and start it."""
+
+        query = """
+                INSERT INTO jobs (kind, guild_id, author_id, channel_id, message_id, extra, targets)
+                VALUES ($1, $2, $3, $4, $5, $6::jsonb, $7::bigint[])
+                RETURNING *
+                """
+        record = await self.pool.fetchrow(
+            query, kind, guild_id, author_id, channel_id, message_id, json.dumps(extra or {}), list(targets)
+        )
+        return await self._start(record)
+
+    async def resume(self, owns: Callable[[int], bool]) -> int:
+        """Restart every unfinished job in a guild `owns` accepts, returns how many were resumed."""
+
+        query = """
+                SELECT * FROM jobs
+                WHERE status = 'running'
+                ORDER BY id
+                """
+        try:
+            records = await self.pool.fetch(query)
+        except asyncpg.UndefinedTableError:
+            return 0 # First start, the table is created by the startup scripts
+
+        resumed = 0
+        for record in records:
+            if record['id'] in self.running or record['kind'] not in self.kinds or not owns(record['guild_id']):
+                continue
+            if await self._start(record) is not None:
+                resumed += 1
+        return resumed
+
+    async def cancel(self, job_id: int, *, guild_id: Optional[int] = None) -> bool:
+        """Cancel a running job, optionally only if it belongs to `guild_id`."""
+
+        query = """
+                UPDATE jobs SET status = 'cancelled', updated = (now() at time zone 'utc')
+                WHERE id = $1 AND status = 'running' AND ($2::bigint IS NULL OR guild_id = $2)
+                RETURNING id
+                """
+        if await self.pool.fetchval(query, job_id, guild_id) is None:
+            return False
+
+        job = self.running.get(job_id)
+        if job is not None:
+            job.cancel()
+        return True
+
+    async def _start(self, record: asyncpg.Record) -> Optional[BulkJob]:
+        kind = self.kinds[record['kind']]
+        built = await kind.factory(record)
+        if built is None:
+            await self.pool.execute("UPDATE jobs SET status = 'failed' WHERE id = $1", record['id'])
+            return None
+
+        action, progress = built
+
+        async def checkpoint(job: BulkJob):
+            await self.save(job)
+            if progress is not None:
+                await progress(job)
+
+        job = BulkJob(
+            record['targets'], action, guild_id=record['guild_id'], limiter=kind.limiter,
+            concurrency=kind.concurrency, progress=checkpoint,
+            cursor=record['cursor'], done=record['done'], failed=record['failed'],
+        )
+        job.id = record['id']
+        job.kind = record['kind']
+
+        self.running[job.id] = job
+        job.start().add_done_callback(lambda _: self.running.pop(job.id, None))
+        return job
+
+    async def save(self, job: BulkJob):
+        status = 'running' if job.finished is None else job.status
+        query = """
+                UPDATE jobs SET
+                    cursor = $2, done = $3, failed = $4,
+                    status = CASE WHEN status = 'cancelled' THEN status ELSE $5 END,
+                    updated = (now() at time zone 'utc')
+                WHERE id = $1
+                RETURNING status
+                """
+        stats = job.checkpoint_stats
+        current = await self.pool.fetchval(query, job.id, job.checkpoint, stats['done'], stats['failed'], status)
+        if current == 'cancelled' and job.finished is None:
+            job.cancel() # Cancelled by another process
+
+
+def edit_progress(bot, record: asyncpg.Record, render: Callable[[BulkJob], str]) -> Optional[Progress]:
+    """Progress report that edits the job's stored message with `render(job)`."""
+
+    channel = bot.get_channel(record['channel_id']) if record['channel_id'] else None
+    if channel is None:
+        return None
+    message = channel.get_partial_message(record['message_id'])
+
+    async def progress(job: BulkJob):
+        try:
+            await message.edit(content=render(job))
+        except discord.HTTPException:
+            pass # Deleted, the job carries on
+
+    return progress
@@ -0,0 +1,99 @@
+import asyncio
+from collections import Counter
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Tuple, Union
+
+from utils.useful import traceback_maker
+
+# Routes raw reaction events to the cogs that care about them.
+# Instead of every cog listening to every reaction and throwing most away,
+# cogs register what they're interested in and the router only schedules those handlers.
+
+Handler = Callable[[object], Awaitable[None]] # Takes a discord.RawReactionActionEvent
+EmojiKey = Union[int, str]
+
+EVENTS = ('add', 'remove')
+
+
+def emoji_key(emoji) -> EmojiKey:
+    """Custom emojis by ID, unicode ones by name. Avoids formatting `str(emoji)` on every event."""
+    return emoji.id or emoji.name
+
+
+class ReactionRouter:
+    """
+    Interest index for raw reaction add/remove events.
+
+    Handlers register by message ID, by emoji, or by (guild ID, emoji).
+    All three live in one dict under differently shaped keys,
+    so an event nobody wants costs three dict lookups and nothing else.
+    """
+
+    def __init__(self):
+        # key: [(handler, events)]
+        self._routes: Dict[Hashable, List[Tuple[Handler, frozenset]]] = {}
+        self.stats = Counter(events=0, dropped=0)
+
+    def __len__(self) -> int:
+        return len(self._routes)
+
+    @staticmethod
+    def _key(message_id: Optional[int], emoji: Optional[EmojiKey], guild_id: Optional[int]) -> Hashable:
+        if message_id is not None:
+            return message_id
+        if emoji is None:
+            raise TypeError('a message_id or emoji is required')
+        if guild_id is not None:
+            return (guild_id, emoji)
+        return ('emoji', emoji)
+
+    def register(self, handler: Handler, *, message_id: Optional[int] = None, emoji: Optional[EmojiKey] = None,
+                 guild_id: Optional[int] = None, events: Iterable[str] = EVENTS):
+        """
+        Call `handler(payload)` for reactions on `message_id`, or with `emoji` (optionally only in `guild_id`).
+
+        `emoji` is a custom emoji's ID or a unicode emoji. `events` is any of 'add' and 'remove'.
+        """
+
+        key = self._key(message_id, emoji, guild_id)
+        routes = self._routes.setdefault(key, [])
+        routes[:] = [route for route in routes if route[0] != handler]
+        routes.append((handler, frozenset(events)))
+
+    def unregister(self, handler: Handler, *, message_id: Optional[int] = None, emoji: Optional[EmojiKey] = None,
+                   guild_id: Optional[int] = None):
+        self._unregister(self._key(message_id, emoji, guild_id), handler)
+
+    def unregister_all(self, handler: Handler):
+        """Drop every route to `handler`, for cog_unload."""
+
+        for key in list(self._routes):
+            self._unregister(key, handler)
+
+    def _unregister(self, key: Hashable, handler: Handler):
+        routes = [route for route in self._routes.get(key, ()) if route[0] != handler]
+        if routes:
+            self._routes[key] = routes
+        else:
+            self._routes.pop(key, None)
+
+    def dispatch(self, event: str, payload):
+        self.stats['events'] += 1
+        routes = self._routes
+        emoji = emoji_key(payload.emoji)
+
+        matched = routes.get(payload.message_id), routes.get(('emoji', emoji)), routes.get((payload.guild_id, emoji))
+        if not any(matched):
+            self.stats['dropped'] += 1
+            return
+
+        for handlers in matched:
+            for handler, events in handlers or ():
+                if event in events:
+                    self.stats[handler.__qualname__] += 1
+                    asyncio.ensure_future(self._run(handler, payload))
+
+    async def _run(self, handler: Handler, payload):
+        try:
+            await handler(payload)
+        except Exception as e:
+            print(traceback_maker(e, advance=False))
@@ -0,0 +1,111 @@
+import asyncio
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from utils.useful import traceback_maker
+
+# Helpers for changing many members' roles without fighting Discord's rate limits.
+# MemberEditLimiter paces member edits per guild, RoleCoalescer merges
+# quick successive role changes for one member into a single edit.
+
+# (guild_id, member_id, member or None, {role_id: True to add, False to remove})
+ApplyChanges = Callable[[int, int, Optional[object], Dict[int, bool]], Awaitable[None]]
+
+
+class MemberEditLimiter:
+    """
+    Per-guild pacing for member edits.
+
+    Discord buckets member edits per guild, so `acquire` lets `rate` edits
+    through per `per` seconds for each guild and makes the rest wait their turn
+    instead of hitting a 429. Uses GCRA, so a guild only costs one float.
+    """
+
+    RATE = 10
+    PER = 10.0
+    PRUNE_AT = 10_000
+
+    def __init__(self, rate: int = RATE, per: float = PER, *, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.per = per
+        self.interval = per / rate
+        self.clock = clock
+        self._tats: Dict[int, float] = {} # guild_id: theoretical arrival time
+
+    def delay(self, guild_id: int) -> float:
+        """Reserve the next edit for `guild_id` and return how long to wait before making it."""
+
+        now = self.clock()
+        if len(self._tats) > self.PRUNE_AT:
+            self._tats = {key: tat for key, tat in self._tats.items() if tat > now}
+
+        tat = max(self._tats.get(guild_id, now), now) + self.interval
+        self._tats[guild_id] = tat
+        return max(tat - now - self.per, 0.0)
+
+    async def acquire(self, guild_id: int):
+        delay = self.delay(guild_id)
+        if delay:
+            await asyncio.sleep(delay)
+
+
+class RoleCoalescer:
+    """
+    Merges role changes for one member made within `window` seconds.
+
+    The first change for a member starts the window, later ones only update
+    the pending changes (the last add or remove of a role wins).
+    When the window closes the changes are handed to `apply` in one go.
+    A member has at most one flush running, changes queued while
+    `apply` is awaiting wait for it and go out in the next window.
+    """
+
+    WINDOW = 1.5
+
+    def __init__(self, apply: ApplyChanges, limiter: MemberEditLimiter, *, window: float = WINDOW):
+        self.apply = apply
+        self.limiter = limiter
+        self.window = window
+        self._pending: Dict[Tuple[int, int], Dict[int, bool]] = {}
+        self._members: Dict[Tuple[int, int], object] = {}
+        self._flushing: Set[Tuple[int, int]] = set()
+        self.stats = Counter(changes=0, coalesced=0, flushes=0)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def queue(self, guild_id: int, member_id: int, role_id: int, add: bool, *, member=None):
+        """Add or remove `role_id` soon. Pass `member` if it's already at hand so it isn't fetched."""
+
+        key = (guild_id, member_id)
+        self.stats['changes'] += 1
+        if member is not None:
+            self._members[key] = member
+
+        changes = self._pending.get(key)
+        if changes is None:
+            self._pending[key] = {role_id: add}
+            if key not in self._flushing:
+                self._flushing.add(key)
+                asyncio.ensure_future(self._flush_later(key))
+        else:
+            changes[role_id] = add
+            self.stats['coalesced'] += 1
+
+    async def _flush_later(self, key: Tuple[int, int]):
+        try:
+            while key in self._pending:
+                await asyncio.sleep(self.window)
+                await self.limiter.acquire(key[0])
+
+                # Popped after waiting on the limiter so changes made meanwhile are merged too
+                changes = self._pending.pop(key)
+                member = self._members.pop(key, None)
+                self.stats['flushes'] += 1
+                try:
+                    await self.apply(key[0], key[1], member, changes)
+                except Exception as e:
+                    print(traceback_maker(e, advance=False))
+        finally:
+            self._flushing.discard(key)
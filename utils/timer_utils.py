@@ -0,0 +1,273 @@
+import asyncio
+import datetime
+import heapq
+import json
+from typing import Callable, Dict, List, Optional, Tuple
+
+# The timer engine behind utility.create_timer.
+# All timers live in a heap in memory, the reminders table is only read once at startup
+# and written to when timers are created or fire.
+
+
+class Timer:
+    __slots__ = ("args", "kwargs", "event", "id", "created_at", "expires")
+
+    def __init__(self, *, record):
+        self.id = record["id"]
+        extra = record["extra"]
+        self.args = extra.get("args", [])
+        self.kwargs = extra.get("kwargs", {})
+        self.event = record["event"]
+        self.created_at = record["created"]
+        self.expires = record["expires"]
+
+    @classmethod
+    def temporary(cls, *, expires, created, event, args, kwargs):
+        pseudo = {
+            "id": None,
+            "extra": {"args": args, "kwargs": kwargs},
+            "event": event,
+            "created": created,
+            "expires": expires,
+        }
+        return cls(record=pseudo)
+
+    @classmethod
+    def from_record(cls, record):
+        extra = record["extra"]
+        if type(extra) is not dict:
+            extra = json.loads(extra)
+        return cls(record={
+            "id": record["id"],
+            "extra": extra,
+            "event": record["event"],
+            "created": record["created"],
+            "expires": record["expires"],
+        })
+
+    def __eq__(self, other):
+        try:
+            return self.id == other.id
+        except AttributeError:
+            return False
+
+    def __hash__(self):
+        return hash(self.id)
+
+    @property
+    def human_delta(self):
+        from utils.remind_utils import human_timedelta # Pulls in discord, keep this module importable without it
+        return human_timedelta(self.created_at)
+
+    @property
+    def author_id(self):
+        if self.args:
+            return int(self.args[0])
+        return None
+
+    def __repr__(self):
+        return f"<Timer created={self.created_at} expires={self.expires} event={self.event}>"
+
+
+# event: where its target_id comes from
+TIMER_TARGETS = {
+    'reminder' : ('args', 1), # channel
+    'tempban' : ('args', 2), # member
+    'tempblock' : ('args', 3), # member
+    'temprole' : ('args', 3), # member
+    'giveaway' : ('args', 3), # message
+    'mute' : ('kwargs', 'user_id'),
+    'lockdown' : ('kwargs', 'channel_id'),
+}
+
+
+def timer_columns(event: str, args: list, kwargs: dict) -> Tuple[Optional[int], Optional[int], Optional[int]]:
+    """
+    Return `(guild_id, author_id, target_id)` for the reminders columns.
+
+    Reminders are `(author_id, channel_id, text)`, everything else starts
+    with `(guild_id, author_id, ...)`. Keep in sync with database/reminders.sql
+    """
+
+    def to_int(value):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    try:
+        source, key = TIMER_TARGETS[event]
+    except KeyError:
+        return None, None, None
+
+    if source == 'args':
+        target_id = to_int(args[key]) if len(args) > key else None
+    else:
+        target_id = to_int(kwargs.get(key))
+
+    if event == 'reminder':
+        return None, to_int(args[0]) if args else None, target_id
+    return (
+        to_int(args[0]) if len(args) > 0 else None,
+        to_int(args[1]) if len(args) > 1 else None,
+        target_id
+    )
+
+
+class SystemClock:
+    """
+    Wall clock time. Naive UTC datetimes, same as the reminders table.
+
+    The scheduler only tells time and sleeps through its clock,
+    see benchmarks/timer_dispatch.py for a fake one.
+    """
+
+    def now(self) -> datetime.datetime:
+        return datetime.datetime.utcnow()
+
+    async def sleep(self, seconds: float):
+        await asyncio.sleep(seconds)
+
+    async def wait(self, event: asyncio.Event, timeout: float) -> bool:
+        """Wait for `event` up to `timeout` seconds. Returns whether it was set."""
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+
+class TimerScheduler:
+    """
+    Fires timers from an in-memory min-heap.
+
+    Every timer due at the same time is fired as one batch, and its rows are
+    removed with a single `DELETE ... WHERE id = ANY($1)`. Only the timers that
+    delete actually returned get dispatched, so timers deleted straight from the
+    table by other commands never fire.
+    """
+
+    # asyncio.sleep isn't reliable past ~48 days, see: http://bugs.python.org/issue20493
+    MAX_SLEEP = 86400 * 40
+    RETRY_AFTER = 5
+    # Timers this close are just slept on, they never touch the table
+    SHORT_TIMER = 30
+
+    def __init__(self, db, dispatch: Callable[[Timer], None], *, clock=None):
+        self.db = db
+        self.dispatch = dispatch
+        self.clock = clock or SystemClock()
+        self._heap = [] # (expires, id)
+        self._timers: Dict[int, Timer] = {}
+        self._wakeup = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    def __contains__(self, timer_id: int) -> bool:
+        return timer_id in self._timers
+
+    def get(self, timer_id: int) -> Optional[Timer]:
+        return self._timers.get(timer_id)
+
+    async def create(self, when: datetime.datetime, event: str, *args, connection=None,
+                     created: datetime.datetime = None, **kwargs) -> Timer:
+        """
+        Schedule a timer, `when` and `created` are naive UTC.
+        See utility.create_timer for the arguments.
+        """
+
+        created = created or self.clock.now()
+        timer = Timer.temporary(event=event, args=args, kwargs=kwargs, expires=when, created=created)
+        delta = (when - created).total_seconds()
+        if delta <= self.SHORT_TIMER:
+            # a shortcut for small timers
+            asyncio.ensure_future(self.short_timer(delta, timer))
+            return timer
+
+        query = """INSERT INTO reminders (event, extra, expires, created, guild_id, author_id, target_id)
+                   VALUES ($1, $2::jsonb, $3, $4, $5, $6, $7)
+                   RETURNING id;
+                """
+
+        jsonb = json.dumps({"args": args, "kwargs": kwargs}, default=str)
+
+        row = await (connection or self.db).fetchrow(query, event, jsonb, when, created, *timer_columns(event, args, kwargs))
+        timer.id = row[0]
+
+        self.add(timer)
+        return timer
+
+    async def short_timer(self, seconds: float, timer: Timer):
+        await self.clock.sleep(seconds)
+        self.dispatch(timer)
+
+    async def load(self):
+        """Load every timer from the reminders table."""
+
+        records = await self.db.fetch("SELECT * FROM reminders")
+        for record in records:
+            self.add(Timer.from_record(record), wakeup=False)
+        self._wakeup.set()
+
+    def add(self, timer: Timer, *, wakeup: bool = True):
+        self._timers[timer.id] = timer
+        heapq.heappush(self._heap, (timer.expires, timer.id))
+        if wakeup and self._heap[0][1] == timer.id:
+            self._wakeup.set() # Earlier than what the loop is sleeping for
+
+    def remove(self, *timer_ids: int):
+        """Forget timers. Their heap entries are skipped when they come up."""
+        for timer_id in timer_ids:
+            self._timers.pop(timer_id, None)
+
+    def _peek(self) -> Optional[Timer]:
+        while self._heap:
+            expires, timer_id = self._heap[0]
+            timer = self._timers.get(timer_id)
+            if timer is not None and timer.expires == expires:
+                return timer
+            heapq.heappop(self._heap) # Removed or rescheduled
+
+    def _pop_due(self, now: datetime.datetime) -> List[Timer]:
+        due = []
+        timer = self._peek()
+        while timer is not None and timer.expires <= now:
+            heapq.heappop(self._heap)
+            del self._timers[timer.id]
+            due.append(timer)
+            timer = self._peek()
+        return due
+
+    async def fire(self, timers: List[Timer]):
+        query = "DELETE FROM reminders WHERE id = ANY($1::BIGINT[]) RETURNING id;"
+        records = await self.db.fetch(query, [timer.id for timer in timers])
+        deleted = {record["id"] for record in records}
+        for timer in timers:
+            if timer.id in deleted:
+                self.dispatch(timer)
+
+    async def run(self):
+        while True:
+            timer = self._peek()
+            if timer is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            delay = (timer.expires - self.clock.now()).total_seconds()
+            if delay > 0:
+                self._wakeup.clear()
+                await self.clock.wait(self._wakeup, min(delay, self.MAX_SLEEP))
+                continue
+
+            due = self._pop_due(self.clock.now())
+            try:
+                await self.fire(due)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Database is down, put them back and try again in a bit.
+                for timer in due:
+                    self.add(timer, wakeup=False)
+                await self.clock.sleep(self.RETRY_AFTER)
@@ -0,0 +1,583 @@
+import asyncio
+import datetime
+import json
+import os
+import re
+import struct
+import heapq
+from collections import Counter
+from typing import Dict, Iterator, List, NamedTuple, Tuple, Union
+
+import asyncpg
+import discord
+
+from utils.json_loader import get_path
+
+# Helpers for writing tracked messages to the database.
+# These don't touch the bot so they can be reused outside of the tracking cog. (benchmarks etc.)
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+MESSAGE_COLUMNS = ('unix', 'timestamp', 'message_id', 'author_id', 'channel_id', 'server_id')
+
+
+class MessageRecord(NamedTuple):
+    unix: float
+    timestamp: datetime.datetime
+    message_id: int
+    author_id: int
+    channel_id: int
+    server_id: int
+
+    @classmethod
+    def from_message(cls, message: discord.Message):
+        created_at = message.created_at
+        return cls(
+            created_at.timestamp(),
+            created_at.replace(tzinfo=None),  # column is timestamp without time zone
+            message.id,
+            message.author.id,
+            message.channel.id,
+            message.guild.id
+        )
+
+
+async def copy_messages(conn: asyncpg.Connection, records: List[MessageRecord]):
+    """Write records using the binary COPY protocol."""
+
+    await conn.copy_records_to_table('messages', records=records, columns=MESSAGE_COLUMNS)
+
+
+async def insert_messages_jsonb(conn: asyncpg.Connection, records: List[MessageRecord]):
+    """Write records through JSONB_TO_RECORDSET. (the old way)"""
+
+    query = """
+            INSERT INTO messages (unix, timestamp,
+            message_id, author_id, channel_id, server_id)
+            SELECT x.unix, x.timestamp,
+            x.message_id, x.author_id, x.channel_id, x.server_id
+            FROM JSONB_TO_RECORDSET($1::JSONB)
+            AS x(unix REAL, timestamp TIMESTAMP,
+            message_id BIGINT, author_id BIGINT,
+            channel_id BIGINT, server_id BIGINT)
+            """
+    data = json.dumps([{**record._asdict(), "timestamp" : str(record.timestamp)} for record in records])
+    await conn.execute(query, data)
+
+
+async def bump_message_counts(conn: asyncpg.Connection, records: List[MessageRecord]):
+    """Add the records to the message_counts and message_totals counters."""
+
+    counts = Counter((r.server_id, r.author_id, r.timestamp.date()) for r in records)
+    totals = Counter(r.server_id for r in records)
+
+    query = """
+            INSERT INTO message_counts (server_id, author_id, day, count)
+            SELECT * FROM UNNEST($1::BIGINT[], $2::BIGINT[], $3::DATE[], $4::BIGINT[])
+            ON CONFLICT (server_id, author_id, day)
+            DO UPDATE SET count = message_counts.count + EXCLUDED.count
+            """
+    server_ids, author_ids, days = zip(*counts.keys())
+    await conn.execute(query, server_ids, author_ids, days, list(counts.values()))
+
+    query = """
+            INSERT INTO message_totals (server_id, count)
+            SELECT * FROM UNNEST($1::BIGINT[], $2::BIGINT[])
+            ON CONFLICT (server_id)
+            DO UPDATE SET count = message_totals.count + EXCLUDED.count
+            """
+    await conn.execute(query, list(totals.keys()), list(totals.values()))
+
+
+INGEST_MODES = {
+    'copy' : copy_messages,
+    'jsonb' : insert_messages_jsonb
+}
+
+
+async def write_messages(conn: asyncpg.Connection, records: List[MessageRecord], *, mode: str = 'copy'):
+    """
+    Write a batch of records and bump the counters in one transaction.
+
+    Parameters
+    -----------
+    conn: Connection
+        The connection to write with.
+    records: List[MessageRecord]
+        The batch to write.
+    mode: str
+        Either `copy` or `jsonb`.
+    """
+
+    async with conn.transaction():
+        await INGEST_MODES[mode](conn, records)
+        await bump_message_counts(conn, records)
+
+
+class SpillFile:
+    """
+    Append-only file of tracked messages that couldn't be written.
+
+    Every append is one frame: a 4 byte length followed by that many bytes
+    of packed records. A torn frame at the end (crash mid-write) is ignored.
+
+    Replaying renames the file first so new spills don't land in the
+    file being drained. The replay offset is saved next to it after every
+    committed frame, so a restart only replays the frame that was being
+    written when it stopped. Frames that can't be decoded (or written) are
+    moved to the `.corrupt` file instead of blocking the replay.
+    """
+
+    HEADER = struct.Struct('<I')
+    RECORD = struct.Struct('<ddqqqq')
+    MAX_FRAME = RECORD.size * 1_000_000 # A larger length means the header itself is garbage
+
+    def __init__(self, path: str):
+        self.path = path
+        self.replay_path = path + '.replay'
+        self.offset_path = path + '.offset'
+        self.corrupt_path = path + '.corrupt'
+        self.quarantined = 0 # Frames moved to the corrupt file
+        self.replay_offset = self._load_offset()
+
+    def _load_offset(self) -> int:
+        try:
+            with open(self.offset_path) as file:
+                return int(file.read())
+        except (OSError, ValueError):
+            return 0
+
+    def _save_offset(self, offset: int) -> None:
+        tmp = self.offset_path + '.tmp'
+        with open(tmp, 'w') as file:
+            file.write(str(offset))
+        os.replace(tmp, self.offset_path) # Atomic, a crash leaves the old or the new offset
+
+    def _pack(self, record: MessageRecord) -> bytes:
+        timestamp = (record.timestamp - EPOCH).total_seconds()
+        return self.RECORD.pack(record.unix, timestamp, *record[2:])
+
+    def _unpack(self, values: tuple) -> MessageRecord:
+        unix, timestamp, *ids = values
+        return MessageRecord(unix, EPOCH + datetime.timedelta(seconds=timestamp), *ids)
+
+    def _frame(self, records: List[MessageRecord]) -> bytes:
+        payload = b''.join(self._pack(record) for record in records)
+        return self.HEADER.pack(len(payload)) + payload
+
+    def append(self, records: List[MessageRecord]) -> None:
+        with open(self.path, 'ab') as file:
+            file.write(self._frame(records))
+
+    def quarantine(self, data: Union[bytes, List[MessageRecord]]) -> None:
+        """Set aside raw bytes or records that can't be replayed, for a human to look at."""
+        with open(self.corrupt_path, 'ab') as file:
+            file.write(data if isinstance(data, bytes) else self._frame(data))
+        self.quarantined += 1
+
+    def pending(self) -> bool:
+        """Whether there is anything left to replay."""
+        return any(
+            os.path.exists(path) and os.path.getsize(path) > 0
+            for path in (self.path, self.replay_path)
+        )
+
+    def size(self) -> int:
+        return sum(os.path.getsize(path) for path in (self.path, self.replay_path) if os.path.exists(path))
+
+    def frames(self) -> Iterator[Tuple[int, List[MessageRecord]]]:
+        """
+        Yield `(offset, records)` for every complete frame not replayed yet.
+
+        Call `commit` with the offset once the records are written.
+        Undecodable frames are quarantined and yielded without records.
+        """
+
+        if not os.path.exists(self.replay_path):
+            if not os.path.exists(self.path):
+                return
+            os.replace(self.path, self.replay_path)
+            self.commit(0)
+
+        with open(self.replay_path, 'rb') as file:
+            file.seek(self.replay_offset)
+            while True:
+                start = file.tell()
+                header = file.read(self.HEADER.size)
+                if len(header) < self.HEADER.size:
+                    return
+                (size,) = self.HEADER.unpack(header)
+                if size % self.RECORD.size or size > self.MAX_FRAME:
+                    # Can't tell where the next frame starts, set the rest aside
+                    self.quarantine(header + file.read())
+                    yield file.tell(), []
+                    return
+
+                payload = file.read(size)
+                if len(payload) < size:
+                    return # Torn write
+                try:
+                    records = [self._unpack(values) for values in self.RECORD.iter_unpack(payload)]
+                except (OverflowError, ValueError):
+                    self.quarantine(header + payload)
+                    records = []
+                yield start + self.HEADER.size + size, records
+
+    def commit(self, offset: int) -> None:
+        self.replay_offset = offset
+        self._save_offset(offset)
+
+    def finish(self) -> None:
+        """Remove the drained replay file."""
+        if os.path.exists(self.replay_path):
+            os.remove(self.replay_path)
+        self.commit(0)
+
+
+
+# Activity
+# Weekly chatter counts and hour-of-week histograms per guild, kept in memory
+# and updated from every batch written so the commands never scan messages.
+
+HOURS_IN_WEEK = 168
+
+
+def week_start(dt: datetime.datetime) -> datetime.datetime:
+    """Monday 00:00 of the week `dt` is in."""
+    return datetime.datetime(dt.year, dt.month, dt.day) - datetime.timedelta(days=dt.weekday())
+
+
+def hour_of_week(dt: datetime.datetime) -> int:
+    return dt.weekday() * 24 + dt.hour
+
+
+class GuildActivity:
+    __slots__ = ('week', 'authors', 'hours')
+
+    def __init__(self, week: datetime.datetime):
+        self.week = week
+        self.authors = Counter()
+        self.hours = [0] * HOURS_IN_WEEK
+
+    def add(self, record: MessageRecord):
+        self.hours[hour_of_week(record.timestamp)] += 1
+
+        week = week_start(record.timestamp)
+        if week > self.week:
+            self.week = week
+            self.authors.clear()
+        if week == self.week:
+            self.authors[record.author_id] += 1
+
+    def top(self, n: int = 10) -> List[Tuple[int, int]]:
+        """The `n` most active `(author_id, count)` this week."""
+        if week_start(datetime.datetime.utcnow()) > self.week:
+            return []
+        return heapq.nlargest(n, self.authors.items(), key=lambda x: x[1])
+
+    def busiest(self, n: int = 3) -> List[Tuple[int, int]]:
+        """The `n` busiest `(hour of week, count)`."""
+        return heapq.nlargest(n, enumerate(self.hours), key=lambda x: x[1])
+
+
+class ActivityTracker:
+    """
+    All the GuildActivity structures.
+
+    Leaderboards are seeded from message_counts on load, the hour-of-week
+    histograms from activity_hours. `persist` only adds what was counted since
+    the last write, so it never overwrites stored history, even before `load` is done.
+    """
+
+    def __init__(self):
+        self.guilds: Dict[int, GuildActivity] = {}
+        self.deltas: Dict[int, List[int]] = {} # server_id: hours counted since the last persist
+        self._lock = asyncio.Lock()
+
+    def get(self, guild_id: int) -> GuildActivity:
+        try:
+            return self.guilds[guild_id]
+        except KeyError:
+            activity = self.guilds[guild_id] = GuildActivity(week_start(datetime.datetime.utcnow()))
+            return activity
+
+    def update(self, records: List[MessageRecord]):
+        for record in records:
+            self.get(record.server_id).add(record)
+            try:
+                delta = self.deltas[record.server_id]
+            except KeyError:
+                delta = self.deltas[record.server_id] = [0] * HOURS_IN_WEEK
+            delta[hour_of_week(record.timestamp)] += 1
+
+    def forget(self, author_id: int):
+        for activity in self.guilds.values():
+            activity.authors.pop(author_id, None)
+
+    async def load(self, conn: asyncpg.Connection):
+        week = week_start(datetime.datetime.utcnow())
+
+        query = """
+                SELECT server_id, author_id, SUM(count) AS count
+                FROM message_counts
+                WHERE day >= $1
+                GROUP BY server_id, author_id
+                """
+        weekly = await conn.fetch(query, week.date())
+        async with self._lock: # Not halfway through a persist
+            hours = await conn.fetch("SELECT server_id, hours FROM activity_hours")
+
+        for activity in self.guilds.values():
+            activity.authors.clear()
+        for record in weekly:
+            activity = self.get(record['server_id'])
+            activity.week = week
+            activity.authors[record['author_id']] = record['count']
+
+        for record in hours:
+            # Stored history plus what hasn't been persisted yet
+            activity = self.get(record['server_id'])
+            delta = self.deltas.get(record['server_id'], [0] * HOURS_IN_WEEK)
+            activity.hours = [a + b for a, b in zip(record['hours'], delta)]
+
+    async def persist(self, conn: asyncpg.Connection):
+        if not self.deltas:
+            return
+
+        query = """
+                INSERT INTO activity_hours (server_id, hours)
+                VALUES ($1, $2)
+                ON CONFLICT (server_id)
+                DO UPDATE SET hours = ARRAY(
+                    SELECT COALESCE(stored, 0) + COALESCE(added, 0)
+                    FROM UNNEST(activity_hours.hours, EXCLUDED.hours) WITH ORDINALITY AS h(stored, added, hour)
+                    ORDER BY hour
+                )
+                """
+        async with self._lock:
+            deltas, self.deltas = self.deltas, {}
+            try:
+                await conn.executemany(query, list(deltas.items()))
+            except Exception:
+                # Nothing was written (executemany is atomic), add them back for the next try
+                for guild_id, delta in deltas.items():
+                    current = self.deltas.setdefault(guild_id, [0] * HOURS_IN_WEEK)
+                    self.deltas[guild_id] = [a + b for a, b in zip(current, delta)]
+                raise
+
+
+# Partitioning
+# messages is range partitioned by month on "timestamp". (messages_YYYY_MM)
+# Old months get rolled up into message_counts and dropped.
+
+PARTITION_BOUND = re.compile(r"TO \('([^']+)'\)")
+
+MESSAGE_INDEXES = {
+    'messages_author_id_idx' : '(author_id)',
+    'messages_server_id_timestamp_idx' : '(server_id, "timestamp")',
+    'messages_message_id_idx' : '(message_id)'
+}
+
+
+def month_start(dt: datetime.datetime) -> datetime.datetime:
+    return datetime.datetime(dt.year, dt.month, 1)
+
+
+def add_months(dt: datetime.datetime, months: int) -> datetime.datetime:
+    year, month = divmod(dt.month - 1 + months, 12)
+    return datetime.datetime(dt.year + year, month + 1, 1)
+
+
+def messages_script() -> str:
+    with open(f"{get_path()}/database/messages.sql", 'r', encoding='utf-8') as script:
+        return script.read()
+
+
+async def partition_bounds(conn: asyncpg.Connection) -> List[Tuple[str, datetime.datetime]]:
+    """Return `(name, upper bound)` for every partition of messages, oldest first."""
+
+    query = """
+            SELECT c.relname AS name, pg_get_expr(c.relpartbound, c.oid) AS bound
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'messages'::regclass
+            """
+    records = await conn.fetch(query)
+    bounds = []
+    for record in records:
+        match = PARTITION_BOUND.search(record['bound'])
+        if match:
+            bounds.append((record['name'], datetime.datetime.fromisoformat(match.group(1))))
+    return sorted(bounds, key=lambda x: x[1])
+
+
+async def migrate_messages_table(conn: asyncpg.Connection, now: datetime.datetime) -> int:
+    """
+    Turn an old unpartitioned messages table into a partitioned one.
+
+    The old table is attached as-is as `messages_legacy` covering everything
+    up to the end of next month, so nothing is copied. Rows without any
+    time can't go in a range partition and are moved to `messages_untimed`,
+    which only optout --remove still touches.
+
+    Every slow step runs while the old table is still live and only takes row locks
+    or SHARE UPDATE EXCLUSIVE. The partition bound is added as a NOT VALID check and
+    validated on its own, so the final swap only holds its exclusive lock briefly.
+    Meant to be run once by hand (`migratemessages`), returns the amount of rows moved.
+    """
+
+    # Range partitions can't hold NULL keys. Don't make up a time for rows
+    # that have none, a fake one would end up in the day counters.
+    await conn.execute(
+        """
+        UPDATE messages
+        SET "timestamp" = TO_TIMESTAMP(unix) AT TIME ZONE 'UTC'
+        WHERE "timestamp" IS NULL
+        AND unix IS NOT NULL
+        """
+    )
+    async with conn.transaction():
+        await conn.execute("CREATE TABLE IF NOT EXISTS messages_untimed AS TABLE messages WITH NO DATA")
+        status = await conn.execute(
+            """
+            WITH moved AS (
+                DELETE FROM messages
+                WHERE "timestamp" IS NULL
+                RETURNING *
+            )
+            INSERT INTO messages_untimed
+            SELECT * FROM moved
+            """
+        )
+    moved = int(status.split()[-1])
+
+    # Built now so the parent's indexes attach these instead of building them under a lock
+    for name, definition in MESSAGE_INDEXES.items():
+        legacy = name.replace('messages_', 'messages_legacy_', 1)
+        await conn.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {legacy} ON messages {definition}")
+
+    # Up to the end of next month, the check holds for new rows too until the swap
+    newest = await conn.fetchval('SELECT MAX("timestamp") FROM messages')
+    upper = add_months(month_start(max(now, newest or now)), 2)
+    await conn.execute("ALTER TABLE messages DROP CONSTRAINT IF EXISTS messages_legacy_bound")
+    await conn.execute(
+        f"""
+        ALTER TABLE messages ADD CONSTRAINT messages_legacy_bound
+        CHECK ("timestamp" IS NOT NULL AND "timestamp" < '{upper:%Y-%m-%d}') NOT VALID
+        """
+    )
+    await conn.execute("ALTER TABLE messages VALIDATE CONSTRAINT messages_legacy_bound")
+
+    async with conn.transaction():
+        await conn.execute("ALTER TABLE messages RENAME TO messages_legacy")
+        await conn.execute(messages_script())
+        # The validated check proves the bound, so attaching doesn't scan the table
+        await conn.execute(
+            f"ALTER TABLE messages ATTACH PARTITION messages_legacy FOR VALUES FROM (MINVALUE) TO ('{upper:%Y-%m-%d}')"
+        )
+        await conn.execute("ALTER TABLE messages_legacy DROP CONSTRAINT messages_legacy_bound")
+
+        # The new identity starts at 1, carry on after the legacy rows instead
+        await conn.execute(
+            """
+            SELECT setval(pg_get_serial_sequence('messages', 'index'), COALESCE(MAX(index), 0) + 1, false)
+            FROM messages_legacy
+            """
+        )
+    return moved
+
+
+async def create_partitions(conn: asyncpg.Connection, now: datetime.datetime, *, ahead: int = 2) -> List[str]:
+    """
+    Make sure this month and the next `ahead` months have a partition.
+
+    Returns the names of the partitions created.
+    """
+
+    for name, definition in MESSAGE_INDEXES.items():
+        # Indexes on the parent are created on every partition, current and future.
+        await conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON messages {definition}")
+
+    bounds = await partition_bounds(conn)
+    start = month_start(now)
+    if bounds:
+        start = max(start, bounds[-1][1])
+
+    created = []
+    end = add_months(month_start(now), ahead + 1)
+    while start < end:
+        name = f"messages_{start:%Y_%m}"
+        upper = add_months(start, 1)
+        await conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF messages "
+            f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+        )
+        created.append(name)
+        start = upper
+    return created
+
+
+async def compact_partitions(conn: asyncpg.Connection, now: datetime.datetime, *, retention: int) -> List[str]:
+    """
+    Roll up and drop every partition that ended more than `retention` months ago.
+
+    Days that message_counts already has are kept as they are, the rest
+    (data from before the counters existed) are filled in from the partition.
+    Returns the names of the partitions dropped.
+    """
+
+    cutoff = add_months(month_start(now), -retention)
+    dropped = []
+    for name, upper in await partition_bounds(conn):
+        if upper > cutoff:
+            break
+
+        async with conn.transaction():
+            await conn.execute(
+                f"""
+                WITH rolled AS (
+                    INSERT INTO message_counts (server_id, author_id, day, count)
+                    SELECT server_id, author_id, "timestamp"::DATE, COUNT(*)
+                    FROM {name}
+                    WHERE server_id IS NOT NULL
+                    AND author_id IS NOT NULL
+                    GROUP BY server_id, author_id, "timestamp"::DATE
+                    ON CONFLICT (server_id, author_id, day) DO NOTHING
+                    RETURNING server_id, count
+                )
+                INSERT INTO message_totals (server_id, count)
+                SELECT server_id, SUM(count)
+                FROM rolled
+                GROUP BY server_id
+                ON CONFLICT (server_id)
+                DO UPDATE SET count = message_totals.count + EXCLUDED.count
+                """
+            )
+            await conn.execute(f"DROP TABLE {name}")
+        dropped.append(name)
+    return dropped
+
+
+async def manage_partitions(conn: asyncpg.Connection, *, retention: int, ahead: int = 2) -> Tuple[List[str], List[str]]:
+    """
+    Create upcoming partitions and compact expired ones.
+
+    An old unpartitioned table is left alone until `migrate_messages_table` is run.
+    Returns `(created, dropped)` partition names.
+    """
+
+    now = datetime.datetime.utcnow()
+    query = """
+            SELECT c.relkind
+            FROM pg_class c
+            WHERE c.oid = to_regclass('messages')
+            """
+    kind = await conn.fetchval(query)
+    if kind == 'r':
+        return [], [] # Not migrated yet
+    if kind is None:
+        await conn.execute(messages_script()) # Startup scripts haven't run yet
+
+    created = await create_partitions(conn, now, ahead=ahead)
+    dropped = await compact_partitions(conn, now, retention=retention)
+    return created, dropped